@@ -0,0 +1,139 @@
+#!python
+
+#  ###################################################################
+#
+#  Disclaimer and Notice of Copyright 
+#  ==================================
+#
+#  Copyright (c) 2015, Los Alamos National Security, LLC
+#  All rights reserved.
+#
+#  Copyright 2015. Los Alamos National Security, LLC. 
+#  This software was produced under U.S. Government contract 
+#  DE-AC52-06NA25396 for Los Alamos National Laboratory (LANL), 
+#  which is operated by Los Alamos National Security, LLC for 
+#  the U.S. Department of Energy. The U.S. Government has rights 
+#  to use, reproduce, and distribute this software.  NEITHER 
+#  THE GOVERNMENT NOR LOS ALAMOS NATIONAL SECURITY, LLC MAKES 
+#  ANY WARRANTY, EXPRESS OR IMPLIED, OR ASSUMES ANY LIABILITY 
+#  FOR THE USE OF THIS SOFTWARE.  If software is modified to 
+#  produce derivative works, such modified software should be 
+#  clearly marked, so as not to confuse it with the version 
+#  available from LANL.
+#
+#  Additionally, redistribution and use in source and binary 
+#  forms, with or without modification, are permitted provided 
+#  that the following conditions are met:
+#  -  Redistributions of source code must retain the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer. 
+#  -  Redistributions in binary form must reproduce the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer in the documentation 
+#     and/or other materials provided with the distribution. 
+#  -  Neither the name of Los Alamos National Security, LLC, 
+#     Los Alamos National Laboratory, LANL, the U.S. Government, 
+#     nor the names of its contributors may be used to endorse 
+#     or promote products derived from this software without 
+#     specific prior written permission.
+#   
+#  THIS SOFTWARE IS PROVIDED BY LOS ALAMOS NATIONAL SECURITY, LLC 
+#  AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+#  INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF 
+#  MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+#  IN NO EVENT SHALL LOS ALAMOS NATIONAL SECURITY, LLC OR CONTRIBUTORS 
+#  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, 
+#  OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, 
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, 
+#  OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY 
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR 
+#  TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT 
+#  OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY 
+#  OF SUCH DAMAGE.
+#
+#  ###################################################################
+
+
+"""  Count of my jobs queued or running in the scheduler, used by the -w
+     watermark throttle. The scheduler is asked once, and the sample is
+     shared by all the test entries until it is max_age seconds old. Jobs
+     Pavilion submits in the meantime are counted locally.
+"""
+
+import subprocess
+import time
+import logging
+
+
+class ActiveJobs():
+    """
+    class to sample the jobs listed by a scheduler query command
+    """
+
+    # seconds a sample of the scheduler's job list is used for
+    max_age = 30
+
+    samplers = {}
+
+    def __init__(self, cmd, match=''):
+
+        my_name = self.__class__.__name__
+        self.logger = logging.getLogger('pav.' + my_name)
+
+        # command listing my jobs one per line, only lines containing
+        # match are counted
+        self.cmd = cmd
+        self.match = match
+        self.lines = []
+        self.sampled = None
+        # jobs submitted since the sample, by target segment
+        self.submitted = []
+
+    @classmethod
+    def sampler(cls, cmd, match=''):
+        """
+        Returns the shared sampler for this query command.
+        """
+        key = (tuple(cmd), match)
+        if key not in cls.samplers:
+            cls.samplers[key] = cls(cmd, match)
+        return cls.samplers[key]
+
+    def sample(self):
+        """
+        Query the scheduler if the last sample is too old.
+        """
+        if self.sampled is not None and time.time() - self.sampled < ActiveJobs.max_age:
+            return
+        try:
+            output = subprocess.check_output(self.cmd)
+        except OSError as err:
+            # no such scheduler command here, nothing to overrun
+            self.logger.info('%s not available: %s' % (self.cmd[0], err))
+            output = ''
+        except subprocess.CalledProcessError as err:
+            # keep using the last sample and the local counts
+            self.logger.info('%s failed: %s' % (self.cmd[0], err))
+            self.sampled = time.time()
+            return
+        self.lines = [li for li in output.splitlines() if li.strip() and self.match in li]
+        self.submitted = []
+        self.sampled = time.time()
+        self.logger.info('%s: %d active jobs' % (self.cmd[0], len(self.lines)))
+
+    def count(self, ts=''):
+        """
+        Number of active jobs, only those on target segment ts if given.
+        """
+        self.sample()
+        n = len([li for li in self.lines if ts in li])
+        n += len([s for s in self.submitted if not ts or s == ts])
+        return n
+
+    def add(self, ts=''):
+        """
+        Count a job submitted since the last sample. Before the first
+        sample there is nothing to add to, the query will list it.
+        """
+        if self.sampled is not None:
+            self.submitted.append(ts)
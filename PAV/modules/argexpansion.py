@@ -1,5 +1,4 @@
-#!/usr/bin/env python
-
+#!python
 
 #  ###################################################################
 #
@@ -55,28 +54,78 @@
 #  ###################################################################
 
 
-""" Make base line result averages from the output of the get_results command
+"""  Expansion of test_args lists into the argument strings of the test
+     variations, leaving out the combinations named in test_args_restrictions.
 """
 
 
-# Input:  stdin stream of lines with, hopefully, trend data lines included
-#  ex. of an input line that will be matched:
-#    Test4.2x32(10 1024) jid(109959) 2014-09-04T08:43:22-0600 avg_iterTime 0.002910 sec
-#  then morphed down to:
-#    Test4.2x32(10 1024) avg_iterTime 0.002910 sec
-# Output:
+def compile_restrictions(restrictions):
+    """
+    Each restriction as a tuple of strings that all have to be found in
+    an argument string for it to be left out.
+    """
+    compiled = []
+    for r in restrictions:
+        if isinstance(r, list):
+            compiled.append(tuple(str(part) for part in r))
+        else:
+            compiled.append((str(r),))
+    return compiled
+
+
+def is_restricted(arg_str, compiled):
+    for parts in compiled:
+        if all(part in arg_str for part in parts):
+            return True
+    return False
+
+
+def expand_args(initial_arguments, initial_restrictions, counts=None):
+    """
+    Generate the argument strings made from every combination of the
+    argument lists, leaving out those matching a restriction. A string
+    restriction matches if it is found in the argument string, a list
+    restriction if all of its strings are. Appending arguments never undoes
+    a match, so a combination is pruned as soon as its leading arguments
+    match. If given, counts gets the number of 'expanded' and 'pruned'
+    combinations.
+    """
+    if counts is None:
+        counts = {}
+    counts['expanded'] = 0
+    counts['pruned'] = 0
+    compiled = compile_restrictions(initial_restrictions)
+
+    if all(not isinstance(arg, list) for arg in initial_arguments):
+        # one dimensional, every argument stands on its own
+        for arg in initial_arguments:
+            arg_str = str(arg)
+            if is_restricted(arg_str, compiled):
+                counts['pruned'] += 1
+            else:
+                counts['expanded'] += 1
+                yield arg_str
+        return
+
+    choices = [arg if isinstance(arg, list) else [arg] for arg in initial_arguments]
 
-import sys
-import re
+    # number of combinations made from the lists after each level
+    below = [1] * (len(choices) + 1)
+    for level in reversed(range(len(choices))):
+        below[level] = below[level + 1] * len(choices[level])
 
-print "Making baseline averages with data from:"
-for line in sys.stdin:
-    searchObj = re.search(r'jid\(', line, re.M | re.I)
-    if searchObj:
-        # Do some substitution work here, see comments above
-        #info = re.sub(r'\S*jid.*-\d+\s', "", line)
-        info = re.sub(r'\S*jid.*:[\d-]+\s', "", line)
-        print info,
+    def expand(level, prefix):
+        if level == len(choices):
+            counts['expanded'] += 1
+            yield prefix
+            return
+        for arg in choices[level]:
+            arg_str = prefix + str(arg) + " "
+            if is_restricted(arg_str, compiled):
+                counts['pruned'] += below[level + 1]
+                continue
+            for full_str in expand(level + 1, arg_str):
+                yield full_str
 
-if __name__ == '__main__':
-    sys.exit()
+    for arg_str in expand(0, ""):
+        yield arg_str
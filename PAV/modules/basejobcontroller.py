@@ -69,6 +69,11 @@ import json
 import glob
 from subprocess import Popen, PIPE
 import subprocess
+import threading
+import wsstage
+import buildcache
+import joblog
+import jobpost
 
 
 def copy_file(src, dest):
@@ -82,6 +87,22 @@ def copy_file(src, dest):
         print('Error: %s' % e.strerror)
 
 
+class JobEnv(dict):
+
+    """ The environment variables (PV_RUNHOME, PV_NNODES, ...) defined for one job.
+        Jobs record their settings here instead of in the global os.environ so
+        that many jobs can be prepared within the same process. The variables
+        only become a real environment when a command is executed.
+    """
+
+    def export(self):
+        """ return the complete environment for a child process of this job """
+        env = dict(os.environ)
+        for key, value in self.iteritems():
+            env[key] = str(value)
+        return env
+
+
 class JobController:
 
     """ class to define the common actions for any job type """
@@ -90,28 +111,34 @@ class JobController:
     def now():
         return datetime.datetime.now().strftime("%m-%d-%YT%H:%M:%S:%f")
 
-    def __init__(self, uid, configs, job_log_file):
+    def __init__(self, uid, configs, job_log_file, env=None):
 
         self.uid = uid
+        # job specific environment, see JobEnv
+        if env is None:
+            env = JobEnv()
+        self.env = env
         self.name = configs['name']
         self.configs = configs
         self.job_log_file = job_log_file
         #self.job_variation = job_variation
         self.lh = self.configs['log_handle']
 
-        # setup logging same as in pav
+        # setup logging same as in pav, unless running inside the pav process
+        # (job dispatcher) where the master log file is already open
         self.logger = logging.getLogger('pav.' + self.__class__.__name__)
         self.logger.setLevel(logging.DEBUG)
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        master_log_file = os.environ['PV_LOG']
-        fh = logging.FileHandler(filename=master_log_file)
-        fh.setFormatter(formatter)
-        self.logger.addHandler(fh)
+        if not logging.getLogger('pav').handlers and not self.logger.handlers:
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            master_log_file = os.environ['PV_LOG']
+            fh = logging.FileHandler(filename=master_log_file)
+            fh.setFormatter(formatter)
+            self.logger.addHandler(fh)
 
         # print "initialize job controller"
 
         # ++ PV_SOURCE_LOCATION : Original source location (global not working directory)
-        os.environ['PV_SOURCE_LOCATION'] = self.configs['source_location']
+        self.env['PV_SOURCE_LOCATION'] = self.configs['source_location']
 
         # verify command is executable early on
         mycmd = self.configs['source_location'] + "/" + self.configs['run']['cmd']
@@ -128,17 +155,15 @@ class JobController:
         # removed sometime down the road.
 
         # ++ PV_TESTNAME : Name of job/test
-        os.environ['PV_TESTNAME'] = self.name
-        os.environ['GZ_TESTNAME'] = self.name
-        os.environ['PV_TESTEXEC'] = self.configs['run']['cmd']
-        os.environ['GZ_TESTEXEC'] = self.configs['run']['cmd']
-        pt = type(self.configs['run']['test_args'])
-        try:
-            # ++ PV_TEST_ARGS : Test arguments for job extracted from test suite
-            os.environ['GZ_TEST_PARAMS'] = self.configs['run']['test_args']
-            os.environ['PV_TEST_ARGS'] = self.configs['run']['test_args']
-        except:
+        self.env['PV_TESTNAME'] = self.name
+        self.env['GZ_TESTNAME'] = self.name
+        self.env['PV_TESTEXEC'] = self.configs['run']['cmd']
+        self.env['GZ_TESTEXEC'] = self.configs['run']['cmd']
+        if not isinstance(self.configs['run']['test_args'], basestring):
             raise TypeError('test_args value problem, is it a string?')
+        # ++ PV_TEST_ARGS : Test arguments for job extracted from test suite
+        self.env['GZ_TEST_PARAMS'] = self.configs['run']['test_args']
+        self.env['PV_TEST_ARGS'] = self.configs['run']['test_args']
 
         self.setup_working_space()
 
@@ -162,31 +187,35 @@ class JobController:
         # so no further work necessary.
         else:
             # ++ PV_WS : Path where job is run from at run time  (see PV_RUNHOME)
-            os.environ['PV_WS'] = src_dir
-            os.environ['PV_RUNHOME'] = src_dir
-            print os.environ['PV_RUNHOME']
-            print 'Working Space: %s' % os.environ['PV_RUNHOME']
-            self.logger.info('Working Space for %s: ' % self.lh + os.environ['PV_RUNHOME'])
+            self.env['PV_WS'] = src_dir
+            self.env['PV_RUNHOME'] = src_dir
+            print self.env['PV_RUNHOME']
+            print 'Working Space: %s' % self.env['PV_RUNHOME']
+            self.logger.info('Working Space for %s: ' % self.lh + self.env['PV_RUNHOME'])
             return
 
         # now setup and do the move
-        os.environ['PV_RUNHOME'] = ws + "/" + self.name + "__" + run_cmd.split("/",1)[0] + "." + JobController.now()
+        self.env['PV_RUNHOME'] = ws + "/" + self.name + "__" + run_cmd.split("/",1)[0] + "." + JobController.now()
 
-        print 'Working Space: %s' % os.environ['PV_RUNHOME']
+        print 'Working Space: %s' % self.env['PV_RUNHOME']
 
-        self.logger.info(self.lh + " : " + 'Create temporary Working Space - ' + os.environ['PV_RUNHOME'])
+        self.logger.info(self.lh + " : " + 'Create temporary Working Space - ' + self.env['PV_RUNHOME'])
         try:
-            os.makedirs(os.environ['PV_RUNHOME'], 0o775)
+            os.makedirs(self.env['PV_RUNHOME'], 0o775)
         except OSError:
             print "Error, could not create: ", ws, sys.exc_info()[0]
             # self.logger.error(self.lh + " Error, Failed to create working space (WS)")
             raise RuntimeError("Can't create temporary work space (WS)")
 
-        to_loc = os.environ['PV_RUNHOME']
-        os.environ['PV_WS'] = to_loc
+        to_loc = self.env['PV_RUNHOME']
+        self.env['PV_WS'] = to_loc
 
         # support user specified files or dirs to copy here.
         files2copy = self.configs['working_space']['copy_to_ws']
+
+        if self.configs['working_space'].get('stage') == 'link':
+            self.link_working_space(src_dir, ws, exclude_ws, files2copy)
+            return
         if files2copy:
             cmd = "cd " + src_dir + "; rsync -ar " + files2copy + " " + to_loc
         # general case is to copy all files except some known source file types
@@ -202,7 +231,7 @@ class JobController:
         self.logger.debug('%s : %s' % (self.lh, cmd))
 
         # run the command
-        p = Popen(cmd, stdout=PIPE, stderr=PIPE, shell=True)
+        p = Popen(cmd, stdout=PIPE, stderr=PIPE, shell=True, env=self.env.export())
         output, errors = p.communicate()
 
         if p.returncode or errors:
@@ -212,9 +241,65 @@ class JobController:
                                        "(Hint: check the job logfile)")
             # self.logger.info(self.lh + p.returncode + errors + output)
 
+    def link_working_space(self, src_dir, ws, exclude_ws, files2copy):
+        """
+        Build the working space from hard links to a snapshot of the
+        source tree shared by all the jobs (see wsstage.py).
+        """
+        skip_dirs = ['pv_ws']
+        if exclude_ws:
+            skip_dirs.append(exclude_ws.strip('/').split('/')[0])
+        includes = files2copy.split() if files2copy else None
+        mutable = []
+        if self.configs['working_space'].get('mutable'):
+            mutable = "".join(self.configs['working_space']['mutable'].split()).split(",")
+
+        try:
+            snapshot, copied = wsstage.stage(src_dir, self.env['PV_RUNHOME'], ws + "/.pv_snapshots",
+                                             skip_dirs, includes, mutable)
+        except (OSError, IOError) as err:
+            print "Error: failed linking data to working space!"
+            print err
+            self.logger.info(self.lh + " failed linking data to working space!, skipping job: " + self.name +
+                                       "(Hint: check the job logfile)")
+            return
+
+        print 'Working Space snapshot: %s' % snapshot
+        self.logger.info(self.lh + " : linked from " + snapshot + ", " + str(copied) + " file(s) copied")
+
     def __str__(self):
         return 'instantiated %s object' % self.name
 
+    def in_job_array(self):
+        # is this job a task of a job array (see jobarray.py)
+        return 'PV_ARRAY_DIR' in self.env
+
+    def save_array_task(self, submit_cmd):
+        """
+        Rather than submitting this job on its own, record the submit command and
+        the job environment as one task of a job array. The whole array is submitted
+        later on with a single scheduler call.
+        """
+        task_file = JobController.array_task_file(self.env['PV_ARRAY_DIR'], self.env['PV_ARRAY_TASK'])
+        self.logger.info(self.lh + " : array task " + task_file)
+        print "<arrayTask> " + task_file
+        # write to a temp file first so a partial task can never be submitted
+        with open(task_file + ".tmp", "w") as tf:
+            json.dump({'submit_cmd': submit_cmd, 'env': self.env}, tf)
+        os.rename(task_file + ".tmp", task_file)
+
+    @staticmethod
+    def array_task_file(array_dir, task_id):
+        return os.path.join(array_dir, "task." + str(task_id) + ".json")
+
+    @staticmethod
+    def load_array_task(array_dir, task_id):
+        # returns the dict saved by save_array_task
+        with open(JobController.array_task_file(array_dir, task_id)) as tf:
+            task = json.load(tf)
+        task['env'] = dict((str(k), str(v)) for k, v in task['env'].iteritems())
+        return task
+
     # return the full path to where the logfile is located
     def get_results_directory(self):
         return os.path.dirname(self.job_log_file)
@@ -229,12 +314,12 @@ class JobController:
         print "<testName> " + self.name
         print "<testExec> " + self.configs['run']['cmd']
         print "<user> " + os.getenv('USER')
-        print "<params> " + os.environ['PV_TEST_ARGS']
+        print "<params> " + self.env['PV_TEST_ARGS']
         # print "<segName> " + "theTargetSeg"
         sys.stdout.flush()
 
         # save the test config
-        tcf = os.environ["PV_JOB_RESULTS_LOG_DIR"] + "/test_config.txt"
+        tcf = self.env["PV_JOB_RESULTS_LOG_DIR"] + "/test_config.txt"
         tcf_file = open(tcf, "w+")
         tcf_file.write("Pavilion configuration values used to run this test:\n\n")
         tcf_file.write(json.dumps(self.configs, sort_keys=True, indent=4))
@@ -242,11 +327,29 @@ class JobController:
 
     def build(self):
         # call the command that builds the users test/job
-        bld_cmd = "cd " + os.environ['PV_RUNHOME'] + "; " + \
-            os.environ['PV_RUNHOME'] + "/" + self.configs['build']['cmd']
+        bld_cmd = "cd " + self.env['PV_RUNHOME'] + "; " + \
+            self.env['PV_RUNHOME'] + "/" + self.configs['build']['cmd']
         self.logger.info(self.lh + ': start build command: ' + bld_cmd)
+
+        def run_build():
+            return subprocess.check_output(bld_cmd, shell=True, stderr=subprocess.STDOUT,
+                                           env=self.env.export())
+
         try:
-            output = subprocess.check_output(bld_cmd, shell=True, stderr=subprocess.STDOUT)
+            # running in the source directory, the build is already shared
+            in_src = os.path.realpath(self.env['PV_RUNHOME']) == \
+                os.path.realpath(self.configs['source_location'])
+            root = None
+            if self.configs['build'].get('cache_flag', False) and not in_src:
+                root = buildcache.cache_root()
+            if root:
+                key = buildcache.build_key(self.env['PV_RUNHOME'], self.configs['build'], self.env.export())
+                output, reused = buildcache.cached_build(root, key, self.env['PV_RUNHOME'], run_build)
+                if reused:
+                    print "Build reused from: " + os.path.join(root, key)
+                    self.logger.info(self.lh + ' : build reused from ' + os.path.join(root, key))
+            else:
+                output = run_build()
             print output
         except subprocess.CalledProcessError as e:
             self.logger.info(self.lh + " : build exit status:" + str(e.returncode))
@@ -262,15 +365,19 @@ class JobController:
         pass
 
     @staticmethod
-    def run_epilog():
-        # run an epilog script if defined in the test config
+    def run_epilog(env=None):
+        # run an epilog script if defined in the test config.
+        # env is the job's complete environment, os.environ by default
 
+        if env is None:
+            env = os.environ
         try:
-            if os.environ['PV_ES']:
+            if env['PV_ES']:
                 # run an epilog script if defined in the test config
-                es = os.environ['PV_ES']
+                es = env['PV_ES']
                 print "- Run epilog script: " + str(es)
-                os.system(es)
+                sys.stdout.flush()
+                subprocess.call(es, shell=True, env=env)
                 print "- epilog script complete"
         except KeyError, e:
                 # print 'I got a KeyError - no: "%s"' % str(e)
@@ -280,16 +387,16 @@ class JobController:
     def setup_job_info(self):
 
         # save for later reference
-        os.environ['PV_SAVE_FROM_WS'] = self.configs['working_space']['save_from_ws']
+        self.env['PV_SAVE_FROM_WS'] = self.configs['working_space']['save_from_ws']
 
-        os.environ['PV_ES'] = self.configs['results']['epilog_script']
+        self.env['PV_ES'] = self.configs['results']['epilog_script']
 
-        os.environ['GZ_RUNHOME'] = os.environ['PV_RUNHOME']
+        self.env['GZ_RUNHOME'] = self.env['PV_RUNHOME']
 
-        os.environ['GZ_LOGFILE'] = os.environ["PV_JOB_RESULTS_LOG"]
+        self.env['GZ_LOGFILE'] = self.env["PV_JOB_RESULTS_LOG"]
 
-        os.environ['PV_TEST_ARGS'] = self.configs['run']['test_args']
-        os.environ['GZ_TEST_PARAMS'] = os.environ['PV_TEST_ARGS']
+        self.env['PV_TEST_ARGS'] = self.configs['run']['test_args']
+        self.env['GZ_TEST_PARAMS'] = self.env['PV_TEST_ARGS']
 
         # Uncomment when supported!
         # os.environ['TD_REGX'] = self.configs['results']['trend_data_regex']
@@ -297,13 +404,22 @@ class JobController:
         # Support for a Splunk data log or file
         try:
             if self.configs['splunk']['state']:
-                os.environ['SPLUNK_GDL'] = str(self.configs['splunk']['global_data_file'])
+                self.env['SPLUNK_GDL'] = str(self.configs['splunk']['global_data_file'])
         except KeyError, e:
             print 'basejobcontroller:setup_job_info, Splunk config error - no: "%s"' % str(e)
             pass
 
     @staticmethod
-    def cleanup():
+    def cleanup(env=None):
+
+        if env is None:
+            env = os.environ
+
+        JobController.save_from_ws(env)
+        print "\n".join(JobController.remove_ws(env))
+
+    @staticmethod
+    def save_from_ws(env):
 
         print '- Start WS cleanup:'
 
@@ -311,16 +427,16 @@ class JobController:
         sys.stderr.flush()
 
         # Save the files from the RUNHOME, a.k.a. WS directory
-        from_loc = os.environ['PV_RUNHOME'] + "/"
-        to_loc = os.environ["PV_JOB_RESULTS_LOG_DIR"]
+        from_loc = env['PV_RUNHOME'] + "/"
+        to_loc = env["PV_JOB_RESULTS_LOG_DIR"]
 
         # print '  files in :' + from_loc
         # print '  copy to  :' + to_loc
 
         # save explicitly defined files in the test suite config file
         try:
-            if os.environ['PV_SAVE_FROM_WS']:
-                no_spaces_str = "".join(os.environ['PV_SAVE_FROM_WS'].split())
+            if env['PV_SAVE_FROM_WS']:
+                no_spaces_str = "".join(env['PV_SAVE_FROM_WS'].split())
                 for file_type in no_spaces_str.split(","):
                     print "  save files like: " + file_type
                     save_it = glob.glob(os.path.join(from_loc, file_type))
@@ -337,64 +453,128 @@ class JobController:
             print 'Warning!, copy failed!'
             pass
 
+        sys.stdout.flush()
+
+    @staticmethod
+    def remove_ws(env):
+        # returns the lines to print, it may run alongside other output to the job log
+
+        msgs = []
         # remove the working space ONLY if it was created
         try:
-            if os.environ['PV_WS']:
+            if env['PV_WS'] and \
+                    os.path.realpath(env['PV_RUNHOME']) != os.path.realpath(env['PV_SOURCE_LOCATION']):
                 # ++ PV_SAVE_WS : Will not remove Working Space if this ENV variable set to 1
-                if "PV_SAVE_WS" in os.environ:
-                    print '- PV_SAVE_WS flag set, not removing %s ' % os.environ['PV_RUNHOME']
+                if "PV_SAVE_WS" in env:
+                    msgs.append('- PV_SAVE_WS flag set, not removing %s ' % env['PV_RUNHOME'])
                 else:
-                    print '- remove WS: %s ' % os.environ['PV_RUNHOME']
-                    shutil.rmtree(os.environ['PV_RUNHOME'])
+                    msgs.append('- remove WS: %s ' % env['PV_RUNHOME'])
+                    shutil.rmtree(env['PV_RUNHOME'])
         except KeyError, e:
             # print 'I got a KeyError - no: "%s"' % str(e)
             pass
         except Exception, e:
-            print "shutil.rmtree() Exception: \"%s\"" % str(e)
+            msgs.append("shutil.rmtree() Exception: \"%s\"" % str(e))
 
-        print '- Working Space cleanup complete'
+        msgs.append('- Working Space cleanup complete')
+        return msgs
 
     @classmethod
-    def generate_trend_data_file(cls):
-
-        # slurp up the trend data from the log file and place it in a file
-        # called trend_data in the local results dir
-        tdf = os.environ["PV_JOB_RESULTS_LOG_DIR"] + "/trend_data"
-        out_file = open(tdf, "w")
+    def generate_trend_data_file(cls, env=None, record=None):
 
-        lf = open(os.environ["PV_JOB_RESULTS_LOG"], 'r')
+        if env is None:
+            env = os.environ
+        if record is None:
+            record = joblog.JobRecord.from_log(env["PV_JOB_RESULTS_LOG"])
 
-        for line in lf:
-            # td_regex = os.environ['TD_REGX']
-            # match = re.search(td_regex, line, re.IGNORECASE)
-            match_str = "(<td>\s+(.*))"
-            match = re.search(match_str, line, re.IGNORECASE)
-            # match = re.search("^(<td>\s+(.*))", line, re.IGNORECASE)
-            if match:
-                out_file.write(match.group(2) + "\n")
-
-        out_file.close()
+        # the trend data from the log file goes in a file
+        # called trend_data in the local results dir
+        jobpost.write_trend_data(env["PV_JOB_RESULTS_LOG_DIR"], record)
 
     @staticmethod
-    def process_trend_data():
+    def process_trend_data(env=None, record=None):
+        # record is the JobRecord of the job log, parsed here if not given
+
+        if env is None:
+            env = os.environ
+        if record is None:
+            record = joblog.JobRecord.from_log(env["PV_JOB_RESULTS_LOG"])
 
         # collect the trend data into a single file
-        JobController.generate_trend_data_file()
+        JobController.generate_trend_data_file(env, record)
+
+        sys.stdout.flush()
 
         # add to the global CSV results
-        cmd = os.environ['PVINSTALL'] + "/PAV/scripts/td2csvgdl"
-        os.system(cmd)
+        try:
+            jobpost.write_csv(env['PV_RESULT_ROOT'], record)
+        except (IOError, OSError) as e:
+            print "Error: failed adding to the CSV results: " + str(e)
 
         # generate the Splunk data file(s)
         try:
-            if os.environ['SPLUNK_GDL']:
-                log_dir = os.environ['PV_JOB_RESULTS_LOG_DIR']
-                cmd = os.environ['PVINSTALL'] + "/PAV/scripts/splunk/td2splunkData " + log_dir
-                os.system(cmd)
+            if env['SPLUNK_GDL']:
+                jobpost.write_splunk(env['PV_JOB_RESULTS_LOG_DIR'], record, env['SPLUNK_GDL'])
         except KeyError, e:
             # Never set up properly so just move on...
             # print 'basejobcontroller:process_trend_data, KeyError - no: "%s"' % str(e)
             pass
+        except (IOError, OSError) as e:
+            print "Error: failed writing the Splunk data: " + str(e)
+
+    @staticmethod
+    def follow_job_log(env=None):
+        """
+        Start parsing the job log while the job runs, pass the returned
+        follower to post_process when the job is done.
+        """
+        if env is None:
+            env = os.environ
+        follower = jobpost.JobLogFollower(env["PV_JOB_RESULTS_LOG"])
+        follower.start()
+        return follower
+
+    @staticmethod
+    def post_process(env, follower, now):
+        """
+        Everything done once the user's job has finished: the epilog, the
+        files saved from the working space, then the working space removal
+        while the results are written from the parsed job log.
+        """
+
+        # The post_complete file needs to be placed in the results dir
+        # for Gazebo compatibility
+        pcf = env["PV_JOB_RESULTS_LOG_DIR"] + "/post_complete"
+        text_file = open(pcf, "w")
+        text_file.write("{}\n".format("command complete"))
+        JobController.run_epilog(env)
+        text_file.write("{}\n".format("epilog complete"))
+
+        print "<end>", now()
+        sys.stdout.flush()
+        record = follower.finish()
+        try:
+            jobpost.write_summary(env["PV_JOB_RESULTS_LOG_DIR"], record)
+        except (IOError, OSError, ValueError) as e:
+            # the tools read the log instead
+            print "Warning: failed writing the job summary: " + str(e)
+
+        # saved files, such as a job's own .splunkdata, must be in the
+        # results dir before it is read, only the removal runs alongside
+        JobController.save_from_ws(env)
+        # the removal prints nothing itself, its lines are printed once it is done
+        removal = []
+        cleaner = threading.Thread(target=lambda: removal.extend(JobController.remove_ws(env)))
+        cleaner.start()
+        # The trend_data file needs to be placed in the results dir
+        # for Gazebo compatibility
+        JobController.process_trend_data(env, record)
+        cleaner.join()
+        print "\n".join(removal)
+        text_file.write("{}\n".format("cleanup complete"))
+        text_file.close()
+        sys.stdout.flush()
+        return record
 
 
 # this gets called if it's run as a script/program
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+
+#  ###################################################################
+#
+#  Disclaimer and Notice of Copyright 
+#  ==================================
+#
+#  Copyright (c) 2015, Los Alamos National Security, LLC
+#  All rights reserved.
+#
+#  Copyright 2015. Los Alamos National Security, LLC. 
+#  This software was produced under U.S. Government contract 
+#  DE-AC52-06NA25396 for Los Alamos National Laboratory (LANL), 
+#  which is operated by Los Alamos National Security, LLC for 
+#  the U.S. Department of Energy. The U.S. Government has rights 
+#  to use, reproduce, and distribute this software.  NEITHER 
+#  THE GOVERNMENT NOR LOS ALAMOS NATIONAL SECURITY, LLC MAKES 
+#  ANY WARRANTY, EXPRESS OR IMPLIED, OR ASSUMES ANY LIABILITY 
+#  FOR THE USE OF THIS SOFTWARE.  If software is modified to 
+#  produce derivative works, such modified software should be 
+#  clearly marked, so as not to confuse it with the version 
+#  available from LANL.
+#
+#  Additionally, redistribution and use in source and binary 
+#  forms, with or without modification, are permitted provided 
+#  that the following conditions are met:
+#  -  Redistributions of source code must retain the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer. 
+#  -  Redistributions in binary form must reproduce the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer in the documentation 
+#     and/or other materials provided with the distribution. 
+#  -  Neither the name of Los Alamos National Security, LLC, 
+#     Los Alamos National Laboratory, LANL, the U.S. Government, 
+#     nor the names of its contributors may be used to endorse 
+#     or promote products derived from this software without 
+#     specific prior written permission.
+#   
+#  THIS SOFTWARE IS PROVIDED BY LOS ALAMOS NATIONAL SECURITY, LLC 
+#  AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+#  INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF 
+#  MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+#  IN NO EVENT SHALL LOS ALAMOS NATIONAL SECURITY, LLC OR CONTRIBUTORS 
+#  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, 
+#  OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, 
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, 
+#  OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY 
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR 
+#  TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT 
+#  OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY 
+#  OF SUCH DAMAGE.
+#
+#  ###################################################################
+
+
+
+""" Baseline statistics of the trend data.
+    The trend data values are grouped by test (name.nodesXcores(args)) and
+    trend data name, less any "+node" suffix, and the count, mean, min, max,
+    standard deviation and percentiles of every group are computed a whole
+    column at a time, with numpy when it is there. The text report is the
+    one mkBaselines printed, which blDiff compares; save() also writes the
+    baselines as JSON.
+"""
+
+# Input:  stdin stream of get_results -T lines, ex. of a line that is used:
+#    Test4.2x32(10 1024) jid(109959) 2014-09-04T08:43:22-0600 avg_iterTime 0.002910 sec
+
+import os
+import re
+import sys
+import json
+import math
+import array
+import datetime
+from optparse import OptionParser
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+percentiles = (5, 25, 50, 75, 95)
+
+
+def parse_trend_line(line):
+    """
+    (test, name, value, units) of a get_results -T line, None if it has no
+    numeric trend data, by the rules of makebaselines.py and mkBaselines.
+    """
+    if not re.search(r'jid\(', line, re.I) or '*' in line:
+        return None
+    info = re.sub(r'\S*jid.*:[\d-]+\s', "", line.rstrip("\n"))
+    parts = info.split(") ", 1)
+    if len(parts) < 2:
+        return None
+    fields = parts[1].split()
+    if len(fields) < 2:
+        return None
+    try:
+        value = float(fields[1])
+    except ValueError:
+        return None
+    name = fields[0]
+    # the same value from each node counts towards the common name
+    match = re.match(r"(.+)\+(.+)", name)
+    if match:
+        name = match.group(1)
+    return parts[0].replace("\t", "", 1) + ")", name, value, fields[2] if len(fields) > 2 else ''
+
+
+def group_stats(keys, values, groups):
+    """
+    count, mean, min, max, stdev and the percentiles of the values of each
+    group, as lists indexed by group; keys holds the group of each value.
+    """
+    if numpy is not None:
+        k = numpy.frombuffer(keys, dtype=numpy.intc)
+        v = numpy.frombuffer(values, dtype=numpy.double)
+        counts = numpy.bincount(k, minlength=groups)
+        # summed in the order the values came, as mkBaselines did
+        means = numpy.bincount(k, weights=v, minlength=groups) / counts
+        stdevs = numpy.sqrt(numpy.bincount(k, weights=(v - means[k]) ** 2, minlength=groups) / counts)
+        # each group's values in order, one after the other
+        ordered = v[numpy.lexsort((v, k))]
+        starts = numpy.cumsum(counts) - counts
+        pcts = []
+        for p in percentiles:
+            pos = starts + (counts - 1) * (p / 100.0)
+            low = numpy.floor(pos).astype(int)
+            high = numpy.ceil(pos).astype(int)
+            pcts.append((ordered[low] + (ordered[high] - ordered[low]) * (pos - low)).tolist())
+        return (counts.tolist(), means.tolist(), ordered[starts].tolist(),
+                ordered[starts + counts - 1].tolist(), stdevs.tolist(), list(zip(*pcts)))
+
+    lists = [[] for g in range(groups)]
+    for key, value in zip(keys, values):
+        lists[key].append(value)
+    counts, means, mins, maxs, stdevs, pcts = [], [], [], [], [], []
+    for vals in lists:
+        mean = sum(vals) / len(vals)
+        counts.append(len(vals))
+        means.append(mean)
+        stdevs.append(math.sqrt(sum((val - mean) ** 2 for val in vals) / len(vals)))
+        vals.sort()
+        mins.append(vals[0])
+        maxs.append(vals[-1])
+        group_pcts = []
+        for p in percentiles:
+            pos = (len(vals) - 1) * (p / 100.0)
+            low = int(math.floor(pos))
+            high = int(math.ceil(pos))
+            group_pcts.append(vals[low] + (vals[high] - vals[low]) * (pos - low))
+        pcts.append(tuple(group_pcts))
+    return counts, means, mins, maxs, stdevs, pcts
+
+
+class Baselines(object):
+
+    """ The trend data values collected, as a column of values and a
+        column of their group numbers.
+    """
+
+    def __init__(self):
+        self.groups = {}
+        self.keys = array.array('i')
+        self.values = array.array('d')
+        self.units = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, test, name, value, units=''):
+        group = self.groups.setdefault((test, name), len(self.groups))
+        self.keys.append(group)
+        self.values.append(value)
+        # the last units given win
+        if units:
+            self.units[(test, name)] = units
+
+    def add_lines(self, lines):
+        for line in lines:
+            found = parse_trend_line(line)
+            if found:
+                self.add(*found)
+
+    def stats(self):
+        """
+        The baseline of each test and trend data name, in order.
+        """
+        if not self.groups:
+            return []
+        counts, means, mins, maxs, stdevs, pcts = group_stats(self.keys, self.values, len(self.groups))
+        baselines = []
+        for (test, name), group in sorted(self.groups.items()):
+            baselines.append({'test': test, 'name': name, 'units': self.units.get((test, name), ''),
+                              'count': counts[group], 'mean': means[group], 'min': mins[group],
+                              'max': maxs[group], 'stdev': stdevs[group],
+                              'percentiles': dict(("p%d" % p, pct) for p, pct in zip(percentiles, pcts[group]))})
+        return baselines
+
+
+def report(baselines):
+    """
+    The baselines as mkBaselines printed them.
+    """
+    out = []
+    test = None
+    for bl in baselines:
+        if bl['test'] != test:
+            test = bl['test']
+            out.append("%s:\n" % test)
+        out.append("\t %s = %.2f %s (entries - %d, min - %.2f, max - %.2f, stDev - %.2f\n" %
+                   (bl['name'], bl['mean'], bl['units'], bl['count'], bl['min'], bl['max'], bl['stdev']))
+    return "".join(out)
+
+
+def baseline_file(result_root):
+    # a new file each time, next to the Boxplots
+    return os.path.join(result_root, "Baselines",
+                        "baselines-" + datetime.datetime.now().strftime('%m-%d-%YT%H:%M:%S:%f') + ".json")
+
+
+def save(path, baselines):
+    """
+    Write the baselines as JSON, by test and then by trend data name.
+    """
+    tests = {}
+    for bl in baselines:
+        entry = dict((key, value) for key, value in bl.items() if key not in ('test', 'name'))
+        tests.setdefault(bl['test'], {})[bl['name']] = entry
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, "w") as fp:
+        json.dump({'created': datetime.datetime.now().isoformat(), 'percentiles': list(percentiles),
+                   'tests': tests}, fp, indent=1, separators=(",", ": "), sort_keys=True)
+        fp.write("\n")
+
+
+def main():
+    parser = OptionParser(usage="%prog [-o <baselines.json>] < get_results -T output")
+    parser.add_option("-o", dest="output", help="also save the baselines as JSON in this file")
+    options, args = parser.parse_args()
+
+    collected = Baselines()
+    collected.add_lines(sys.stdin)
+    baselines = collected.stats()
+    sys.stdout.write(report(baselines))
+    if options.output:
+        save(options.output, baselines)
+        sys.stdout.write("\nBaselines file -> %s\n" % options.output)
+
+
+if __name__ == '__main__':
+    main()
+    sys.exit()
@@ -0,0 +1,221 @@
+#  ###################################################################
+#
+#  Disclaimer and Notice of Copyright 
+#  ==================================
+#
+#  Copyright (c) 2015, Los Alamos National Security, LLC
+#  All rights reserved.
+#
+#  Copyright 2015. Los Alamos National Security, LLC. 
+#  This software was produced under U.S. Government contract 
+#  DE-AC52-06NA25396 for Los Alamos National Laboratory (LANL), 
+#  which is operated by Los Alamos National Security, LLC for 
+#  the U.S. Department of Energy. The U.S. Government has rights 
+#  to use, reproduce, and distribute this software.  NEITHER 
+#  THE GOVERNMENT NOR LOS ALAMOS NATIONAL SECURITY, LLC MAKES 
+#  ANY WARRANTY, EXPRESS OR IMPLIED, OR ASSUMES ANY LIABILITY 
+#  FOR THE USE OF THIS SOFTWARE.  If software is modified to 
+#  produce derivative works, such modified software should be 
+#  clearly marked, so as not to confuse it with the version 
+#  available from LANL.
+#
+#  Additionally, redistribution and use in source and binary 
+#  forms, with or without modification, are permitted provided 
+#  that the following conditions are met:
+#  -  Redistributions of source code must retain the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer. 
+#  -  Redistributions in binary form must reproduce the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer in the documentation 
+#     and/or other materials provided with the distribution. 
+#  -  Neither the name of Los Alamos National Security, LLC, 
+#     Los Alamos National Laboratory, LANL, the U.S. Government, 
+#     nor the names of its contributors may be used to endorse 
+#     or promote products derived from this software without 
+#     specific prior written permission.
+#   
+#  THIS SOFTWARE IS PROVIDED BY LOS ALAMOS NATIONAL SECURITY, LLC 
+#  AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+#  INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF 
+#  MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+#  IN NO EVENT SHALL LOS ALAMOS NATIONAL SECURITY, LLC OR CONTRIBUTORS 
+#  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, 
+#  OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, 
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, 
+#  OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY 
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR 
+#  TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT 
+#  OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY 
+#  OF SUCH DAMAGE.
+#
+#  ###################################################################
+
+
+
+"""  Build once cache (build cache_flag: True).
+     The files a build creates or changes in the working space are saved
+     under a key made from the paths, sizes and modification times of the
+     working space files before the build, the build section of the test
+     config and the parts of the environment a build depends on. Later jobs
+     with the same key, such as the other variations of a test, get those
+     files back instead of building again. Jobs building the same key at the
+     same time wait on a lock for the first one to finish. The key leaves
+     out the test arguments, so the cache is off unless asked for.
+"""
+
+import os
+import fcntl
+import hashlib
+import json
+import shutil
+import tempfile
+import time
+from helperutilities import owned_privately, private_dir
+
+# environment variables that can change what a build produces
+key_env_vars = ['PATH', 'LD_LIBRARY_PATH', 'LIBRARY_PATH', 'CPATH', 'LOADEDMODULES',
+                'CC', 'CXX', 'FC', 'F77', 'MPICC', 'CFLAGS', 'CXXFLAGS', 'FFLAGS', 'LDFLAGS',
+                'PV_SOURCE_LOCATION']
+
+# cached builds not used for longer than this (seconds) are removed
+build_max_age = 7 * 24 * 3600
+
+
+def cache_root():
+    """
+    The private directory the builds are saved in, None if caching is
+    turned off or the directory could be written to by someone else.
+    """
+    # ++ PV_BUILD_CACHE : Directory for saved build results, empty to disable
+    root = os.getenv('PV_BUILD_CACHE', os.path.expanduser("~/.pavilion/build_cache"))
+    if not root:
+        return None
+    try:
+        # the saved files are run later on, so nobody else may put them there
+        return private_dir(root)
+    except OSError:
+        return None
+
+
+def tree_state(run_home):
+    """
+    Returns {relative path: (size, mtime)} for the files below run_home.
+    """
+    state = {}
+    for root, dir_names, file_names in os.walk(run_home):
+        for f in file_names:
+            path = os.path.join(root, f)
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            state[os.path.relpath(path, run_home)] = (st.st_size, st.st_mtime)
+    return state
+
+
+def build_key(run_home, build_configs, env):
+    """
+    Name of the build of the files in run_home with these build settings.
+    """
+    h = hashlib.md5()
+    h.update(json.dumps(build_configs, sort_keys=True))
+    for var in key_env_vars:
+        h.update("%s=%s\n" % (var, env.get(var, '')))
+    # staging keeps the modification times of the source files, like the
+    # working space snapshots the files are known by their size and mtime
+    for rel_path, (size, mtime) in sorted(tree_state(run_home).iteritems()):
+        h.update("%s\0%d\0%r\n" % (rel_path, size, mtime))
+    return h.hexdigest()
+
+
+def built_files(before, after):
+    """
+    Relative paths of the files the build created or changed.
+    """
+    return sorted(p for p, s in after.iteritems() if before.get(p) != s)
+
+
+def save(entry, run_home, paths, output):
+    # put together aside and rename into place, so an entry is complete or absent
+    tmp_dir = tempfile.mkdtemp(prefix='.tmp.', dir=os.path.dirname(entry))
+    files_dir = os.path.join(tmp_dir, 'files')
+    os.mkdir(files_dir)
+    for rel_path in paths:
+        src = os.path.join(run_home, rel_path)
+        dest = os.path.join(files_dir, rel_path)
+        if not os.path.isdir(os.path.dirname(dest)):
+            os.makedirs(os.path.dirname(dest))
+        if os.path.islink(src):
+            os.symlink(os.readlink(src), dest)
+        else:
+            shutil.copy2(src, dest)
+    with open(os.path.join(tmp_dir, 'output'), 'w') as fp:
+        fp.write(output)
+    os.rename(tmp_dir, entry)
+
+
+def restore(entry, run_home):
+    """
+    Copy the saved files of a cached build into run_home, returns the
+    saved build output.
+    """
+    files_dir = os.path.join(entry, 'files')
+    for root, dir_names, file_names in os.walk(files_dir):
+        to_dir = os.path.join(run_home, os.path.relpath(root, files_dir))
+        if not os.path.isdir(to_dir):
+            os.makedirs(to_dir)
+        for f in file_names:
+            src = os.path.join(root, f)
+            dest = os.path.join(to_dir, f)
+            # never write through a hard link into a staging snapshot
+            if os.path.lexists(dest):
+                os.remove(dest)
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), dest)
+            else:
+                shutil.copy2(src, dest)
+    # mark it as recently used
+    os.utime(entry, None)
+    with open(os.path.join(entry, 'output')) as fp:
+        return fp.read()
+
+
+def remove_old_builds(root, keep):
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name == keep or not os.path.isdir(path):
+            continue
+        try:
+            if time.time() - os.stat(path).st_mtime > build_max_age:
+                shutil.rmtree(path)
+                if os.path.exists(path + ".lock"):
+                    os.remove(path + ".lock")
+        except OSError:
+            pass
+
+
+def cached_build(root, key, run_home, build):
+    """
+    Run build(), a function returning the build output, in run_home unless
+    the same key was built before. Returns the build output and whether it
+    came from the cache. A failed build raises and saves nothing.
+    root is the private directory returned by cache_root().
+    """
+    entry = os.path.join(root, key)
+
+    with open(entry + ".lock", 'a') as lock:
+        # a concurrent build of the same key holds the lock until it is saved
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if os.path.isdir(entry) and owned_privately(entry):
+                return restore(entry, run_home), True
+            before = tree_state(run_home)
+            output = build()
+            if not os.path.lexists(entry):
+                save(entry, run_home, built_files(before, tree_state(run_home)), output)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+    remove_old_builds(root, key)
+    return output, False
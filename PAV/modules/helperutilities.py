@@ -55,6 +55,7 @@
 
 
 import os
+import errno
 
 # implement linux "which" command
 # FWIW, python 3.3 offers shutil.which()
@@ -75,3 +76,45 @@ def which(program):
                 return exe_file
 
     return None
+
+
+# compress a list of integers into the range syntax of Slurm/Moab job arrays,
+# for example [0, 1, 2, 5, 7, 8] -> "0-2,5,7-8"
+def array_ranges(ids):
+
+    ranges = []
+    ids = sorted(ids)
+    start = prev = ids[0]
+    for i in ids[1:] + [None]:
+        if i is not None and i == prev + 1:
+            prev = i
+            continue
+        if start == prev:
+            ranges.append(str(start))
+        else:
+            ranges.append(str(start) + "-" + str(prev))
+        start = prev = i
+
+    return ",".join(ranges)
+
+
+# True if path belongs to the current user and nobody else can write to it,
+# anything read from a shared location must pass this before it is trusted
+def owned_privately(path):
+
+    st = os.lstat(path)
+    return st.st_uid == os.getuid() and not st.st_mode & 0o022
+
+
+# create the directory path, and any missing parents, readable by its owner only.
+# Raises OSError if it already exists but could have been planted by someone else.
+def private_dir(path):
+
+    try:
+        os.makedirs(path, 0o700)
+    except OSError as err:
+        if err.errno != errno.EEXIST:
+            raise
+    if not os.path.isdir(path) or os.path.islink(path) or not owned_privately(path):
+        raise OSError(errno.EPERM, "not a private directory", path)
+    return path
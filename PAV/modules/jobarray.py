@@ -0,0 +1,158 @@
+#!python
+
+#  ###################################################################
+#
+#  Disclaimer and Notice of Copyright 
+#  ==================================
+#
+#  Copyright (c) 2015, Los Alamos National Security, LLC
+#  All rights reserved.
+#
+#  Copyright 2015. Los Alamos National Security, LLC. 
+#  This software was produced under U.S. Government contract 
+#  DE-AC52-06NA25396 for Los Alamos National Laboratory (LANL), 
+#  which is operated by Los Alamos National Security, LLC for 
+#  the U.S. Department of Energy. The U.S. Government has rights 
+#  to use, reproduce, and distribute this software.  NEITHER 
+#  THE GOVERNMENT NOR LOS ALAMOS NATIONAL SECURITY, LLC MAKES 
+#  ANY WARRANTY, EXPRESS OR IMPLIED, OR ASSUMES ANY LIABILITY 
+#  FOR THE USE OF THIS SOFTWARE.  If software is modified to 
+#  produce derivative works, such modified software should be 
+#  clearly marked, so as not to confuse it with the version 
+#  available from LANL.
+#
+#  Additionally, redistribution and use in source and binary 
+#  forms, with or without modification, are permitted provided 
+#  that the following conditions are met:
+#  -  Redistributions of source code must retain the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer. 
+#  -  Redistributions in binary form must reproduce the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer in the documentation 
+#     and/or other materials provided with the distribution. 
+#  -  Neither the name of Los Alamos National Security, LLC, 
+#     Los Alamos National Laboratory, LANL, the U.S. Government, 
+#     nor the names of its contributors may be used to endorse 
+#     or promote products derived from this software without 
+#     specific prior written permission.
+#   
+#  THIS SOFTWARE IS PROVIDED BY LOS ALAMOS NATIONAL SECURITY, LLC 
+#  AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+#  INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF 
+#  MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+#  IN NO EVENT SHALL LOS ALAMOS NATIONAL SECURITY, LLC OR CONTRIBUTORS 
+#  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, 
+#  OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, 
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, 
+#  OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY 
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR 
+#  TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT 
+#  OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY 
+#  OF SUCH DAMAGE.
+#
+#  ###################################################################
+
+
+"""  Support for submitting test variations as job arrays. Variations that
+     make the same request of the scheduler are gathered into one array
+     directory, prepared as usual by the job dispatcher, and then handed to
+     the scheduler with a single submit command.
+"""
+
+import sys
+import os
+import glob
+import datetime
+import logging
+
+from runjob import load_jcmod
+
+
+class JobArrays():
+    """
+    class to group dispatched test variations into job arrays
+    """
+
+    # keep within the default Slurm MaxArraySize
+    max_tasks = 1000
+
+    def __init__(self):
+
+        my_name = self.__class__.__name__
+        self.logger = logging.getLogger('pav.' + my_name)
+
+        # array key -> array currently being filled
+        self.arrays = {}
+        # arrays ready to be submitted
+        self.full = []
+        self.made = 0
+
+    def new_array(self, test_entry):
+        params = test_entry.get_values()
+        self.made += 1
+        array_dir = test_entry.get_results_location() + "/job_arrays/" + test_entry.get_name() + "__" + \
+            datetime.datetime.now().strftime('%Y-%m-%dT%H:%M:%S:%f') + "__" + str(os.getpid()) + \
+            "." + str(self.made)
+        os.umask(0o002)
+        os.makedirs(array_dir, 0o775)
+        self.logger.info('new job array: ' + array_dir)
+        return {'dir': array_dir, 'params': params, 'tasks': 0}
+
+    def add(self, test_entry):
+        """
+        Place the test variation into a job array. Returns the job environment
+        settings the job controller needs to save itself as an array task, or an
+        empty dict if this type of test entry can't be part of an array.
+        """
+        key = test_entry.get_array_key()
+        if key is None:
+            return {}
+
+        if key not in self.arrays:
+            self.arrays[key] = self.new_array(test_entry)
+        array = self.arrays[key]
+
+        task_id = array['tasks']
+        array['tasks'] += 1
+        if array['tasks'] >= JobArrays.max_tasks:
+            self.full.append(self.arrays.pop(key))
+
+        return {'PV_ARRAY_DIR': array['dir'], 'PV_ARRAY_TASK': str(task_id)}
+
+    def submit(self):
+        """
+        Submit every array that has prepared tasks. All the variations must
+        have been prepared (dispatcher finished) before calling this.
+        Returns the number of arrays submitted.
+        """
+        arrays = self.full + self.arrays.values()
+        self.full = []
+        self.arrays = {}
+
+        submitted = 0
+        for array in arrays:
+            # only the tasks that were prepared successfully
+            task_ids = []
+            for task_file in glob.glob(array['dir'] + "/task.*.json"):
+                task_ids.append(int(os.path.basename(task_file).split(".")[1]))
+            if not task_ids:
+                self.logger.info('job array %s: no tasks prepared, not submitted' % array['dir'])
+                continue
+
+            jc = load_jcmod(array['dir'], array['params'])
+            try:
+                jid = jc.submit_array(array['dir'], sorted(task_ids), self.logger)
+            except Exception as e:
+                print "Error: job array %s not submitted, %s" % (array['dir'], str(e))
+                self.logger.error('job array %s not submitted: %s' % (array['dir'], str(e)))
+                continue
+            print "  Submitted job array %s with %d tasks (%s)" % (str(jid), len(task_ids), array['dir'])
+            submitted += 1
+
+        return submitted
+
+
+# this gets called if it's run as a script/program
+if __name__ == '__main__':
+    sys.exit()
@@ -0,0 +1,215 @@
+#!python
+
+#  ###################################################################
+#
+#  Disclaimer and Notice of Copyright 
+#  ==================================
+#
+#  Copyright (c) 2015, Los Alamos National Security, LLC
+#  All rights reserved.
+#
+#  Copyright 2015. Los Alamos National Security, LLC. 
+#  This software was produced under U.S. Government contract 
+#  DE-AC52-06NA25396 for Los Alamos National Laboratory (LANL), 
+#  which is operated by Los Alamos National Security, LLC for 
+#  the U.S. Department of Energy. The U.S. Government has rights 
+#  to use, reproduce, and distribute this software.  NEITHER 
+#  THE GOVERNMENT NOR LOS ALAMOS NATIONAL SECURITY, LLC MAKES 
+#  ANY WARRANTY, EXPRESS OR IMPLIED, OR ASSUMES ANY LIABILITY 
+#  FOR THE USE OF THIS SOFTWARE.  If software is modified to 
+#  produce derivative works, such modified software should be 
+#  clearly marked, so as not to confuse it with the version 
+#  available from LANL.
+#
+#  Additionally, redistribution and use in source and binary 
+#  forms, with or without modification, are permitted provided 
+#  that the following conditions are met:
+#  -  Redistributions of source code must retain the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer. 
+#  -  Redistributions in binary form must reproduce the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer in the documentation 
+#     and/or other materials provided with the distribution. 
+#  -  Neither the name of Los Alamos National Security, LLC, 
+#     Los Alamos National Laboratory, LANL, the U.S. Government, 
+#     nor the names of its contributors may be used to endorse 
+#     or promote products derived from this software without 
+#     specific prior written permission.
+#   
+#  THIS SOFTWARE IS PROVIDED BY LOS ALAMOS NATIONAL SECURITY, LLC 
+#  AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+#  INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF 
+#  MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+#  IN NO EVENT SHALL LOS ALAMOS NATIONAL SECURITY, LLC OR CONTRIBUTORS 
+#  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, 
+#  OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, 
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, 
+#  OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY 
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR 
+#  TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT 
+#  OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY 
+#  OF SUCH DAMAGE.
+#
+#  ###################################################################
+
+
+"""  In-process job dispatch engine. Runs the runjob logic for each test
+     variation in a child forked directly from the running pav command,
+     so the interpreter start-up and module imports are paid only once.
+"""
+
+import sys
+import os
+import time
+import logging
+import signal
+import traceback
+import multiprocessing
+
+import runjob
+
+
+class JobDispatcher():
+    """
+    class to run jobs (test variations) in a bounded set of forked worker processes
+    """
+
+    # how often to look for finished workers while waiting on a free slot
+    poll_interval = 0.1
+
+    def __init__(self, workers=None, serial=False, show_progress=False):
+
+        my_name = self.__class__.__name__
+        self.logger = logging.getLogger('pav.' + my_name)
+
+        if serial:
+            workers = 1
+        elif workers is None:
+            workers = multiprocessing.cpu_count()
+        if workers < 1:
+            raise ValueError("Error: number of concurrent jobs must be at least 1!")
+        self.workers = workers
+        self.serial = serial
+        self.show_progress = show_progress
+        # pid -> job id of every worker still running
+        self.running = {}
+        self.failed = []
+        self.dispatched = 0
+        self.completed = 0
+        self.logger.info('dispatching with at most %d job(s) in flight' % workers)
+
+    @staticmethod
+    def run_child(uid, js_params, env):
+        """
+        Worker side of the dispatcher, never returns. Each job runs in its own
+        forked child so redirecting stdout or changing the umask or current
+        directory while setting up a job never leaks into the next one.
+        """
+        # the parent may be catching these to shut down cleanly
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+        status = 0
+        try:
+            runjob.run_job(uid, js_params, env)
+        except:
+            traceback.print_exc()
+            status = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        # skip the parent's exit handlers
+        os._exit(status)
+
+    def dispatch(self, uid, js_params, env=None):
+        """
+        Start one job as soon as a worker slot is free, blocking the caller
+        (and therefore the generation of more jobs) until then. In serial
+        mode wait for it to finish. env holds job specific environment settings.
+        """
+        # pick up anything that finished since the last dispatch
+        self.reap()
+        while len(self.running) >= self.workers:
+            self.reap(block=True)
+
+        # nothing buffered may be written twice
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        pid = os.fork()
+        if pid == 0:
+            JobDispatcher.run_child(uid, js_params, env)
+
+        self.running[pid] = uid
+        self.dispatched += 1
+        self.logger.debug('%s: dispatched to worker pid %d' % (uid, pid))
+        self.report_progress()
+
+        if self.serial:
+            self.wait()
+
+    def reap(self, block=False):
+        """
+        Collect any finished workers. If block is set, wait until at least one
+        finishes. Returns the number of workers reaped.
+        """
+        while True:
+            done = 0
+            for pid in self.running.keys():
+                wpid, status = os.waitpid(pid, os.WNOHANG)
+                if wpid:
+                    self.job_finished(pid, status)
+                    done += 1
+            if done or not block or not self.running:
+                return done
+            time.sleep(JobDispatcher.poll_interval)
+
+    def job_finished(self, pid, status):
+        uid = self.running.pop(pid)
+        self.completed += 1
+        rc = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+        if rc:
+            self.failed.append(uid)
+            if self.show_progress:
+                sys.stdout.write('\n')
+            print "job_dispatcher: Error: Job failed to run! "
+            print [uid, rc]
+            self.logger.error('%s: worker pid %d failed, exit status %d' % (uid, pid, rc))
+        else:
+            self.logger.debug('%s: worker pid %d complete' % (uid, pid))
+        self.report_progress()
+
+    def progress(self):
+        return '%d dispatched, %d running, %d complete, %d failed' % \
+            (self.dispatched, len(self.running), self.completed, len(self.failed))
+
+    def report_progress(self):
+        if self.show_progress:
+            sys.stdout.write('\r  Jobs: %s ' % self.progress())
+            sys.stdout.flush()
+
+    def wait(self):
+        """
+        Wait for all the dispatched jobs to finish.
+        Returns the number of jobs that failed.
+        """
+        while self.running:
+            self.reap(block=True)
+        if self.show_progress and self.dispatched:
+            sys.stdout.write('\n')
+        self.logger.info('dispatch complete: %s' % self.progress())
+        return len(self.failed)
+
+    def terminate(self):
+        for pid in self.running.keys():
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+        self.wait()
+
+
+# this gets called if it's run as a script/program
+if __name__ == '__main__':
+    sys.exit()
@@ -0,0 +1,398 @@
+#  ###################################################################
+#
+#  Disclaimer and Notice of Copyright 
+#  ==================================
+#
+#  Copyright (c) 2015, Los Alamos National Security, LLC
+#  All rights reserved.
+#
+#  Copyright 2015. Los Alamos National Security, LLC. 
+#  This software was produced under U.S. Government contract 
+#  DE-AC52-06NA25396 for Los Alamos National Laboratory (LANL), 
+#  which is operated by Los Alamos National Security, LLC for 
+#  the U.S. Department of Energy. The U.S. Government has rights 
+#  to use, reproduce, and distribute this software.  NEITHER 
+#  THE GOVERNMENT NOR LOS ALAMOS NATIONAL SECURITY, LLC MAKES 
+#  ANY WARRANTY, EXPRESS OR IMPLIED, OR ASSUMES ANY LIABILITY 
+#  FOR THE USE OF THIS SOFTWARE.  If software is modified to 
+#  produce derivative works, such modified software should be 
+#  clearly marked, so as not to confuse it with the version 
+#  available from LANL.
+#
+#  Additionally, redistribution and use in source and binary 
+#  forms, with or without modification, are permitted provided 
+#  that the following conditions are met:
+#  -  Redistributions of source code must retain the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer. 
+#  -  Redistributions in binary form must reproduce the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer in the documentation 
+#     and/or other materials provided with the distribution. 
+#  -  Neither the name of Los Alamos National Security, LLC, 
+#     Los Alamos National Laboratory, LANL, the U.S. Government, 
+#     nor the names of its contributors may be used to endorse 
+#     or promote products derived from this software without 
+#     specific prior written permission.
+#   
+#  THIS SOFTWARE IS PROVIDED BY LOS ALAMOS NATIONAL SECURITY, LLC 
+#  AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+#  INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF 
+#  MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+#  IN NO EVENT SHALL LOS ALAMOS NATIONAL SECURITY, LLC OR CONTRIBUTORS 
+#  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, 
+#  OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, 
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, 
+#  OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY 
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR 
+#  TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT 
+#  OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY 
+#  OF SUCH DAMAGE.
+#
+#  ###################################################################
+
+
+
+"""  The job log parser.
+     A JobRecord is filled in by reading a job log once, line by line, and
+     holds everything the Pavilion tools look for in it: the <tag> lines
+     (<testName>, <JobID>, <npes>, <nodes>, <params>, <start>, <end>, ...),
+     the <result> verdicts, the trend data and the real time of the job.
+     Post processing, the results index and the chklg, get_results and
+     getNodeCoverage scripts all use it rather than grepping the log for
+     each field in turn.
+     When the job is done the record is also saved, as job_summary.json
+     next to post_complete, and read back from there instead of the log.
+"""
+
+import os
+import re
+import json
+import time
+from collections import OrderedDict
+
+# <tag> lines taken from the start of a line
+header_tags = {
+    '<machine> ': 'machine',
+    '<segName> ': 'segment',
+    '<testName> ': 'test_name',
+    '<npes> ': 'npes',
+    '<JobID> ': 'job_id',
+}
+
+result_re = re.compile(r"<result\w{0,1}>\s*(.+)")
+td_re = re.compile(r"<td>\s+(.*)")
+# what generate_trend_data_file always collected
+trend_data_re = re.compile(r"(<td>\s+(.*))", re.IGNORECASE)
+sftd_re = re.compile(r"<sftd>\s+(.*)")
+# the times printed by the time command
+time_re = re.compile(r"^(real|user|sys)\s+(\S+)")
+tag_re = re.compile(r"^<(\w+)> ?(.*)")
+
+summary_file = "job_summary.json"
+
+
+def split_date_time(value):
+    # " 10-18-2015T02:32:48" -> ('10-18-2015', '02:32:48')
+    parts = value.strip().split("T")
+    date = parts[0]
+    time = parts[1] if len(parts) > 1 else ''
+    return date, re.sub("-.*", "", time)
+
+
+class JobRecord(object):
+
+    """ The facts about one job collected from its log, line by line.
+        The first <result> line with a fail, else the first one, gives the
+        result. Only the first <td> line of each trend data name is kept,
+        with '-' in the name turned into '_'. The last of the header tags,
+        <nodes>, <params>, <start> and <end> lines wins. tags keeps the
+        first value of every <tag> line, as a grep -m 1 would find it.
+    """
+
+    def __init__(self):
+        self.machine = ''
+        self.segment = ''
+        self.test_name = ''
+        self.npes = ''
+        self.job_id = ''
+        self.node_list = ''
+        self.num_nodes = 0
+        self.params = ''
+        # as written in the log
+        self.params_text = self.start_text = self.end_text = ''
+        self.start_date = self.start_time = ''
+        self.end_date = self.end_time = ''
+        self.results = 'unknown'
+        # what chklg would find in the <result> lines
+        self.passed = self.failed = self.learning = False
+        self.real = self.user = self.sys = ''
+        # (name, value, units) of each trend data name, first one wins
+        self.trend_data = []
+        self.td_names = set()
+        # every <td> line, as saved in the trend_data file
+        self.td_lines = []
+        self.sftd_lines = []
+        self.tags = OrderedDict()
+        # (L, P or F, result) for each verdict, in the order found
+        self.verdicts = []
+
+    @classmethod
+    def from_log(cls, log_file):
+        record = cls()
+        with open(log_file) as lf:
+            for line in lf:
+                record.add_line(line.rstrip("\n"))
+        return record
+
+    @classmethod
+    def from_summary(cls, summary):
+        """
+        The record saved in a job_summary.json, loaded with summary_hook.
+        """
+        record = cls()
+        for attr in ('test_name', 'job_id', 'machine', 'segment', 'npes', 'num_nodes',
+                     'real', 'user', 'sys', 'results'):
+            setattr(record, attr, summary[attr])
+        record.node_list = ",".join(summary['nodes'])
+        record.params_text = summary['params']
+        record.params = re.sub(r"\s+", "__", record.params_text)
+        record.start_text = summary['start']
+        record.start_date, record.start_time = split_date_time(record.start_text)
+        record.end_text = summary['end']
+        record.end_date, record.end_time = split_date_time(record.end_text)
+        record.verdicts = [tuple(verdict) for verdict in summary['verdicts']]
+        kinds = set(kind for kind, result in record.verdicts)
+        record.learning, record.passed, record.failed = 'L' in kinds, 'P' in kinds, 'F' in kinds
+        record.trend_data = [tuple(td) for td in summary['trend_data']]
+        record.td_names = set(name for name, value, units in record.trend_data)
+        record.sftd_lines = summary['sftd']
+        record.tags = summary['tags']
+        return record
+
+    @classmethod
+    def for_log(cls, log_file):
+        """
+        The record of a job from the job_summary.json saved with its log when
+        the job finished, or else from the log itself.
+        """
+        run_dir = os.path.dirname(log_file)
+        try:
+            with open(os.path.join(run_dir, summary_file)) as fp:
+                record = cls.from_summary(json.load(fp, object_pairs_hook=summary_hook))
+        except (IOError, ValueError, KeyError, TypeError):
+            return cls.from_log(log_file)
+        # the <td> lines were all saved in the trend_data file
+        try:
+            with open(os.path.join(run_dir, "trend_data")) as fp:
+                record.td_lines = fp.read().splitlines()
+        except IOError:
+            pass
+        return record
+
+    def add_line(self, line):
+
+        match = tag_re.match(line)
+        if match and match.group(1) not in self.tags:
+            self.tags[match.group(1)] = match.group(2)
+
+        match = trend_data_re.search(line)
+        if match:
+            self.td_lines.append(match.group(2))
+
+        for tag, attr in header_tags.items():
+            if line.startswith(tag):
+                setattr(self, attr, line[len(tag):].strip())
+                return
+
+        if line.startswith('<nodes> '):
+            nodes = line[len('<nodes> '):].rstrip("\n")
+            self.num_nodes += len(nodes.split())
+            self.node_list = re.sub(r"\s+", ",", nodes)
+            return
+        if line.startswith('<params> '):
+            self.params_text = line[len('<params> '):]
+            self.params = re.sub(r"\s+", "__", line[len('<params> '):])
+            return
+        if line.startswith('<start> '):
+            self.start_text = line[len('<start> '):].strip()
+            self.start_date, self.start_time = split_date_time(self.start_text)
+            return
+        if line.startswith('<end> '):
+            self.end_text = line[len('<end> '):].strip()
+            self.end_date, self.end_time = split_date_time(self.end_text)
+            return
+
+        match = result_re.search(line)
+        if match:
+            if re.search("LEARN", match.group(1), re.IGNORECASE):
+                self.learning = True
+                self.verdicts.append(('L', match.group(1)))
+            elif re.search("PASS", match.group(1), re.IGNORECASE):
+                self.passed = True
+                self.verdicts.append(('P', match.group(1)))
+            elif re.search("FAIL", match.group(1), re.IGNORECASE):
+                self.failed = True
+                self.verdicts.append(('F', match.group(1)))
+            # the first pass, unless there is a fail, then the first fail
+            result = re.sub("[,:].+$", "", match.group(1)).strip()
+            if 'unknown' in self.results:
+                self.results = result
+            if re.search("fail", result, re.IGNORECASE) and not re.search("fail", self.results, re.IGNORECASE):
+                self.results = result
+            return
+
+        match = td_re.search(line)
+        if match:
+            fields = match.group(1).split()
+            if not fields:
+                return
+            name = fields[0].replace("-", "_")
+            if name not in self.td_names:
+                self.td_names.add(name)
+                self.trend_data.append((name,
+                                        fields[1] if len(fields) > 1 else '',
+                                        fields[2] if len(fields) > 2 else ''))
+            return
+
+        match = sftd_re.search(line)
+        if match:
+            self.sftd_lines.append(match.group(1))
+            return
+
+        match = time_re.search(line)
+        if match:
+            setattr(self, match.group(1), match.group(2))
+
+    def status(self, finished=True):
+        """
+        PASS, FAIL, LEARN, UNDEF (finished without a result) or INCOMPLETE,
+        a failure anywhere wins, as with chklg.
+        """
+        if self.failed:
+            return 'FAIL'
+        if self.passed:
+            return 'PASS'
+        if self.learning:
+            return 'LEARN'
+        return 'UNDEF' if finished else 'INCOMPLETE'
+
+    def summary(self):
+        """
+        The record as saved in the job_summary.json of the job.
+        """
+        return OrderedDict([
+            ('test_name', self.test_name), ('job_id', self.job_id),
+            ('machine', self.machine), ('segment', self.segment),
+            ('npes', self.npes), ('num_nodes', self.num_nodes),
+            ('nodes', [node for node in self.node_list.split(",") if node]),
+            ('params', self.params_text), ('start', self.start_text), ('end', self.end_text),
+            ('real', self.real), ('user', self.user), ('sys', self.sys),
+            ('result', self.status()), ('results', self.results),
+            ('verdicts', self.verdicts), ('trend_data', self.trend_data),
+            ('sftd', self.sftd_lines), ('tags', self.tags),
+        ])
+
+    def real_time(self):
+        try:
+            return float(self.real)
+        except ValueError:
+            return None
+
+    def num_nodes_str(self):
+        return str(self.num_nodes) if self.num_nodes else ''
+
+    def csv_rows(self):
+        """
+        Lines for the test_results.csv file, one per trend data name.
+        """
+        common = [self.start_date, self.start_time, self.end_date, self.end_time,
+                  self.test_name, self.job_id, self.segment, self.num_nodes_str(), self.npes,
+                  '"%s"' % self.params, self.results]
+        if self.num_nodes == 1:
+            node_name = self.node_list.rstrip(",")
+        else:
+            node_name = "multi"
+
+        if not self.trend_data:
+            return [",".join(common + ['', '', '', '"%s"' % node_name]) + "\n"]
+
+        rows = []
+        for name, value, units in self.trend_data:
+            # the node name may be appended to the trend data name with a "+"
+            parts = name.split("+")
+            if len(parts) == 2:
+                name, node_name = parts
+            rows.append(",".join(common + [name, value, units, node_name]) + "\n")
+        return rows
+
+    def splunk_record(self):
+        td_list = " ".join("%s=%s" % (name, value) for name, value, units in self.trend_data)
+        record = "%s %s EndDate=%s EndTime=%s TestName=%s JobId=%s " % \
+                 (self.start_date, self.start_time, self.end_date, self.end_time,
+                  self.test_name, self.job_id)
+        if self.machine:
+            record += "MachineName=%s " % self.machine
+        record += 'SegmentName=%s NumNodes=%s NumCores=%s ParamList="%s" Results=%s %s NodeList="%s"\n' % \
+                  (self.segment, self.num_nodes_str(), self.npes, self.params, self.results,
+                   td_list, self.node_list.rstrip(","))
+        return record
+
+
+def summary_hook(pairs):
+    # json gives unicode, the records hold plain (utf-8) strings like the log
+    def plain(value):
+        if isinstance(value, unicode):
+            return value.encode("utf-8")
+        if isinstance(value, list):
+            return [plain(v) for v in value]
+        return value
+    return OrderedDict((plain(k), plain(v)) for k, v in pairs)
+
+
+def log_date(log_file):
+    # the log's modification time, as Oct-18-2015 02:32:48
+    wday, mon, day, hms, year = time.ctime(os.stat(log_file).st_mtime).split()
+    return "%s-%s-%s %s" % (mon, day, year, hms)
+
+
+def chklg_report(log_file, record=None):
+    """
+    What chklg prints for a log, the verdicts found and the final
+    RESULT=PASSED, FAILED, LEARNING or UNDEFINED line.
+    """
+    if record is None:
+        record = JobRecord.from_log(log_file)
+    lines = []
+    for kind, result in record.verdicts:
+        if kind == 'L':
+            lines.append("  Matched =>(L)\n")
+        else:
+            lines.append("  Matched =>(%s), %s\n" % (kind, result))
+
+    test_name = record.tags.get('testName', '').split()
+    test_name = test_name[0] if test_name else ''
+    match = re.match(r"\d+", record.tags.get('JobID', ''))
+    job_id = match.group(0) if match else 'undef'
+
+    status = record.status()
+    if status == 'UNDEF':
+        # post_complete exists only when the job is finished
+        if os.path.exists(os.path.join(os.path.dirname(log_file), "post_complete")):
+            lines.append("  No Match =>(U), UNKNOWN, no explicit pass/fail results in output\n")
+        else:
+            lines.append("  No Match =>(I), INCOMPLETE, job did not finish\n")
+    result = {'PASS': 'PASSED', 'FAIL': 'FAILED', 'LEARN': 'LEARNING'}.get(status, 'UNDEFINED')
+    lines.append("  %s %s:%s :: RESULT=%s\n" % (log_date(log_file), test_name, job_id, result))
+    return "".join(lines)
+
+
+def tag_report(record):
+    """
+    The first value of each <tag> in the log and the real time, one per line.
+    """
+    lines = ["<%s> %s\n" % (tag, value) for tag, value in record.tags.items()]
+    if record.real:
+        lines.append("real %s\n" % record.real)
+    return "".join(lines)
+
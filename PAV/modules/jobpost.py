@@ -0,0 +1,191 @@
+#  ###################################################################
+#
+#  Disclaimer and Notice of Copyright 
+#  ==================================
+#
+#  Copyright (c) 2015, Los Alamos National Security, LLC
+#  All rights reserved.
+#
+#  Copyright 2015. Los Alamos National Security, LLC. 
+#  This software was produced under U.S. Government contract 
+#  DE-AC52-06NA25396 for Los Alamos National Laboratory (LANL), 
+#  which is operated by Los Alamos National Security, LLC for 
+#  the U.S. Department of Energy. The U.S. Government has rights 
+#  to use, reproduce, and distribute this software.  NEITHER 
+#  THE GOVERNMENT NOR LOS ALAMOS NATIONAL SECURITY, LLC MAKES 
+#  ANY WARRANTY, EXPRESS OR IMPLIED, OR ASSUMES ANY LIABILITY 
+#  FOR THE USE OF THIS SOFTWARE.  If software is modified to 
+#  produce derivative works, such modified software should be 
+#  clearly marked, so as not to confuse it with the version 
+#  available from LANL.
+#
+#  Additionally, redistribution and use in source and binary 
+#  forms, with or without modification, are permitted provided 
+#  that the following conditions are met:
+#  -  Redistributions of source code must retain the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer. 
+#  -  Redistributions in binary form must reproduce the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer in the documentation 
+#     and/or other materials provided with the distribution. 
+#  -  Neither the name of Los Alamos National Security, LLC, 
+#     Los Alamos National Laboratory, LANL, the U.S. Government, 
+#     nor the names of its contributors may be used to endorse 
+#     or promote products derived from this software without 
+#     specific prior written permission.
+#   
+#  THIS SOFTWARE IS PROVIDED BY LOS ALAMOS NATIONAL SECURITY, LLC 
+#  AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+#  INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF 
+#  MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+#  IN NO EVENT SHALL LOS ALAMOS NATIONAL SECURITY, LLC OR CONTRIBUTORS 
+#  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, 
+#  OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, 
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, 
+#  OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY 
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR 
+#  TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT 
+#  OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY 
+#  OF SUCH DAMAGE.
+#
+#  ###################################################################
+
+
+
+"""  Post processing of a job log in a single pass.
+     A JobLogFollower reads the job log while the job is running and hands
+     each new line to a JobRecord (see joblog.py), which keeps the facts the
+     results are made of (<testName>, <nodes>, <start>, <end>, <result>, <td>,
+     real, ...).
+     The trend_data file, the CSV results and the Splunk data are then all
+     written from that record instead of each re-reading the whole log.
+"""
+
+import os
+import json
+import errno
+import fcntl
+import threading
+
+from joblog import JobRecord, summary_file
+
+csv_header = "StartDate,StartTime,EndDate,EndTime,TestName,JobId,SegmentName," \
+             "NumNodes,NumCores,Params,Results,tdName,tdVal,tdUnits,Node\n"
+
+
+class JobLogFollower(threading.Thread):
+
+    """ Parses the job log into a JobRecord as the job writes it. """
+
+    poll_interval = 0.5
+
+    def __init__(self, log_file):
+        threading.Thread.__init__(self, name="JobLogFollower")
+        self.daemon = True
+        self.log_file = log_file
+        self.record = JobRecord()
+        self.stopping = threading.Event()
+        self.error = None
+
+    def run(self):
+        partial = ''
+        try:
+            # read the raw descriptor, a stdio file stays at EOF once it reaches it
+            fd = os.open(self.log_file, os.O_RDONLY)
+            try:
+                while True:
+                    last_pass = self.stopping.is_set()
+                    while True:
+                        chunk = os.read(fd, 1 << 16)
+                        if not chunk:
+                            break
+                        lines = (partial + chunk).split("\n")
+                        partial = lines.pop()
+                        for line in lines:
+                            self.record.add_line(line)
+                    if last_pass:
+                        break
+                    self.stopping.wait(self.poll_interval)
+            finally:
+                os.close(fd)
+            if partial:
+                self.record.add_line(partial)
+        except (OSError, IOError) as err:
+            self.error = err
+
+    def finish(self):
+        """
+        Read what is left of the log, returns the record of the whole log.
+        """
+        self.stopping.set()
+        self.join()
+        if self.error:
+            # fall back to reading it all again
+            return JobRecord.from_log(self.log_file)
+        return self.record
+
+
+def write_trend_data(results_dir, record):
+    with open(os.path.join(results_dir, "trend_data"), "w") as out_file:
+        for td in record.td_lines:
+            out_file.write(td + "\n")
+
+
+def write_summary(results_dir, record):
+    """
+    Save the record as the job_summary.json of the run, for the tools that
+    would otherwise parse the whole log again.
+    """
+    path = os.path.join(results_dir, summary_file)
+    with open(path + ".tmp", "w") as fp:
+        json.dump(record.summary(), fp, separators=(",", ":"))
+        fp.write("\n")
+    # readers never see half of it
+    os.rename(path + ".tmp", path)
+
+
+def write_csv(result_root, record):
+    """
+    Add the rows of the job to the running results of all the jobs,
+    test_results.csv in the results root. Many jobs can finish at once, so
+    the rows are added as a single write under an exclusive lock, and the
+    header only by whoever finds the file empty.
+    """
+    csv_file = os.path.join(result_root, "test_results.csv")
+    rows = "".join(record.csv_rows())
+    fd = os.open(csv_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o664)
+    try:
+        try:
+            # a POSIX lock, also honoured across NFS clients
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+        except IOError as err:
+            # no locks on this file system, the append is still one write
+            if err.errno not in (errno.ENOLCK, errno.EOPNOTSUPP, errno.EINVAL):
+                raise
+        if os.fstat(fd).st_size == 0:
+            rows = csv_header + rows
+        while rows:
+            rows = rows[os.write(fd, rows):]
+    finally:
+        # also releases the lock
+        os.close(fd)
+
+
+def write_splunk(results_dir, record, splunk_gdl=None):
+    """
+    Write my.splunkdata to the results directory, unless the job made its
+    own .splunkdata file, and add it to the Splunk global data log if given.
+    """
+    own = sorted(f for f in os.listdir(results_dir) if f.endswith(".splunkdata"))
+    if own:
+        with open(os.path.join(results_dir, own[0])) as fp:
+            data = fp.read()
+        print ".splunkdata file exits, no more work to do!"
+    else:
+        data = "".join(line + "\n" for line in record.sftd_lines) + record.splunk_record()
+        with open(os.path.join(results_dir, "my.splunkdata"), "w") as fp:
+            fp.write(data)
+    if splunk_gdl:
+        with open(splunk_gdl, "a") as fp:
+            fp.write(data)
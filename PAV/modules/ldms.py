@@ -82,7 +82,7 @@ class LDMS():
         self.metric_list = str(params['ldms']['metric_list'])
 
         self.output_dir = self.create_output_dir()
-        self.build_start_cmd()
+        self.full_start_cmd = self.build_start_cmd()
 
     def create_output_dir(self):
         # This dir must be created before LDMS can start and should
@@ -108,7 +108,6 @@ class LDMS():
 
         print "Created ldms metrics dir: " + output_dir
 
-        os.environ['LDMS_OUTPUT_DIR'] = output_dir
         return output_dir
 
     def build_start_cmd(self):
@@ -116,19 +115,27 @@ class LDMS():
         full_cmd += " -f " + str(self.freq)
         full_cmd += " -m " + self.metric_list
         full_cmd += " -s " + self.output_dir
-        os.environ['LDMS_START_CMD'] = full_cmd
+        return full_cmd
+
+    def get_env(self):
+        # the job environment settings LDMS.start needs within the job
+        return {'LDMS_OUTPUT_DIR': self.output_dir,
+                'LDMS_START_CMD': self.full_start_cmd}
 
     # define some static methods for LDMS job control
 
     @staticmethod
-    def start():
+    def start(env=None):
         # start and don't wait. Report success or fail in the log(s).
-        outfile = os.environ['LDMS_OUTPUT_DIR'] + "/ldms.out"
-        print "  starting LDMS with: \n    " + os.environ['LDMS_START_CMD']
+        # env is the job's complete environment, os.environ by default
+        if env is None:
+            env = os.environ
+        outfile = env['LDMS_OUTPUT_DIR'] + "/ldms.out"
+        print "  starting LDMS with: \n    " + env['LDMS_START_CMD']
 
         text_file = open(outfile, "w")
         try:
-            subprocess.Popen(os.environ['LDMS_START_CMD'], stdout=text_file, stdin=open(os.devnull), shell=True)
+            subprocess.Popen(env['LDMS_START_CMD'], stdout=text_file, stdin=open(os.devnull), shell=True, env=env)
         except subprocess.CalledProcessError as e:
             ret = e.returncode
             if ret in (1, 2):
@@ -62,18 +62,22 @@
 # Input:  stdin stream of lines with, hopefully, trend data lines included
 #  ex. of a valid line is:
 #    Test4.2x32(10 1024) jid(109959) 2014-09-04T08:43:22-0600 avg_iterTime 0.002910 sec
+#  or, with --store <results root>, the same lines made from the trend data store
 # Output: Should be a messaged indicating where output plot files reside
 
 import sys
 import re
 import os
+import time
 import datetime
+from optparse import OptionParser
 from numpy import loadtxt
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 
 import logging
+import trendstore
 
 
 def get_subdirectories( dir):
@@ -343,7 +347,42 @@ def makesingleboxplot(thisdirname, subdirname, thisfilename):
     return nnodes
 
 
+def store_lines(result_root, test_name=None, start=None, end=None):
+    """
+    The per node trend data of the results root, as the get_results -T
+    lines, read from the trend data store (see trendstore.py) instead of
+    from every log.
+    """
+    store = trendstore.synced_store(result_root)
+    rows = store.select(('time', 'value', 'td', 'series', 'node', 'job'), test_name, start, end)
+    for i in xrange(len(rows)):
+        node, = rows.label('node', i)
+        if node in ('', 'multi'):
+            continue
+        test, nodes, npes, params = rows.label('series', i)
+        name, units = rows.label('td', i)
+        job_id, = rows.label('job', i)
+        yield "\t%s.%sx%s(%s) jid(%s) %s %s+%s %.15g %s\n" % \
+              (test, nodes, npes, params.strip('"').replace("__", " "), job_id,
+               time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(rows.columns['time'][i])),
+               name, node, rows.columns['value'][i], units)
+
+
 def main():
+    parser = OptionParser()
+    parser.add_option("--store", dest="result_root",
+                      help="read the trend data store of this results root instead of stdin")
+    parser.add_option("-t", dest="test_name")
+    parser.add_option("-s", dest="start", help="'YYYY-MM-DD HH:MM:SS'")
+    parser.add_option("-e", dest="end", help="'YYYY-MM-DD HH:MM:SS'")
+    options, args = parser.parse_args()
+    if options.result_root:
+        start, end = [time.mktime(time.strptime(t, "%Y-%m-%d %H:%M:%S")) if t else None
+                      for t in (options.start, options.end)]
+        lines = store_lines(options.result_root, options.test_name, start, end)
+    else:
+        lines = sys.stdin
+
     sub_dir = "Boxplots-" + datetime.datetime.now().strftime('%m-%d-%YT%H:%M:%S:%f')
 
     # if "HOME" in self.output_dir_root:
@@ -370,7 +409,7 @@ def main():
 
     prelimout = open(AllDataFile, "w")
     # print "Making box plots with data from:"
-    for line in sys.stdin:
+    for line in lines:
         searchObj = re.search(r'jid\(', line, re.M|re.I)
         # isreportable = line.find( "+" )
         isreportable = -1
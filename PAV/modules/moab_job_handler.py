@@ -73,7 +73,7 @@ import random
 
 newpath = os.environ['PVINSTALL'] + "/PAV/modules"
 sys.path.append(newpath)
-from basejobcontroller import JobController
+from basejobcontroller import JobController, JobEnv
 from ldms import LDMS
 
 
@@ -91,7 +91,7 @@ def stdout_redirected(new_stdout):
         sys.stdout = save_stdout
 
 
-def get_moab_node_list():
+def get_moab_node_list(job_env):
 
     checkjobAttempts = 0
 
@@ -99,8 +99,9 @@ def get_moab_node_list():
         try:
             if "SLURM_JOBID" in os.environ:
                 # ++ PV_JOBID : Job Id allocated to this job by the "scheduler"
-                os.environ['PV_JOBID'] = os.environ.get("SLURM_JOBID")
-                output = subprocess.check_output(os.environ['PVINSTALL'] + "/PAV/scripts/getSLURMNodeList", shell=True)
+                job_env['PV_JOBID'] = os.environ.get("SLURM_JOBID")
+                output = subprocess.check_output(os.environ['PVINSTALL'] + "/PAV/scripts/getSLURMNodeList", shell=True,
+                                                 env=job_env.export())
                 nodes = output.replace('\n', " ")
             elif "PBS_JOBID" in os.environ:
                 output = subprocess.check_output(os.environ['PVINSTALL'] + "/PAV/scripts/getCLENodeList", shell=True)
@@ -134,11 +135,36 @@ def get_segment_name():
     return sn
 
 
+def array_task_id():
+    # Moab sets its own index, but passes through the one of the
+    # resource manager underneath on some systems
+    for v in ["MOAB_JOBARRAYINDEX", "PBS_ARRAYID", "SLURM_ARRAY_TASK_ID"]:
+        if v in os.environ:
+            return os.environ[v]
+    return None
+
+
+def load_array_task():
+    """
+      When running as a task of a job array pick up the settings
+      of the test variation this task runs.
+    """
+    task_id = array_task_id()
+    if "PV_ARRAY_DIR" in os.environ and task_id is not None:
+        task = JobController.load_array_task(os.environ['PV_ARRAY_DIR'], task_id)
+        os.environ.update(task['env'])
+        return True
+    return False
+
+
 def main():
     """
       Routine called by msub that calls the user's job script/program.
       Will also start LDMS if requested.
     """
+
+    in_array = load_array_task()
+
     job_log_file = os.environ["PV_JOB_RESULTS_LOG"]
 
     with open(job_log_file, 'a') as lf:
@@ -146,10 +172,14 @@ def main():
             cmd = "cd " + os.environ['PV_RUNHOME'] + "; " + \
                os.environ['PVINSTALL'] + "/PAV/scripts/mytime " + os.environ['USER_CMD']
 
-            nodes = get_moab_node_list()
+            # settings made by this handler, passed on to the user's job and post processing
+            job_env = JobEnv()
+
+            nodes = get_moab_node_list(job_env)
             # ++ PV_NODES : List of node names allocated to this job
-            os.environ['PV_NODES'] = nodes
-            os.environ['GZ_NODES'] = os.environ['PV_NODES']
+            job_env['PV_NODES'] = nodes
+            job_env['GZ_NODES'] = job_env['PV_NODES']
+            env = job_env.export()
  
             #redirect STDERR to the same file
             sys.stderr = lf
@@ -157,6 +187,9 @@ def main():
             sn = get_segment_name()
             print "<segName> " + sn
 
+            if in_array and "MOAB_JOBID" in os.environ:
+                print "<JobID> " + os.environ['MOAB_JOBID']
+
             print "<nodes> " + nodes + "\n"
             print "moab_job_handler: "
 
@@ -165,11 +198,14 @@ def main():
             try:
                 if os.environ['LDMS_START_CMD']:
                     print "start ldms! "
-                    LDMS.start()
+                    LDMS.start(env)
             except KeyError, e:
                 #print 'I got a KeyError - no: "%s"' % str(e)
                 pass
 
+            # parse the job log while the job runs
+            follower = JobController.follow_job_log(env)
+
             print "<start>", now()
             print "  start job with: \n    " + cmd
             lf.flush()
@@ -178,25 +214,9 @@ def main():
             # This works with job_out_file = /users/cwi/mystdout
             #subprocess.call(cmd1, stdout=job_out_file, shell=True)
 
-            subprocess.call(cmd, stdout=lf, stderr=lf, shell=True)
-
-            # The post_complete file needs to be placed in the results dir
-            # for Gazebo compatibility
-            pcf = os.environ["PV_JOB_RESULTS_LOG_DIR"] + "/post_complete"
-            text_file = open(pcf, "w")
-            text_file.write("{}\n".format("command complete"))
-            JobController.run_epilog()
-            text_file.write("{}\n".format("epilog complete"))
-            JobController.cleanup()
-            text_file.write("{}\n".format("cleanup complete"))
-            text_file.close()
-
-            print "<end>", now()
-            lf.flush()
+            subprocess.call(cmd, stdout=lf, stderr=lf, shell=True, env=env)
 
-            # The trend_data file needs to be placed in the results dir
-            # for Gazebo compatibility
-            JobController.process_trend_data()
+            JobController.post_process(env, follower, now)
 
 
 # this gets called if it's run as a script/program
@@ -62,7 +62,7 @@ import os
 import subprocess
 import re
 from basejobcontroller import JobController
-from helperutilities import which
+from helperutilities import which, array_ranges
 
 
 class MoabJobController(JobController):
@@ -73,18 +73,32 @@ class MoabJobController(JobController):
         create dynamic moab_job_handler script if users script contains msub
         DW directives.
         """
+        # kept with the job's results so concurrent jobs never share one
+        return MoabJobController.msub_wrapper(user_script, self.env['PV_JOB_RESULTS_LOG_DIR'],
+                                              self.logger, self.lh)
 
-        fixed_cmd = os.environ['PVINSTALL'] + "/PAV/modules/moab_job_handler.py"
+    @staticmethod
+    def job_handler():
+        return os.environ['PVINSTALL'] + "/PAV/modules/moab_job_handler.py"
+
+    @staticmethod
+    def msub_wrapper(user_script, wrapper_dir, logger, lh=''):
+        """
+        Returns the script to submit with msub, normally the moab_job_handler.
+        If DataWarp directives exist in the user script a new wrapper script is
+        built on the fly in wrapper_dir.
+        """
+
+        fixed_cmd = MoabJobController.job_handler()
         my_moab_wrapper_text = ""
 
-        # if DataWarp directives exist in the user script build new wrapper script on the fly
         with open(user_script) as f:
             match = re.findall('^#DW\s.+', f.read(), re.MULTILINE)
             if match:
                 first_line = "#!/usr/bin/env python"
                 my_moab_wrapper_text += first_line + "\n"
                 for md in match:
-                    self.logger.info(self.lh + " : adding directive: " + str(md))
+                    logger.info(lh + " : adding directive: " + str(md))
                     my_moab_wrapper_text += md + "\n"
 
                 with open(fixed_cmd, 'r') as fc:
@@ -93,8 +107,7 @@ class MoabJobController(JobController):
                             for next_line in fc:  # here are the lines we want
                                 my_moab_wrapper_text += next_line
 
-                my_home_dir = os.path.expanduser("~")
-                my_moab_wrapper = my_home_dir + "/my_moab_wrapper" + ".py"
+                my_moab_wrapper = wrapper_dir + "/my_moab_wrapper" + ".py"
                 mw = open(my_moab_wrapper, "w")
                 mw.write(my_moab_wrapper_text)
                 mw.close()
@@ -105,7 +118,6 @@ class MoabJobController(JobController):
 
         return dyn_cmd
 
-
     @staticmethod
     def is_moab_system():
         #if os.path.isfile("/etc/toss-release"):
@@ -155,13 +167,13 @@ class MoabJobController(JobController):
         if 'machine_type' in self.configs['moab'] and self.configs['moab']['machine_type']:
             machine_type = self.configs['moab']['machine_type']
         # ++ PV_MACHINETYPE : The type of machine requested from moab
-        os.environ['PV_MACHINETYPE'] = machine_type
+        self.env['PV_MACHINETYPE'] = machine_type
 
         os_type = ''
         if 'os' in self.configs['moab'] and self.configs['moab']['os']:
             os_type = self.configs['moab']['os']
         # ++ PV_OS : The os type requested from moab
-        os.environ['PV_OS'] = os_type
+        self.env['PV_OS'] = os_type
 
         msub_args = ''
         if 'msub_args' in self.configs['moab'] and self.configs['moab']['msub_args']:
@@ -183,17 +195,17 @@ class MoabJobController(JobController):
         self.logger.info(self.lh + " : npes=" + str(pes))
 
         # ++ PV_PESPERNODE : Number of cores per node
-        os.environ['GZ_PESPERNODE'] = ppn
-        os.environ['PV_PESPERNODE'] = ppn
+        self.env['GZ_PESPERNODE'] = ppn
+        self.env['PV_PESPERNODE'] = ppn
 
         # ++ PV_NNODES : Number of nodes allocated for this job
-        os.environ['GZ_NNODES'] = nnodes
-        os.environ['PV_NNODES'] = nnodes
+        self.env['GZ_NNODES'] = nnodes
+        self.env['PV_NNODES'] = nnodes
         print "<nnodes> " + nnodes
 
         # ++ PV_NPES : Number of pe's allocated for this job
-        os.environ['PV_NPES'] = str(pes)
-        os.environ['GZ_NPES'] = os.environ['PV_NPES']
+        self.env['PV_NPES'] = str(pes)
+        self.env['GZ_NPES'] = self.env['PV_NPES']
         print "<npes> " + str(pes)
 
         # create working space here so that each msub run gets its own
@@ -202,13 +214,6 @@ class MoabJobController(JobController):
         # print the common log settings here right after the job is started
         self.save_common_settings()
 
-        # setup unique Moab stdout and stderr file names
-        # Handle differences between moab-slurm, moab-cle, etc. ??
-        # ++ PV_JOB_RESULTS_LOG_DIR : Path where results for this job are placed
-        se = os.environ['PV_JOB_RESULTS_LOG_DIR'] + "/drm.stderr"
-        so = os.environ['PV_JOB_RESULTS_LOG_DIR'] + "/drm.stdout"
-        msub_cmd += "-o " + so + " -e " + se + " "
-
         if node_list:
             msub_cmd += "-l nodes=" + node_list
         else:
@@ -228,8 +233,20 @@ class MoabJobController(JobController):
             msub_cmd += " " + msub_args
 
         # ++ PV_RUNHOME : Path where this job is run from
-        run_cmd = os.environ['PV_RUNHOME'] + "/" + self.configs['run']['cmd']
-        os.environ['USER_CMD'] = run_cmd
+        run_cmd = self.env['PV_RUNHOME'] + "/" + self.configs['run']['cmd']
+        self.env['USER_CMD'] = run_cmd
+
+        # variations with the same request are submitted together as a job array
+        if self.in_job_array():
+            self.save_array_task(msub_cmd)
+            return
+
+        # setup unique Moab stdout and stderr file names
+        # Handle differences between moab-slurm, moab-cle, etc. ??
+        # ++ PV_JOB_RESULTS_LOG_DIR : Path where results for this job are placed
+        se = self.env['PV_JOB_RESULTS_LOG_DIR'] + "/drm.stderr"
+        so = self.env['PV_JOB_RESULTS_LOG_DIR'] + "/drm.stdout"
+        msub_cmd += " -o " + so + " -e " + se
 
         # msub_cmd += " " + os.environ['PVINSTALL'] + "/PAV/modules/moab_job_handler.py"
 
@@ -239,7 +256,9 @@ class MoabJobController(JobController):
             self.logger.info(self.lh + " : " + msub_cmd)
             # call to invoke real Moab command
             try:
-               output = subprocess.check_output(msub_cmd, shell=True, stderr=subprocess.STDOUT)
+               # msub -V exports the submitting environment to the job
+               output = subprocess.check_output(msub_cmd, shell=True, stderr=subprocess.STDOUT,
+                                                env=self.env.export())
             except subprocess.CalledProcessError as e:
                self.logger.info(self.lh + " : msub exit status:" + str(e.returncode))
                print "msub exit status:" + str(e.returncode)
@@ -248,18 +267,13 @@ class MoabJobController(JobController):
                sys.stdout.flush()
                raise
 
-            # Finds the jobid in the output from msub. The job id can either
-            # be just a number or Moab.number.
-            match = re.search("^((Moab.)?(\d+))[\r]?$",  output, re.IGNORECASE | re.MULTILINE)
-            jid = 0
-            if match.group(1):
-                jid = match.group(1)
-            print "<JobID> " + str(jid)
+            print "<JobID> " + str(MoabJobController.find_job_id(output))
 
         else:
             # fake-out section to run on basic unix system
-            fake_job_cmd = os.environ['PVINSTALL'] + "/PAV/modules/moab_job_handler.py"
-            p = subprocess.Popen(fake_job_cmd, stdout=self.job_log_file, stderr=self.job_log_file, shell=True)
+            fake_job_cmd = MoabJobController.job_handler()
+            p = subprocess.Popen(fake_job_cmd, stdout=self.job_log_file, stderr=self.job_log_file, shell=True,
+                                 env=self.env.export())
             # wait for the subprocess to finish
             (output, errors) = p.communicate()
             if p.returncode or errors:
@@ -267,6 +281,59 @@ class MoabJobController(JobController):
                 print [p.returncode, errors, output]
                 self.logger.info(self.lh + " run error: " + errors)
 
+    @staticmethod
+    def find_job_id(output):
+        # Finds the jobid in the output from msub. The job id can either
+        # be just a number or Moab.number.
+        match = re.search("^((Moab.)?(\d+))[\r]?$",  output, re.IGNORECASE | re.MULTILINE)
+        jid = 0
+        if match and match.group(1):
+            jid = match.group(1)
+        return jid
+
+    @staticmethod
+    def submit_array(array_dir, task_ids, logger):
+        """
+        Submit the tasks saved in array_dir (see save_array_task) as one
+        Moab job array using a single generated wrapper. The job handler selects
+        its task by the array index Moab (or the underlying resource manager) sets.
+        """
+        task = JobController.load_array_task(array_dir, task_ids[0])
+        name = task['env']['PV_TESTNAME']
+
+        # Moab appends the array index to these names
+        se = array_dir + "/drm.stderr"
+        so = array_dir + "/drm.stdout"
+        msub_cmd = task['submit_cmd'] + " -t " + name + "[" + array_ranges(task_ids) + "]"
+        msub_cmd += " -o " + so + " -e " + se
+
+        env = dict(os.environ)
+        env['PV_ARRAY_DIR'] = array_dir
+
+        if MoabJobController.is_moab_system():
+            # every task runs a copy of the same user script
+            msub_cmd += " " + MoabJobController.msub_wrapper(task['env']['USER_CMD'], array_dir, logger)
+            logger.info("submit job array: " + msub_cmd)
+            try:
+                output = subprocess.check_output(msub_cmd, shell=True, stderr=subprocess.STDOUT, env=env)
+            except subprocess.CalledProcessError as e:
+                logger.info("msub exit status:" + str(e.returncode))
+                logger.info("msub output:" + e.output)
+                print "msub exit status:" + str(e.returncode)
+                print "msub output:" + e.output
+                raise
+
+            jid = MoabJobController.find_job_id(output)
+            logger.info("job array %s: %d tasks" % (jid, len(task_ids)))
+            return jid
+
+        else:
+            # fake-out section to run on basic unix system, one task at a time
+            for task_id in task_ids:
+                env['MOAB_JOBARRAYINDEX'] = str(task_id)
+                subprocess.call(MoabJobController.job_handler(), shell=True, env=env)
+            return 0
+
     
 # this gets called if it's run as a script/program
 if __name__ == '__main__':
@@ -0,0 +1,182 @@
+#!python
+
+#  ###################################################################
+#
+#  Disclaimer and Notice of Copyright 
+#  ==================================
+#
+#  Copyright (c) 2015, Los Alamos National Security, LLC
+#  All rights reserved.
+#
+#  Copyright 2015. Los Alamos National Security, LLC. 
+#  This software was produced under U.S. Government contract 
+#  DE-AC52-06NA25396 for Los Alamos National Laboratory (LANL), 
+#  which is operated by Los Alamos National Security, LLC for 
+#  the U.S. Department of Energy. The U.S. Government has rights 
+#  to use, reproduce, and distribute this software.  NEITHER 
+#  THE GOVERNMENT NOR LOS ALAMOS NATIONAL SECURITY, LLC MAKES 
+#  ANY WARRANTY, EXPRESS OR IMPLIED, OR ASSUMES ANY LIABILITY 
+#  FOR THE USE OF THIS SOFTWARE.  If software is modified to 
+#  produce derivative works, such modified software should be 
+#  clearly marked, so as not to confuse it with the version 
+#  available from LANL.
+#
+#  Additionally, redistribution and use in source and binary 
+#  forms, with or without modification, are permitted provided 
+#  that the following conditions are met:
+#  -  Redistributions of source code must retain the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer. 
+#  -  Redistributions in binary form must reproduce the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer in the documentation 
+#     and/or other materials provided with the distribution. 
+#  -  Neither the name of Los Alamos National Security, LLC, 
+#     Los Alamos National Laboratory, LANL, the U.S. Government, 
+#     nor the names of its contributors may be used to endorse 
+#     or promote products derived from this software without 
+#     specific prior written permission.
+#   
+#  THIS SOFTWARE IS PROVIDED BY LOS ALAMOS NATIONAL SECURITY, LLC 
+#  AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+#  INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF 
+#  MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+#  IN NO EVENT SHALL LOS ALAMOS NATIONAL SECURITY, LLC OR CONTRIBUTORS 
+#  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, 
+#  OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, 
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, 
+#  OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY 
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR 
+#  TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT 
+#  OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY 
+#  OF SUCH DAMAGE.
+#
+#  ###################################################################
+
+
+"""  Node utilisation of the machine (or a partition of it), used by the
+     -p fill to percent option. Like the -w job counts the scheduler is
+     asked once per sample, shared by all test entries, and nodes
+     requested by the jobs Pavilion submits in the meantime are counted
+     as allocated.
+"""
+
+import os
+import re
+import subprocess
+import time
+import logging
+
+
+class NodeUsage():
+    """
+    class to sample allocated and total node counts
+    """
+
+    # seconds a sample is used for
+    max_age = 30
+
+    samplers = {}
+
+    # the states sinfo counts as allocated, as with %F
+    allocated_states = ['alloc', 'allocated', 'mix', 'mixed', 'comp', 'completing']
+
+    def __init__(self, cmd, parse):
+
+        my_name = self.__class__.__name__
+        self.logger = logging.getLogger('pav.' + my_name)
+
+        # command reporting node states and the function that turns
+        # its output into (allocated, total) nodes
+        self.cmd = cmd
+        self.parse = parse
+        self.allocated = 0
+        self.total = 0
+        self.sampled = None
+        # nodes requested since the sample
+        self.submitted = 0
+
+    @classmethod
+    def sampler(cls, cmd, parse):
+        """
+        Returns the shared sampler for this query command.
+        """
+        key = tuple(cmd)
+        if key not in cls.samplers:
+            cls.samplers[key] = cls(cmd, parse)
+        return cls.samplers[key]
+
+    @staticmethod
+    def parse_sinfo(output):
+        # sinfo -o %F lines are allocated/idle/other/total
+        allocated = total = 0
+        for li in output.split():
+            fields = li.split('/')
+            if len(fields) == 4:
+                allocated += int(fields[0])
+                total += int(fields[3])
+        return allocated, total
+
+    @staticmethod
+    def parse_sinfo_nodes(output):
+        # sinfo -N -o "%N %t" lines are node and short state, a node in
+        # several partitions is listed once for each of them
+        states = {}
+        for li in output.splitlines():
+            fields = li.split()
+            if len(fields) == 2:
+                # drop the flags (*, ~, #, ...) appended to the state
+                states[fields[0]] = re.sub(r"[^a-z]", "", fields[1].lower())
+        allocated = len([s for s in states.values() if s in NodeUsage.allocated_states])
+        return allocated, len(states)
+
+    @staticmethod
+    def parse_showq(output):
+        # showq summary line "... 8 of 10 nodes active ..."
+        match = re.search(r"(\d+)\s+of\s+(\d+)\s+nodes\s+active", output)
+        if match:
+            return int(match.group(1)), int(match.group(2))
+        return 0, 0
+
+    def sample(self):
+        """
+        Query the scheduler if the last sample is too old.
+        """
+        if self.sampled is not None and time.time() - self.sampled < NodeUsage.max_age:
+            return
+        # ++ PV_NODE_USAGE : Stand-in node states as allocated/idle/other/total, instead of asking the scheduler
+        if os.environ.get('PV_NODE_USAGE'):
+            self.allocated, self.total = NodeUsage.parse_sinfo(os.environ['PV_NODE_USAGE'])
+        else:
+            try:
+                self.allocated, self.total = self.parse(subprocess.check_output(self.cmd))
+            except (OSError, subprocess.CalledProcessError) as err:
+                # nothing known about the nodes, nothing to fill
+                self.logger.info('%s failed: %s' % (self.cmd[0], err))
+                self.allocated = self.total = 0
+        self.submitted = 0
+        self.sampled = time.time()
+        self.logger.info('%s: %d of %d nodes allocated' % (self.cmd[0], self.allocated, self.total))
+
+    def percent_used(self):
+        self.sample()
+        if not self.total:
+            return 0.0
+        return 100.0 * (self.allocated + self.submitted) / self.total
+
+    def room_for(self, nodes, percent):
+        """
+        True if nodes more can be allocated without going over percent
+        usage. Without node counts from the scheduler there is no limit.
+        """
+        self.sample()
+        if not self.total:
+            return True
+        return 100.0 * (self.allocated + self.submitted + nodes) / self.total <= percent
+
+    def add(self, nodes):
+        """
+        Count nodes requested since the last sample.
+        """
+        if self.sampled is not None:
+            self.submitted += nodes
@@ -79,14 +79,14 @@ class RawJobController(JobController):
 
         # what nodes(s) are this job running on...
         nodes = platform.node().partition('.')[0]
-        os.environ['PV_NODES'] = nodes
-        os.environ['GZ_NODES'] = os.environ['PV_NODES']
+        self.env['PV_NODES'] = nodes
+        self.env['GZ_NODES'] = self.env['PV_NODES']
         print "<nodes> " + nodes + "\n"
 
         self.logger.info(self.lh + " : args=" + str(self.configs['run']['test_args']))
 
         # build the exact command to run
-        cmd = "cd " + os.environ['PV_RUNHOME'] + "; " + \
+        cmd = "cd " + self.env['PV_RUNHOME'] + "; " + \
             os.environ['PVINSTALL'] + "/PAV/scripts/mytime ./" + self.configs['run']['cmd']
         print "\n ->  RawJobController: invoke %s" % cmd
 
@@ -98,7 +98,10 @@ class RawJobController(JobController):
         # the object was instantiated
 
         self.logger.info(self.lh + " run: " + cmd)
-        p = subprocess.Popen(cmd, stdout=self.job_log_file, stderr=self.job_log_file, shell=True)
+        env = self.env.export()
+        # parse the job log while the job runs
+        follower = self.follow_job_log(env)
+        p = subprocess.Popen(cmd, stdout=self.job_log_file, stderr=self.job_log_file, shell=True, env=env)
         # wait for the subprocess to finish
         output, errors = p.communicate()
 
@@ -107,22 +110,7 @@ class RawJobController(JobController):
             print [p.returncode, errors, output]
             self.logger.info(self.lh + " run error: " + errors)
 
-        # The post_complete file needs to be placed in the results dir
-        # for Gazebo compatibility
-        pcf = os.environ["PV_JOB_RESULTS_LOG_DIR"] + "/post_complete"
-        text_file = open(pcf, "w")
-        text_file.write("{}\n".format("command complete"))
-        self.run_epilog()
-        text_file.write("{}\n".format("epilog complete"))
-        self.cleanup()
-        text_file.write("{}\n".format("cleanup complete"))
-        text_file.close()
-
-        print "<end>", self.now()
-
-        # The trend_data file needs to be placed in the results dir
-        # for Gazebo compatibility
-        JobController.process_trend_data()
+        self.post_process(env, follower, self.now)
     
 # this gets called if it's run as a script/program
 if __name__ == '__main__':
@@ -0,0 +1,186 @@
+#  ###################################################################
+#
+#  Disclaimer and Notice of Copyright 
+#  ==================================
+#
+#  Copyright (c) 2015, Los Alamos National Security, LLC
+#  All rights reserved.
+#
+#  Copyright 2015. Los Alamos National Security, LLC. 
+#  This software was produced under U.S. Government contract 
+#  DE-AC52-06NA25396 for Los Alamos National Laboratory (LANL), 
+#  which is operated by Los Alamos National Security, LLC for 
+#  the U.S. Department of Energy. The U.S. Government has rights 
+#  to use, reproduce, and distribute this software.  NEITHER 
+#  THE GOVERNMENT NOR LOS ALAMOS NATIONAL SECURITY, LLC MAKES 
+#  ANY WARRANTY, EXPRESS OR IMPLIED, OR ASSUMES ANY LIABILITY 
+#  FOR THE USE OF THIS SOFTWARE.  If software is modified to 
+#  produce derivative works, such modified software should be 
+#  clearly marked, so as not to confuse it with the version 
+#  available from LANL.
+#
+#  Additionally, redistribution and use in source and binary 
+#  forms, with or without modification, are permitted provided 
+#  that the following conditions are met:
+#  -  Redistributions of source code must retain the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer. 
+#  -  Redistributions in binary form must reproduce the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer in the documentation 
+#     and/or other materials provided with the distribution. 
+#  -  Neither the name of Los Alamos National Security, LLC, 
+#     Los Alamos National Laboratory, LANL, the U.S. Government, 
+#     nor the names of its contributors may be used to endorse 
+#     or promote products derived from this software without 
+#     specific prior written permission.
+#   
+#  THIS SOFTWARE IS PROVIDED BY LOS ALAMOS NATIONAL SECURITY, LLC 
+#  AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+#  INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF 
+#  MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+#  IN NO EVENT SHALL LOS ALAMOS NATIONAL SECURITY, LLC OR CONTRIBUTORS 
+#  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, 
+#  OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, 
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, 
+#  OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY 
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR 
+#  TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT 
+#  OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY 
+#  OF SUCH DAMAGE.
+#
+#  ###################################################################
+
+
+
+"""  Discovery of the run directories under a results group directory,
+     <group>/YYYY/YYYY-MM/YYYY-MM-DD/<host>/<test>/<run>.
+     Year, month and day directories outside of the wanted dates are pruned
+     by name before anything below them is read, and the day and test
+     directories are listed by a pool of threads, as on a parallel file
+     system the time goes into waiting on metadata rather than into Python.
+     Results are streamed as they are found, in no particular order.
+"""
+
+import os
+import re
+import fnmatch
+import datetime
+from multiprocessing.pool import ThreadPool
+
+
+def scan_threads():
+    # ++ PV_SCAN_THREADS : Number of threads listing result directories at once
+    try:
+        return max(1, int(os.getenv('PV_SCAN_THREADS', 16)))
+    except ValueError:
+        return 16
+
+
+def listdir(path):
+    try:
+        return os.listdir(path)
+    except OSError:
+        return []
+
+
+def parallel(func, items, threads=None):
+    """
+    Yield func(item) for each item as they complete, using a thread pool.
+    """
+    pool = ThreadPool(threads or scan_threads())
+    try:
+        for result in pool.imap_unordered(func, items):
+            yield result
+    finally:
+        pool.terminate()
+
+
+def day_dirs(grp_dir, first=None, last=None):
+    """
+    The (date, path) of the day directories from the first through the
+    last date (datetime.date, either may be None), pruned by name.
+    """
+    for year in sorted(listdir(grp_dir)):
+        if not re.match(r"^\d{4}$", year):
+            continue
+        if (first and int(year) < first.year) or (last and int(year) > last.year):
+            continue
+        year_dir = os.path.join(grp_dir, year)
+        for month in sorted(listdir(year_dir)):
+            if not re.match(r"^\d{4}-\d\d$", month):
+                continue
+            if (first and month < first.strftime("%Y-%m")) or (last and month > last.strftime("%Y-%m")):
+                continue
+            month_dir = os.path.join(year_dir, month)
+            for name in sorted(listdir(month_dir)):
+                try:
+                    day = datetime.datetime.strptime(name, "%Y-%m-%d").date()
+                except ValueError:
+                    continue
+                if (first and day < first) or (last and day > last):
+                    continue
+                yield day, os.path.join(month_dir, name)
+
+
+def test_dirs(days, machine="*", test="*", threads=None):
+    """
+    Yield (date, test directory, mtime) for the test directories of the
+    (date, path) day directories, listing the days in parallel.
+    """
+    def list_day(day_item):
+        day, day_dir = day_item
+        found = []
+        for host in fnmatch.filter(listdir(day_dir), machine):
+            host_dir = os.path.join(day_dir, host)
+            for name in fnmatch.filter(listdir(host_dir), test):
+                test_dir = os.path.join(host_dir, name)
+                try:
+                    found.append((day, test_dir, os.stat(test_dir).st_mtime))
+                except OSError:
+                    pass
+        return found
+
+    for found in parallel(list_day, days, threads):
+        for item in found:
+            yield item
+
+
+def run_time(name):
+    """
+    The start time (to the second) in a run directory name
+    <test>__<script>__<pid>__<segment>.YYYY-MM-DDTHH:MM:SS:ffffff, else None.
+    """
+    parts = name.split(".")
+    if len(parts) < 2:
+        return None
+    match = re.match(r"^(\d+)-(\d+)-(\d+)T(\d+):(\d+):(\d+)", parts[1])
+    if not match:
+        return None
+    try:
+        return datetime.datetime(*[int(g) for g in match.groups()])
+    except ValueError:
+        return None
+
+
+def run_dirs(grp_dir, start, end, machine="*", test="*", job_id=None, threads=None):
+    """
+    Yield the run directories started from start through end (datetime),
+    optionally only those of a job id, as the test directories holding them
+    are listed in parallel.
+    """
+    def list_test(item):
+        day, test_dir, mtime = item
+        found = []
+        for name in listdir(test_dir):
+            if job_id and "_%s_" % job_id not in name:
+                continue
+            t = run_time(name)
+            if t and start <= t <= end:
+                found.append(os.path.join(test_dir, name))
+        return found
+
+    days = day_dirs(grp_dir, start.date(), end.date())
+    for found in parallel(list_test, test_dirs(days, machine, test, threads), threads):
+        for run_dir in found:
+            yield run_dir
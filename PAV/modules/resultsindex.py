@@ -0,0 +1,422 @@
+#  ###################################################################
+#
+#  Disclaimer and Notice of Copyright 
+#  ==================================
+#
+#  Copyright (c) 2015, Los Alamos National Security, LLC
+#  All rights reserved.
+#
+#  Copyright 2015. Los Alamos National Security, LLC. 
+#  This software was produced under U.S. Government contract 
+#  DE-AC52-06NA25396 for Los Alamos National Laboratory (LANL), 
+#  which is operated by Los Alamos National Security, LLC for 
+#  the U.S. Department of Energy. The U.S. Government has rights 
+#  to use, reproduce, and distribute this software.  NEITHER 
+#  THE GOVERNMENT NOR LOS ALAMOS NATIONAL SECURITY, LLC MAKES 
+#  ANY WARRANTY, EXPRESS OR IMPLIED, OR ASSUMES ANY LIABILITY 
+#  FOR THE USE OF THIS SOFTWARE.  If software is modified to 
+#  produce derivative works, such modified software should be 
+#  clearly marked, so as not to confuse it with the version 
+#  available from LANL.
+#
+#  Additionally, redistribution and use in source and binary 
+#  forms, with or without modification, are permitted provided 
+#  that the following conditions are met:
+#  -  Redistributions of source code must retain the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer. 
+#  -  Redistributions in binary form must reproduce the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer in the documentation 
+#     and/or other materials provided with the distribution. 
+#  -  Neither the name of Los Alamos National Security, LLC, 
+#     Los Alamos National Laboratory, LANL, the U.S. Government, 
+#     nor the names of its contributors may be used to endorse 
+#     or promote products derived from this software without 
+#     specific prior written permission.
+#   
+#  THIS SOFTWARE IS PROVIDED BY LOS ALAMOS NATIONAL SECURITY, LLC 
+#  AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+#  INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF 
+#  MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+#  IN NO EVENT SHALL LOS ALAMOS NATIONAL SECURITY, LLC OR CONTRIBUTORS 
+#  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, 
+#  OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, 
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, 
+#  OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY 
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR 
+#  TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT 
+#  OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY 
+#  OF SUCH DAMAGE.
+#
+#  ###################################################################
+
+
+
+"""  Index of the job results under a results root, kept in SQLite.
+     Each run directory (gzshared/YYYY/YYYY-MM/YYYY-MM-DD/<host>/<test>/<run>)
+     is recorded once, with what get_results needs from its log: job id,
+     cores, nodes, parameters, status, run time and trend data. scan() adds
+     the run directories not indexed yet, visiting only the directories
+     changed since its last scan, so queries only read the index. The index
+     is kept on a local file system, SQLite locking can not be relied on
+     over the network file systems the results live on.
+"""
+
+import os
+import re
+import datetime
+import getpass
+import hashlib
+import tempfile
+import sqlite3
+import glob
+import time
+import logging
+import joblog
+import resultsdiscovery
+from helperutilities import private_dir
+
+schema = [
+    """CREATE TABLE IF NOT EXISTS runs (
+           run_dir TEXT PRIMARY KEY, grp TEXT, test_name TEXT, segment TEXT,
+           stamp TEXT, run_time TEXT, job_id TEXT, npes TEXT, params TEXT,
+           num_nodes INTEGER, start TEXT, end TEXT, status TEXT, real REAL,
+           has_trend INTEGER, finished INTEGER)""",
+    "CREATE INDEX IF NOT EXISTS runs_time ON runs (run_time)",
+    """CREATE TABLE IF NOT EXISTS trend_data (
+           run_dir TEXT, seq INTEGER, line TEXT)""",
+    "CREATE INDEX IF NOT EXISTS trend_data_run ON trend_data (run_dir)",
+    # watermarks of the scans, test directories by mtime and day directories once over
+    "CREATE TABLE IF NOT EXISTS dir_state (dir TEXT PRIMARY KEY, mtime REAL)",
+    "CREATE TABLE IF NOT EXISTS day_state (day_dir TEXT PRIMARY KEY, scanned TEXT)",
+]
+
+# <test>__<run script>__<pid>__<segment>.<YYYY-MM-DDTHH:MM:SS:ffffff>
+run_name_re = re.compile(r"^([^.]+)\.((\d{4}-\d\d-\d\d)T(\d\d:\d\d:\d\d)\S*)$")
+
+# how get_results counts each status, NOLOG is a run without a log
+summary_statuses = {'PASS': 'PASS', 'FAIL': 'FAIL', 'LEARN': 'UNDEF', 'UNDEF': 'UNDEF',
+                    'INCOMPLETE': 'UNDEF', 'NOLOG': 'INCOMPLETE'}
+
+
+def index_path(result_root):
+    # ++ PV_RESULTS_INDEX : Directory for the results indexes, default is a private directory in /tmp
+    index_dir = os.getenv('PV_RESULTS_INDEX')
+    if not index_dir:
+        index_dir = private_dir(os.path.join(tempfile.gettempdir(), "pavilion-" + getpass.getuser(),
+                                             "results_index"))
+    key = hashlib.md5(os.path.realpath(result_root)).hexdigest()
+    return os.path.join(index_dir, key + ".db")
+
+
+def parse_run_name(name):
+    """
+    Returns the test name, segment, time stamp and 'YYYY-MM-DD HH:MM:SS' run
+    time of a run directory name, None if it is not one.
+    """
+    match = run_name_re.match(name)
+    if not match or name[0].isdigit():
+        return None
+    parts = match.group(1).split("__")
+    if len(parts) != 4:
+        return None
+    return {'test_name': parts[0],
+            'segment': parts[3].split("-")[0],
+            'stamp': match.group(2),
+            'run_time': match.group(3) + " " + match.group(4)}
+
+
+def job_log(run_dir, test_name):
+    # the log of the test, other .log files may have been saved there as well
+    found = None
+    for lf in sorted(glob.glob(os.path.join(run_dir, "*.log"))):
+        if os.path.basename(lf).startswith(test_name):
+            found = lf
+    return found
+
+
+def run_finished(run_dir):
+    """
+    True once the post processing of the run is over. post_complete is made
+    when the job ends, before the epilog and the trend data, and only gets
+    "cleanup complete" at the very end; job_summary.json comes after the
+    trend data.
+    """
+    if os.path.exists(os.path.join(run_dir, "job_summary.json")):
+        return True
+    try:
+        with open(os.path.join(run_dir, "post_complete")) as fp:
+            return "cleanup complete" in fp.read()
+    except IOError:
+        return False
+
+
+def name_search(pattern, ignore_case, run_dir):
+    # the pattern is only looked for in the name of the run directory
+    flags = re.IGNORECASE if ignore_case else 0
+    return re.search(pattern, os.path.basename(run_dir), flags) is not None
+
+
+class ResultsIndex(object):
+
+    """ The SQLite index of the runs under one results root. """
+
+    logger = logging.getLogger('pav.ResultsIndex')
+
+    def __init__(self, result_root, path=None):
+        # the run directories are keyed by their real path, however the root was spelled
+        self.result_root = os.path.realpath(result_root)
+        self.path = path or index_path(result_root)
+        if not os.path.isdir(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path))
+        # get_results and index_results running together wait on each other
+        self.db = sqlite3.connect(self.path, timeout=60)
+        self.db.text_factory = str
+        self.db.create_function("NAME_SEARCH", 3, name_search)
+        with self.db:
+            for statement in schema:
+                self.db.execute(statement)
+
+    def close(self):
+        self.db.close()
+
+    def add_run(self, run_dir, record=None, finished=None):
+        """
+        Index (again) one run directory, from the JobRecord of its log if
+        given, else from its job summary or the log itself. Returns the
+        status recorded.
+        """
+        run_dir = os.path.realpath(run_dir)
+        info = parse_run_name(os.path.basename(run_dir))
+        if info is None:
+            return None
+        if finished is None:
+            finished = run_finished(run_dir)
+        if record is None:
+            lf = job_log(run_dir, info['test_name'])
+            record = joblog.JobRecord.for_log(lf) if lf else None
+
+        if record is None:
+            row = (None, '', '', 0, '', '', 'NOLOG', None)
+            td_lines = []
+        else:
+            row = (record.job_id, record.npes, record.params_text, record.num_nodes,
+                   record.start_text, record.end_text, record.status(finished), record.real_time())
+            td_lines = record.td_lines
+        has_trend = bool(td_lines) or os.path.exists(os.path.join(run_dir, "trend_data"))
+        grp = os.path.relpath(run_dir, self.result_root).split(os.sep)[0]
+
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO runs VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                            (run_dir, grp, info['test_name'], info['segment'], info['stamp'],
+                             info['run_time']) + row + (int(has_trend), int(finished)))
+            self.db.execute("DELETE FROM trend_data WHERE run_dir = ?", (run_dir,))
+            self.db.executemany("INSERT INTO trend_data VALUES (?,?,?)",
+                                [(run_dir, i, line) for i, line in enumerate(td_lines)])
+        return row[6]
+
+    def scan(self, grp, start=None, end=None, full=False):
+        """
+        Index the runs not indexed yet, of the whole group or of the date
+        range ('YYYY-MM-DD HH:MM:SS'). Day directories already scanned after
+        their day was over are not visited again, and in the others only the
+        test directories changed since the last scan are listed. The runs
+        that had not finished are indexed again once their post processing
+        is over. Runs removed from a listed test directory are dropped.
+        full starts over, forgetting what was scanned: every run found is
+        indexed again and the runs whose directory is gone are dropped.
+        Returns counts of what was done.
+        """
+        stats = dict.fromkeys(['days', 'dirs', 'added', 'rechecked', 'updated', 'removed'], 0)
+        with self.db:
+            if full:
+                self.db.execute("DELETE FROM day_state")
+                self.db.execute("DELETE FROM dir_state")
+        closed = set(r[0] for r in self.db.execute("SELECT day_dir FROM day_state"))
+
+        first = last = None
+        if start and end:
+            first = datetime.datetime.strptime(start, "%Y-%m-%d %H:%M:%S").date()
+            last = datetime.datetime.strptime(end, "%Y-%m-%d %H:%M:%S").date()
+        open_days = [(day, day_dir) for day, day_dir in
+                     resultsdiscovery.day_dirs(os.path.join(self.result_root, grp), first, last)
+                     if day_dir not in closed]
+        stats['days'] = len(open_days)
+
+        # the test directories are found and stat'ed in parallel
+        for day, test_dir, mtime in resultsdiscovery.test_dirs(open_days):
+            self.scan_test_dir(test_dir, mtime, stats, full)
+
+        # runs are put in the directory of the day they start, so once that
+        # day (give or take a time zone) is over nothing new will show up
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO day_state VALUES (?,?)",
+                                [(day_dir, now) for day, day_dir in open_days
+                                 if day < datetime.date.today() - datetime.timedelta(days=1)])
+        self.recheck(start, end, stats)
+        if full:
+            self.prune(grp, start, end, stats)
+
+        if stats['added'] or stats['updated'] or stats['removed']:
+            self.logger.info("%s: %d run(s) indexed, %d updated, %d removed, in %d day(s)" %
+                             (self.result_root, stats['added'], stats['updated'], stats['removed'],
+                              stats['days']))
+        return stats
+
+    def scan_test_dir(self, test_dir, mtime, stats, full=False):
+        row = self.db.execute("SELECT mtime FROM dir_state WHERE dir = ?", (test_dir,)).fetchone()
+        if row and row[0] == mtime:
+            # no run directory added or removed since
+            return
+        stats['dirs'] += 1
+
+        # all the run_dir values starting with test_dir/
+        known = set(r[0] for r in self.db.execute(
+            "SELECT run_dir FROM runs WHERE run_dir > ? AND run_dir < ?", (test_dir + "/", test_dir + "0")))
+        for name in resultsdiscovery.listdir(test_dir):
+            if not parse_run_name(name):
+                continue
+            run_dir = os.path.join(test_dir, name)
+            if run_dir in known:
+                known.discard(run_dir)
+                if full:
+                    # a full scan indexes the known runs again as well
+                    self.add_run(run_dir)
+                    stats['updated'] += 1
+            else:
+                self.add_run(run_dir)
+                stats['added'] += 1
+        # what is left was removed since
+        self.remove_runs(known, stats)
+
+        # a run directory made within the same second may not change the mtime
+        if time.time() - mtime > 2:
+            with self.db:
+                self.db.execute("INSERT OR REPLACE INTO dir_state VALUES (?,?)", (test_dir, mtime))
+
+    def recheck(self, start, end, stats):
+        sql = "SELECT run_dir FROM runs WHERE finished = 0"
+        args = ()
+        if start and end:
+            sql += " AND run_time BETWEEN ? AND ?"
+            args = (start, end)
+        for run_dir in [r[0] for r in self.db.execute(sql, args)]:
+            stats['rechecked'] += 1
+            if run_finished(run_dir):
+                self.add_run(run_dir)
+                stats['updated'] += 1
+            elif not os.path.isdir(run_dir):
+                self.remove_runs([run_dir], stats)
+
+    def prune(self, grp, start, end, stats):
+        # the days already over are not listed again, check each of their runs
+        sql = "SELECT run_dir FROM runs WHERE grp = ?"
+        args = (grp,)
+        if start and end:
+            sql += " AND run_time BETWEEN ? AND ?"
+            args += (start, end)
+        self.remove_runs([r[0] for r in self.db.execute(sql, args).fetchall() if not os.path.isdir(r[0])], stats)
+
+    def remove_runs(self, run_dirs, stats):
+        with self.db:
+            for run_dir in run_dirs:
+                self.db.execute("DELETE FROM runs WHERE run_dir = ?", (run_dir,))
+                self.db.execute("DELETE FROM trend_data WHERE run_dir = ?", (run_dir,))
+                stats['removed'] += 1
+
+    def runs(self, grp, start, end, test=None, segment=None):
+        """
+        The indexed runs of the range, as dictionaries. test is a case
+        insensitive pattern and segment a pattern, both searched for in the
+        run directory name as get_results always did.
+        """
+        sql = "SELECT * FROM runs WHERE grp = ? AND run_time BETWEEN ? AND ?"
+        args = [grp, start, end]
+        if test:
+            sql += " AND NAME_SEARCH(?, 1, run_dir)"
+            args.append(test)
+        if segment:
+            sql += " AND NAME_SEARCH(?, 0, run_dir)"
+            args.append("__" + segment)
+        sql += " ORDER BY run_dir"
+        cur = self.db.execute(sql, args)
+        names = [d[0] for d in cur.description]
+        return [dict(zip(names, r)) for r in cur]
+
+    def trend_data(self, run_dir):
+        cur = self.db.execute("SELECT line FROM trend_data WHERE run_dir = ? ORDER BY seq", (run_dir,))
+        return [r[0] for r in cur]
+
+
+def run_label(run):
+    # testName.numNodesXnumCores(test arguments)
+    return "%s.%sx%s(%s)" % (run['test_name'], run['num_nodes'] or 0, run['npes'] or '', run['params'] or '')
+
+
+def summary(runs, show_fail=False, show_pass=False, show_inc=False, xtime=False):
+    """
+    The per segment and test summary get_results prints for the runs.
+    """
+    counts = {}
+    lists = {}
+    real = {}
+    totals = dict.fromkeys(['total', 'PASS', 'FAIL', 'UNDEF', 'INCOMPLETE'], 0)
+    for run in runs:
+        key = (run['segment'], run_label(run))
+        c = counts.setdefault(key, dict.fromkeys(['total', 'PASS', 'FAIL', 'UNDEF', 'INCOMPLETE'], 0))
+        status = summary_statuses.get(run['status'], 'UNDEF')
+        c['total'] += 1
+        c[status] += 1
+        totals['total'] += 1
+        totals[status] += 1
+        lists.setdefault(key + (status,), []).append(run)
+        if status in ('PASS', 'UNDEF'):
+            r = real.setdefault(key, {'sum': 0.0, 'times': []})
+            r['sum'] += run['real'] or 0.0
+            if status == 'PASS':
+                r['times'].append(run['real'] or 0.0)
+
+    out = []
+    for segment in sorted(set(k[0] for k in counts)):
+        out.append("\n    segment: %s\n" % segment)
+        for key in sorted(k for k in counts if k[0] == segment):
+            c = counts[key]
+            avg = 0.0
+            if key in real and c['PASS'] + c['UNDEF']:
+                avg = real[key]['sum'] / (c['PASS'] + c['UNDEF'])
+            text = "%s - total_runs:%d, passed:%d, failed:%d, undefined:%d, incomplete:%d" % \
+                   (key[1], c['total'], c['PASS'], c['FAIL'], c['UNDEF'], c['INCOMPLETE'])
+            if xtime:
+                times = real.get(key, {}).get('times') or [0.0]
+                out.append("\t%s, [%4.2f, %4.2f, %4.2f]\n" % (text, min(times), avg, max(times)))
+            else:
+                out.append("\t%s, [%4.2f secs]\n" % (text, avg))
+
+            for wanted, status, title in [(show_fail, 'FAIL', 'failing: '), (show_pass, 'PASS', 'passing:  '),
+                                          (show_inc, 'UNDEF', 'undefined:  '),
+                                          (show_inc, 'INCOMPLETE', 'incomplete:  ')]:
+                if wanted and key + (status,) in lists:
+                    out.append("\t %s\n" % title)
+                    for run in sorted(lists[key + (status,)], key=lambda r: (r['stamp'], r['run_dir'])):
+                        out.append("\t %s\n" % run['run_dir'])
+
+    out.append("\n\n")
+    out.append(" Results: Tests evaluated = %d, Passed = %d, Failed = %d, Undefined = %d, Incomplete = %d\n" %
+               (totals['total'], totals['PASS'], totals['FAIL'], totals['UNDEF'], totals['INCOMPLETE']))
+    return "".join(out)
+
+
+def trend_report(index, runs):
+    """
+    The trend data lines of the runs, as get_results -T prints them.
+    """
+    out = []
+    for run in runs:
+        if not run['has_trend']:
+            continue
+        for td in index.trend_data(run['run_dir']):
+            out.append("\n\t%s jid(%s) %s %s" % (run_label(run), run['job_id'] or '', run['stamp'], td))
+        out.append("\n")
+    return "".join(out)
@@ -65,6 +65,8 @@ import logging
 import errno
 import platform
 
+from basejobcontroller import JobEnv
+
 
 def convert(inp):
     if isinstance(inp, dict):
@@ -124,7 +126,7 @@ def load_jcmod(eid, params):
     return class_
 
 
-def build_results_dir(params):
+def build_results_dir(params, env):
 
     """ function to create the final result directory for a job/test.
         Intent is to make backwards compatible with Gazebo.
@@ -133,7 +135,7 @@ def build_results_dir(params):
     lh = params['log_handle']
 
     root_result_dir = params['results']['root']
-    os.environ["PV_RESULT_ROOT"] = root_result_dir
+    env["PV_RESULT_ROOT"] = root_result_dir
     name = params['name']
     new_dir = root_result_dir + "/gzshared/"
     date_parts = datetime.datetime.now().strftime("%Y/%Y-%m/%Y-%m-%d/")
@@ -165,23 +167,22 @@ def now():
     return " " + datetime.datetime.now().strftime("%m-%d-%YT%H:%M:%S")
 
         
-def main(args):
+def run_job(entry_id, js_params, env=None):
 
-    """ performs the task of running the job defined by the args sent to this handler.
+    """ performs the task of running the job defined by the (json encoded) params.
         There may be no terminal associated with this program so all output from the job
         is now directed to a corresponding log file.
+        env holds any job specific environment settings made before dispatch (LDMS).
     """
-    entry_id = args[1]
-    params = json.loads(args[2])
+    params = json.loads(js_params)
     params = convert(params)
-    ml_file = args[3]
+
+    job_env = JobEnv()
+    if env:
+        job_env.update(env)
 
     logger = logging.getLogger('pav.runjob')
     logger.setLevel(logging.DEBUG)
-    fh = logging.FileHandler(filename=ml_file)
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    fh.setFormatter(formatter)
-    logger.addHandler(fh)
 
     # This handle "name(pid)" can be used to follow all activity of this
     # specific job thread in the pav.log file
@@ -195,13 +196,14 @@ def main(args):
     logger.info(lh + ": loaded %s jobcontroller " % params['run']['scheduler'])
 
     # all STDOUT and STDERR from job directed to its own log file
-    results_dir = build_results_dir(params)
-    os.environ["PV_JOB_RESULTS_LOG_DIR"] = results_dir
+    results_dir = build_results_dir(params, job_env)
+    job_env["PV_JOB_RESULTS_LOG_DIR"] = results_dir
 
     logfile = results_dir + "/" + test_name + ".log"
-    os.environ["PV_JOB_RESULTS_LOG"] = logfile
+    job_env["PV_JOB_RESULTS_LOG"] = logfile
     logger.info(lh + ": logfile -> %s" % logfile)
 
+    save_stderr = sys.stderr
     with open(logfile, "w+") as lf:
         with stdout_redirected(lf):
 
@@ -209,35 +211,66 @@ def main(args):
             sys.stderr = lf
 
             try:
-                # instantiate job controller object
-                print params
-                this_job = jc(entry_id, params, lf)
-            except RuntimeError, err:
-                logger.error(lh + "Error: skipping job! " + err.message)
-                return
-            except:
-                logger.error(lh + 'Error: job start problem, skipping job! (Hint: look in job output log)')
-                print "Error: ", sys.exc_info()[0]
-                print "  --> ", sys.exc_info()[1]
-                return
-
-            # setup the enviroment for the job
-            this_job.setup_job_info()
-
-            # do what every job has to do
-            if params['build']['build_before_run_flag']:
-                logger.info(lh + " build-start ")
-                print "<build-start> ", now()
-                this_job.build()
-                logger.info(lh + " build-end ")
-                print "<build-end> ", now()
-
-            logger.info(lh + " starting")
-            logger.info(lh + " details=" + str(this_job.configs))
-            #print "<start>", now()
-            this_job.start()
-            #print "<end>" , now()
-            logger.info(lh + ' Submit completed ')
+                run_job_phases(jc, entry_id, params, lf, job_env, logger)
+            finally:
+                sys.stderr = save_stderr
+
+
+def run_job_phases(jc, entry_id, params, lf, job_env, logger):
+
+    """ instantiate the job controller then build and start the job.
+        Output is expected to already be directed to the job log file.
+    """
+    lh = params['log_handle']
+
+    try:
+        # instantiate job controller object
+        print params
+        this_job = jc(entry_id, params, lf, job_env)
+    except RuntimeError, err:
+        logger.error(lh + "Error: skipping job! " + err.message)
+        return
+    except:
+        logger.error(lh + 'Error: job start problem, skipping job! (Hint: look in job output log)')
+        print "Error: ", sys.exc_info()[0]
+        print "  --> ", sys.exc_info()[1]
+        return
+
+    # setup the enviroment for the job
+    this_job.setup_job_info()
+
+    # do what every job has to do
+    if params['build']['build_before_run_flag']:
+        logger.info(lh + " build-start ")
+        print "<build-start> ", now()
+        this_job.build()
+        logger.info(lh + " build-end ")
+        print "<build-end> ", now()
+
+    logger.info(lh + " starting")
+    logger.info(lh + " details=" + str(this_job.configs))
+    #print "<start>", now()
+    this_job.start()
+    #print "<end>" , now()
+    logger.info(lh + ' Submit completed ')
+
+
+def main(args):
+
+    """ stand-alone entry point, args are: entry_id, json encoded params
+        and the master log file.
+    """
+    entry_id = args[1]
+    js_params = args[2]
+    ml_file = args[3]
+
+    logger = logging.getLogger('pav.runjob')
+    fh = logging.FileHandler(filename=ml_file)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    fh.setFormatter(formatter)
+    logger.addHandler(fh)
+
+    run_job(entry_id, js_params)
 
 
 # this gets called if it's run as a script from the shell
@@ -63,7 +63,7 @@ import datetime
 
 newpath = os.environ['PVINSTALL'] + "/PAV/modules"
 sys.path.append(newpath)
-from basejobcontroller import JobController
+from basejobcontroller import JobController, JobEnv
 from ldms import LDMS
 
 def now():
@@ -79,9 +79,9 @@ def stdout_redirected(new_stdout):
     finally:
         sys.stdout = save_stdout
 
-def get_node_list():
+def get_node_list(job_env):
     if "SLURM_JOBID" in os.environ:
-        os.environ['PV_JOBID'] = os.environ.get("SLURM_JOBID")
+        job_env['PV_JOBID'] = os.environ.get("SLURM_JOBID")
         output = subprocess.check_output("scontrol show hostnames \"$SLURM_NODELIST\" | tr '\n' ','", shell=True)
         nodes = output.replace('\n', "")
         nodes = nodes.replace(',', " ")
@@ -89,18 +89,35 @@ def get_node_list():
         nodes = platform.node()
     return str(nodes) 
 
+def load_array_task():
+    """
+      When running as a task of a job array pick up the settings
+      of the test variation this task runs.
+    """
+    if "PV_ARRAY_DIR" in os.environ and "SLURM_ARRAY_TASK_ID" in os.environ:
+        task = JobController.load_array_task(os.environ['PV_ARRAY_DIR'], os.environ['SLURM_ARRAY_TASK_ID'])
+        os.environ.update(task['env'])
+        return True
+    return False
+
 def main():
     """
       calls the user's job script/program.
       Will also start LDMS if requested.
     """
 
+    in_array = load_array_task()
+
     cmd = "cd " + os.environ['PV_RUNHOME'] + "; " + \
         os.environ['PVINSTALL'] + "/PAV/scripts/mytime " + os.environ['USER_CMD']
 
-    nodes = get_node_list()
-    os.environ['PV_NODES'] = nodes
-    os.environ['GZ_NODES'] = os.environ['PV_NODES']
+    # settings made by this handler, passed on to the user's job and post processing
+    job_env = JobEnv()
+
+    nodes = get_node_list(job_env)
+    job_env['PV_NODES'] = nodes
+    job_env['GZ_NODES'] = job_env['PV_NODES']
+    env = job_env.export()
     job_log_file = os.environ["PV_JOB_RESULTS_LOG"]
 
     with open(job_log_file, 'a') as lf:
@@ -109,6 +126,8 @@ def main():
             #redirect STDERR to the same file
             sys.stderr = lf
 
+            if in_array and "SLURM_ARRAY_JOB_ID" in os.environ:
+                print "<JobID> " + os.environ['SLURM_ARRAY_JOB_ID'] + "_" + os.environ['SLURM_ARRAY_TASK_ID']
             print "<nodes> " + nodes + "\n"
             print "slurm_job_handler: "
 
@@ -117,11 +136,14 @@ def main():
             try:
                 if os.environ['LDMS_START_CMD']:
                     print "start ldms! "
-                    LDMS.start()
+                    LDMS.start(env)
             except KeyError, e:
                 #print 'I got a KeyError - no: "%s"' % str(e)
                 pass
 
+            # parse the job log while the job runs
+            follower = JobController.follow_job_log(env)
+
             print "<start>", now()
             print "  start job with: \n    " + cmd
             lf.flush()
@@ -130,25 +152,9 @@ def main():
             # This works with job_out_file = /users/cwi/mystdout
             #subprocess.call(cmd1, stdout=job_out_file, shell=True)
 
-            subprocess.call(cmd, stdout=lf, stderr=lf, shell=True)
-
-            # The post_complete file needs to be placed in the results dir
-            # for Gazebo compatibility
-            pcf = os.environ["PV_JOB_RESULTS_LOG_DIR"] + "/post_complete"
-            text_file = open(pcf, "w")
-            text_file.write("{}\n".format("command complete"))
-            JobController.run_epilog()
-            text_file.write("{}\n".format("epilog complete"))
-            JobController.cleanup()
-            text_file.write("{}\n".format("cleanup complete"))
-            text_file.close()
-
-            print "<end>", now()
-            lf.flush()
+            subprocess.call(cmd, stdout=lf, stderr=lf, shell=True, env=env)
 
-            # The trend_data file needs to be placed in the results dir
-            # for Gazebo compatibility
-            JobController.process_trend_data()
+            JobController.post_process(env, follower, now)
 
 
 # this gets called if it's run as a script/program
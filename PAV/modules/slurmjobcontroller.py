@@ -62,7 +62,7 @@ import os
 import subprocess
 import re
 from basejobcontroller import JobController
-from helperutilities import which
+from helperutilities import which, array_ranges
 
 
 class SlurmJobController(JobController):
@@ -143,17 +143,17 @@ class SlurmJobController(JobController):
             print "<segName> DEFAULT"
 
         nnodes = str(self.configs["slurm"]["num_nodes"])
-        os.environ['PV_NNODES'] = nnodes
+        self.env['PV_NNODES'] = nnodes
         print "<nnodes> " + nnodes
         self.logger.info(self.lh + " : nnodes=" + nnodes)
 
         ppn = str(self.configs["slurm"]["procs_per_node"])
-        os.environ['PV_PESPERNODE'] = ppn
+        self.env['PV_PESPERNODE'] = ppn
         print "<ppn> " + ppn
         self.logger.info(self.lh + " : ppn=" + ppn)
 
         pes = int(ppn) * int(nnodes)
-        os.environ['PV_NPES'] = str(pes)
+        self.env['PV_NPES'] = str(pes)
         print "<npes> " + str(pes)
         self.logger.info(self.lh + " : npes=" + str(pes))
 
@@ -167,18 +167,23 @@ class SlurmJobController(JobController):
         # print the common log settings here right after the job is started
         self.save_common_settings()
 
+        run_cmd = self.env['PV_RUNHOME'] + "/" + self.configs['run']['cmd']
+        self.env['USER_CMD'] = run_cmd
+
+        # variations with the same request are submitted together as a job array
+        if self.in_job_array():
+            self.save_array_task(slurm_cmd)
+            return
+
         # setup unique Slurm stdout and stderr file names
-        se = os.environ['PV_JOB_RESULTS_LOG_DIR'] + "/slurm-%j.out"
-        so = os.environ['PV_JOB_RESULTS_LOG_DIR'] + "/slurm-%j.out"
+        se = self.env['PV_JOB_RESULTS_LOG_DIR'] + "/slurm-%j.out"
+        so = self.env['PV_JOB_RESULTS_LOG_DIR'] + "/slurm-%j.out"
         slurm_cmd += " -o " + so + " -e " + se
 
-        run_cmd = os.environ['PV_RUNHOME'] + "/" + self.configs['run']['cmd']
-        os.environ['USER_CMD'] = run_cmd
-
         # Executable is slurm_job_handler.py which is just the wrapper to call the
         # actual application executable. Look at moab_job_handler.py to see what is
         # being collected and printed to the output log.
-        slurm_cmd += " " + os.environ['PVINSTALL'] + "/PAV/modules/slurm_job_handler.py"
+        slurm_cmd += " " + SlurmJobController.job_handler()
 
         if SlurmJobController.is_slurm_system():
 
@@ -186,7 +191,9 @@ class SlurmJobController(JobController):
             # call to invoke real Slurm command
 
             try:
-                output = subprocess.check_output(slurm_cmd, shell=True, stderr=subprocess.STDOUT)
+                # sbatch exports the submitting environment to the job
+                output = subprocess.check_output(slurm_cmd, shell=True, stderr=subprocess.STDOUT,
+                                                 env=self.env.export())
             except subprocess.CalledProcessError as e:
                self.logger.info(self.lh + " : sbatch exit status:" + str(e.returncode))
                print "sbatch exit status:" + str(e.returncode)
@@ -204,8 +211,9 @@ class SlurmJobController(JobController):
 
         else:
             # fake-out section to run on basic unix system
-            fake_job_cmd = os.environ['PVINSTALL'] + "/PAV/modules/slurm_job_handler.py"
-            p = subprocess.Popen(fake_job_cmd, stdout=self.job_log_file, stderr=self.job_log_file, shell=True)
+            fake_job_cmd = SlurmJobController.job_handler()
+            p = subprocess.Popen(fake_job_cmd, stdout=self.job_log_file, stderr=self.job_log_file, shell=True,
+                                 env=self.env.export())
             # wait for the subprocess to finish
             (output, errors) = p.communicate()
             if p.returncode or errors:
@@ -213,6 +221,52 @@ class SlurmJobController(JobController):
                 print [p.returncode, errors, output]
                 self.logger.info(self.lh + " run error: " + errors)
 
+    @staticmethod
+    def job_handler():
+        return os.environ['PVINSTALL'] + "/PAV/modules/slurm_job_handler.py"
+
+    @staticmethod
+    def submit_array(array_dir, task_ids, logger):
+        """
+        Submit the tasks saved in array_dir (see save_array_task) as one
+        Slurm job array. The job handler selects its task by SLURM_ARRAY_TASK_ID.
+        """
+        task = JobController.load_array_task(array_dir, task_ids[0])
+
+        so = array_dir + "/slurm-%A_%a.out"
+        slurm_cmd = task['submit_cmd'] + " --array=" + array_ranges(task_ids)
+        slurm_cmd += " -o " + so + " -e " + so
+        slurm_cmd += " " + SlurmJobController.job_handler()
+
+        env = dict(os.environ)
+        env['PV_ARRAY_DIR'] = array_dir
+
+        if SlurmJobController.is_slurm_system():
+            logger.info("submit job array: " + slurm_cmd)
+            try:
+                output = subprocess.check_output(slurm_cmd, shell=True, stderr=subprocess.STDOUT, env=env)
+            except subprocess.CalledProcessError as e:
+                logger.info("sbatch exit status:" + str(e.returncode))
+                logger.info("sbatch output:" + e.output)
+                print "sbatch exit status:" + str(e.returncode)
+                print "sbatch output:" + e.output
+                raise
+
+            jid = 0
+            if not output is None and "job" in output:
+                # "Submitted batch job JID"
+                jid = output.split()[3]
+            logger.info("job array %s: %d tasks" % (jid, len(task_ids)))
+            return jid
+
+        else:
+            # fake-out section to run on basic unix system, one task at a time
+            for task_id in task_ids:
+                env['SLURM_ARRAY_TASK_ID'] = str(task_id)
+                subprocess.call(SlurmJobController.job_handler(), shell=True, env=env)
+            return 0
+
+
     
 # this gets called if it's run as a script/program
 if __name__ == '__main__':
@@ -0,0 +1,262 @@
+#!python
+
+#  ###################################################################
+#
+#  Disclaimer and Notice of Copyright 
+#  ==================================
+#
+#  Copyright (c) 2015, Los Alamos National Security, LLC
+#  All rights reserved.
+#
+#  Copyright 2015. Los Alamos National Security, LLC. 
+#  This software was produced under U.S. Government contract 
+#  DE-AC52-06NA25396 for Los Alamos National Laboratory (LANL), 
+#  which is operated by Los Alamos National Security, LLC for 
+#  the U.S. Department of Energy. The U.S. Government has rights 
+#  to use, reproduce, and distribute this software.  NEITHER 
+#  THE GOVERNMENT NOR LOS ALAMOS NATIONAL SECURITY, LLC MAKES 
+#  ANY WARRANTY, EXPRESS OR IMPLIED, OR ASSUMES ANY LIABILITY 
+#  FOR THE USE OF THIS SOFTWARE.  If software is modified to 
+#  produce derivative works, such modified software should be 
+#  clearly marked, so as not to confuse it with the version 
+#  available from LANL.
+#
+#  Additionally, redistribution and use in source and binary 
+#  forms, with or without modification, are permitted provided 
+#  that the following conditions are met:
+#  -  Redistributions of source code must retain the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer. 
+#  -  Redistributions in binary form must reproduce the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer in the documentation 
+#     and/or other materials provided with the distribution. 
+#  -  Neither the name of Los Alamos National Security, LLC, 
+#     Los Alamos National Laboratory, LANL, the U.S. Government, 
+#     nor the names of its contributors may be used to endorse 
+#     or promote products derived from this software without 
+#     specific prior written permission.
+#   
+#  THIS SOFTWARE IS PROVIDED BY LOS ALAMOS NATIONAL SECURITY, LLC 
+#  AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+#  INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF 
+#  MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+#  IN NO EVENT SHALL LOS ALAMOS NATIONAL SECURITY, LLC OR CONTRIBUTORS 
+#  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, 
+#  OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, 
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, 
+#  OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY 
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR 
+#  TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT 
+#  OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY 
+#  OF SUCH DAMAGE.
+#
+#  ###################################################################
+
+
+"""  Continuous submission for run_test_suite -D. A single long running
+     process keeps the parsed test suite and the scheduler job counts in
+     memory, submits the suite every <secs> (subject to the -w watermark),
+     reaps its jobs in between and reports what it is doing in a JSON
+     status file. The test suite is only read again when one of its
+     files changes.
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import datetime
+import logging
+
+from testConfig import YamlTestConfig
+
+
+def now():
+    return datetime.datetime.now().strftime("%m-%d-%YT%H:%M:%S")
+
+
+class SubmitDaemon():
+    """
+    class to submit a test suite over and over from one process
+    """
+
+    # seconds between checks for finished jobs and stop requests while waiting
+    tick = 1
+
+    def __init__(self, rts, tc, args):
+
+        my_name = self.__class__.__name__
+        self.logger = logging.getLogger('pav.' + my_name)
+
+        # the run_test_suite command doing the submitting, and its test suite
+        self.rts = rts
+        self.tc = tc
+        self.args = args
+        self.test_suite = os.path.realpath(args['testSuite'])
+
+        try:
+            self.delay = int(args['D'][0])
+        except ValueError:
+            raise ValueError("Error: invalid delay time argument!")
+
+        self.status_file = args['status']
+        if not self.status_file:
+            self.status_file = SubmitDaemon.default_status_file(self.test_suite)
+
+        self.state = 'starting'
+        self.started = now()
+        self.last_cycle = None
+        self.next_cycle = None
+        self.cycles = 0
+        self.reloads = 0
+        self.stop_requested = False
+
+    @staticmethod
+    def default_status_file(test_suite):
+        # kept with the master log file
+        name = os.path.splitext(os.path.basename(test_suite))[0]
+        return os.path.join(os.path.dirname(os.environ['PV_LOG']), "run_test_suite." + name + ".status")
+
+    @staticmethod
+    def read_status(status_file):
+        """
+        Returns the contents of a status file, None if there is none.
+        """
+        try:
+            with open(status_file) as f:
+                return json.load(f)
+        except (EnvironmentError, ValueError):
+            return None
+
+    @staticmethod
+    def running_pid(status_file):
+        """
+        Process id of a daemon still using this status file, or None.
+        """
+        status = SubmitDaemon.read_status(status_file)
+        if not status or status.get('state') == 'stopped':
+            return None
+        try:
+            os.kill(status['pid'], 0)
+        except (OSError, KeyError, TypeError):
+            return None
+        return status['pid']
+
+    @staticmethod
+    def detach(log_file):
+        """
+        Continue in the background with stdout and stderr going to
+        log_file. Like testdaemon.py, but without needing python-daemon.
+        """
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if os.fork():
+            os._exit(0)
+        os.setsid()
+        if os.fork():
+            os._exit(0)
+
+        with open(os.devnull) as null:
+            os.dup2(null.fileno(), 0)
+        with open(log_file, 'a') as log:
+            os.dup2(log.fileno(), 1)
+            os.dup2(log.fileno(), 2)
+
+    def stop(self, signum, frame):
+        self.logger.info('stop requested by signal %d' % signum)
+        self.stop_requested = True
+
+    def get_status(self):
+        dispatcher = self.rts.dispatcher
+        return {'pid': os.getpid(),
+                'state': self.state,
+                'test_suite': self.test_suite,
+                'delay': self.delay,
+                'started': self.started,
+                'last_cycle': self.last_cycle,
+                'next_cycle': self.next_cycle,
+                'cycles': self.cycles,
+                'config_reloads': self.reloads,
+                'jobs': {'dispatched': dispatcher.dispatched,
+                         'running': len(dispatcher.running),
+                         'completed': dispatcher.completed,
+                         'failed': len(dispatcher.failed)}}
+
+    def write_status(self):
+        # write then rename so readers never see half a file
+        tmp_file = self.status_file + "." + str(os.getpid())
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(self.get_status(), f, sort_keys=True, indent=4)
+            os.rename(tmp_file, self.status_file)
+        except EnvironmentError as err:
+            self.logger.info('Unable to write status file: %s ' % err)
+
+    def reload_config(self):
+        """
+        Read the test suite again if any of its files changed.
+        """
+        if self.tc.files_changed():
+            self.logger.info('test suite changed, reloading %s' % self.test_suite)
+            self.tc = YamlTestConfig(self.test_suite)
+            self.reloads += 1
+
+    def wait(self, secs):
+        """
+        Wait for the next cycle, collecting the jobs that finish.
+        """
+        dispatcher = self.rts.dispatcher
+        end = time.time() + secs
+        jobs = None
+        while not self.stop_requested and time.time() < end:
+            dispatcher.reap()
+            if jobs != (dispatcher.completed, len(dispatcher.failed)):
+                jobs = (dispatcher.completed, len(dispatcher.failed))
+                self.write_status()
+            time.sleep(min(SubmitDaemon.tick, max(0, end - time.time())))
+
+    def run(self):
+        """
+        Submit the test suite every delay seconds until stopped
+        with SIGTERM or SIGINT.
+        """
+        pid = SubmitDaemon.running_pid(self.status_file)
+        if pid:
+            sys.exit("Error: run_test_suite -D already running as process %d (see %s)" %
+                     (pid, self.status_file))
+
+        if self.args['detach']:
+            log_file = os.path.splitext(self.status_file)[0] + ".log"
+            print "  Running in the background, output in " + log_file
+            SubmitDaemon.detach(log_file)
+
+        print "  Status file -> " + self.status_file
+        self.logger.info('continuous mode, delay %d secs, status in %s' % (self.delay, self.status_file))
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        try:
+            while not self.stop_requested:
+                self.reload_config()
+                self.state = 'submitting'
+                self.write_status()
+                self.rts.submit_test_suite(self.tc.get_effective_config_file(), self.args)
+
+                self.cycles += 1
+                self.last_cycle = now()
+                self.next_cycle = (datetime.datetime.now() +
+                                   datetime.timedelta(seconds=self.delay)).strftime("%m-%d-%YT%H:%M:%S")
+                self.state = 'waiting'
+                self.write_status()
+                sys.stdout.write('\rRunning in continuous mode with a delay of %s seconds...' % self.delay)
+                sys.stdout.flush()
+                self.wait(self.delay)
+        finally:
+            # let the jobs already dispatched finish
+            self.state = 'stopping'
+            self.write_status()
+            self.rts.dispatcher.wait()
+            self.state = 'stopped'
+            self.write_status()
@@ -58,15 +58,31 @@
 import sys
 import os
 from yaml import load, YAMLError
+# the libyaml based loader is much faster, but needs the _yaml extension
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
 import json
+import cPickle
+import hashlib
 import logging
 from testEntry import TestEntry
+from helperutilities import owned_privately, private_dir
+
+
+def load_yaml(stream):
+    """
+    Parse a YAML document with the fastest safe loader available.
+    """
+    return load(stream, Loader=SafeLoader)
 
 
 def merge(obj_1, obj_2):
     """
     Recursive function to merge nested dictionaries
-    with obj_2 winning conflicts
+    with obj_2 winning conflicts. Only dicts with keys from both are
+    new, everything else is shared with the inputs.
     """
     if isinstance(obj_1, dict) and isinstance(obj_2, dict):
         result = {}
@@ -95,17 +111,38 @@ class YamlTestConfig():
     class to manipulate test suite config files being used
     """
 
-    def __init__(self, ucf="../test_suites/user_test_config.yaml"):
+    # bump when the contents of the saved config cache change
+    cache_version = 2
+
+    def __init__(self, ucf="../test_suites/user_test_config.yaml", use_cache=True):
 
         my_name = self.__class__.__name__
         self.logger = logging.getLogger('pav.' + my_name)
 
+        # every YAML file read to build the effective config, by the
+        # real path of each suite the real paths of those it includes
+        self.config_files = []
+        self.include_graph = {}
+        self.parsed = {}
+        self.ucf = ucf
+        self.invalid_entries = []
+
         # Unless defined otherwise in the user's test suite config file the 
         # default config file is found in the same directory.
         test_suite_dir = os.path.dirname(os.path.realpath(ucf)) + "/"
         self.dcf = test_suite_dir + "default_test_config.yaml"
 
         print "  User test suite file -> " + ucf
+
+        self.cache_file = None
+        if use_cache:
+            self.cache_file = YamlTestConfig.get_cache_file(ucf)
+            if self.load_cache():
+                print "  Default test suite config file -> " + self.dcf
+                self.logger.info('Using cached effective config: %s ' % self.cache_file)
+                self.stamps = YamlTestConfig.file_stamps(self.config_files)
+                return
+
         self.user_config_doc = self.load_config_file(ucf)
 
         if "DefaultTestSuite" in self.user_config_doc:
@@ -120,44 +157,126 @@ class YamlTestConfig():
         self.default_config_doc = self.load_config_file(self.dcf)
         self.ecf = self.create_effective_config_file()
 
+        # suites with bad entries are re-read so the errors are always shown
+        if self.cache_file and not self.invalid_entries:
+            self.save_cache()
+        self.stamps = YamlTestConfig.file_stamps(self.config_files)
+
+    def files_changed(self):
+        """
+        True if any of the files the test suite was read from
+        changed since.
+        """
+        try:
+            return YamlTestConfig.file_stamps(self.config_files) != self.stamps
+        except EnvironmentError:
+            return True
+
+    @staticmethod
+    def get_cache_file(ucf):
+        """
+        Name of the file the effective config built from the user
+        test suite ucf is saved in. None if caching is turned off.
+        """
+        # ++ PV_CONFIG_CACHE : Directory for saved effective configs, empty to disable
+        cache_dir = os.getenv('PV_CONFIG_CACHE', os.path.expanduser("~/.pavilion/config_cache"))
+        if not cache_dir:
+            return None
+        key = hashlib.md5(os.path.realpath(ucf)).hexdigest()
+        return os.path.join(cache_dir, key + ".pkl")
+
+    @staticmethod
+    def file_stamps(files):
+        """
+        Modification time and size of every file, any changes to
+        these make the cached config stale.
+        """
+        stamps = {}
+        for fn in files:
+            st = os.stat(fn)
+            stamps[os.path.realpath(fn)] = (st.st_mtime, st.st_size)
+        return stamps
+
+    @staticmethod
+    def code_files():
+        # source of the modules the effective config depends on
+        return [os.path.splitext(m.__file__)[0] + ".py" for m in [sys.modules[__name__],
+                                                                  sys.modules[TestEntry.__module__]]]
+
+    def load_cache(self):
+        """
+        Restore the configs saved by a previous run if none of the
+        files they were built from have changed since. Returns True on success.
+        """
+        try:
+            # unpickling runs code, so only trust what the user wrote
+            if not owned_privately(os.path.dirname(self.cache_file)) or \
+                    not owned_privately(self.cache_file):
+                return False
+            with open(self.cache_file, 'rb') as f:
+                cached = cPickle.load(f)
+            if cached['version'] != YamlTestConfig.cache_version:
+                return False
+            if cached['stamps'] != YamlTestConfig.file_stamps(cached['stamps'].keys()):
+                return False
+        except (EnvironmentError, cPickle.UnpicklingError, EOFError, KeyError,
+                AttributeError, ImportError, TypeError, ValueError):
+            return False
+
+        self.dcf = cached['dcf']
+        self.config_files = cached['config_files']
+        self.include_graph = cached['include_graph']
+        self.user_config_doc = cached['user_config_doc']
+        self.default_config_doc = cached['default_config_doc']
+        self.ecf = cached['ecf']
+        return True
+
+    def save_cache(self):
+        """
+        Save the configs with the stamps of the files they came from.
+        Failure to write it just means the next run parses the YAML again.
+        """
+        try:
+            stamps = YamlTestConfig.file_stamps(self.config_files + YamlTestConfig.code_files())
+            cached = {'version': YamlTestConfig.cache_version,
+                      'stamps': stamps,
+                      'dcf': self.dcf,
+                      'config_files': self.config_files,
+                      'include_graph': self.include_graph,
+                      'user_config_doc': self.user_config_doc,
+                      'default_config_doc': self.default_config_doc,
+                      'ecf': self.ecf}
+            private_dir(os.path.dirname(self.cache_file))
+            # write then rename so concurrent runs never read half a file
+            tmp_file = self.cache_file + "." + str(os.getpid())
+            with os.fdopen(os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as f:
+                cPickle.dump(cached, f, cPickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_file, self.cache_file)
+        except (EnvironmentError, cPickle.PicklingError) as err:
+            self.logger.info('Unable to save effective config cache: %s ' % err)
+
     def load_config_file(self, config_name):
         """
-        Load the YAML configuration file(s) with the given name. Returns
-        the loaded contents as a dict.
+        Load the YAML configuration file with the given name along with
+        the test suites it includes, to any depth. Returns the
+        combined contents as a dict.
         """
+        self.current_file = config_name
         try:
-            # Support test_suites that include other test_suites.
-            # Could be recursive, but two levels for now.
-            config_file_base_dir = os.path.dirname(config_name)
-            if not config_file_base_dir:
-                config_file_base_dir = "."
-            fn = config_name
-            cfg = load(open(fn))
-            for inc in cfg.get("IncludeTestSuite", []):
-                if inc[0] == "/":
-                    fn = inc
-                else:
-                    fn = config_file_base_dir + "/" + inc
-                print "  Included test suite ->  " + fn
-                inc_cfg = (load(open(fn)))
-                for inc2 in inc_cfg.get("IncludeTestSuite", []):
-                    if inc2[0] == "/":
-                        fn = inc2
-                    else:
-                        fn = config_file_base_dir + "/" + inc2
-                    print "    Included test suite ->  " + fn
-                    inc_cfg.update(load(open(fn)))
-                cfg.update(inc_cfg)
-            return cfg
-
-        except AttributeError:
-            error_message = " Badly formatted Include line in {0}\n".format(fn)
+            base_dir = os.path.dirname(config_name)
+            if not base_dir:
+                base_dir = "."
+            self.resolved = {}
+            return self.resolve_config_file(config_name, base_dir, [])
+
+        except (AttributeError, TypeError):
+            error_message = " Badly formatted Include line in {0}\n".format(self.current_file)
             self.logger.error(error_message)
-            error_message += "  -> " + cfg
+            error_message += "  -> " + str(self.parsed.get(os.path.realpath(self.current_file)))
             sys.exit(error_message)
 
         except EnvironmentError as err:
-            error_message = "Error processing item: {0}\n".format(fn)
+            error_message = "Error processing item: {0}\n".format(self.current_file)
             self.logger.error(error_message)
             error_message += "I/O Error({0}): {1}.".format(err.errno, 
                                                            err.strerror)
@@ -168,6 +287,79 @@ class YamlTestConfig():
             self.logger.error(error_message)
             sys.exit(error_message)
 
+    def parse_config_file(self, fn):
+        """
+        Returns the parsed contents of a single YAML file. Each file is
+        only read once no matter how many test suites include it.
+        """
+        key = os.path.realpath(fn)
+        if key not in self.parsed:
+            self.current_file = fn
+            self.config_files.append(fn)
+            with open(fn) as f:
+                self.parsed[key] = load_yaml(f)
+        return self.parsed[key]
+
+    @staticmethod
+    def include_path(inc, includer, base_dir):
+        """
+        Path of an included test suite, relative ones are found next to
+        the including suite, or else next to the top level suite.
+        """
+        if inc[0] == "/":
+            return inc
+        fn = os.path.join(os.path.dirname(includer), inc)
+        if not os.path.exists(fn) and os.path.exists(os.path.join(base_dir, inc)):
+            fn = os.path.join(base_dir, inc)
+        return fn
+
+    def resolve_config_file(self, fn, base_dir, stack):
+        """
+        Returns the contents of fn with everything it includes folded in,
+        included suites winning conflicts. stack holds the chain of
+        suites that led here and is used to catch include cycles.
+        """
+        key = os.path.realpath(fn)
+        if key in stack:
+            cycle = " -> ".join(stack[stack.index(key):] + [key])
+            error_message = "Error: IncludeTestSuite cycle: {0}".format(cycle)
+            self.logger.error(error_message)
+            sys.exit(error_message)
+
+        if key in self.resolved:
+            return self.resolved[key]
+
+        doc = self.parse_config_file(fn)
+        self.current_file = fn
+        includes = doc.get("IncludeTestSuite", [])
+        cfg = dict(doc)
+        self.include_graph[key] = []
+        for inc in includes:
+            inc_fn = YamlTestConfig.include_path(inc, fn, base_dir)
+            self.include_graph[key].append(os.path.realpath(inc_fn))
+            print "  " * (len(stack) + 1) + "Included test suite ->  " + inc_fn
+            cfg.update(self.resolve_config_file(inc_fn, base_dir, stack + [key]))
+            self.current_file = fn
+
+        self.resolved[key] = cfg
+        return cfg
+
+    def show_include_graph(self):
+        """
+        Display the test suites included by the user and default
+        test suite files as a tree.
+        """
+        def show(fn, depth):
+            print "  " * depth + fn
+            for inc in self.include_graph.get(fn, []):
+                show(inc, depth + 1)
+
+        for root in [self.ucf, self.dcf]:
+            show(os.path.realpath(root), 0)
+
+    def has_includes(self):
+        return any(self.include_graph.values())
+
     def get_result_locations(self):
         rl = []
         for k, v in self.ecf.iteritems():
@@ -209,12 +401,12 @@ class YamlTestConfig():
             if type(v) is dict:
                 if not TestEntry.check_valid(v):
                     print ", skipping stanza (%s) due to invalid entry" % test_id
+                    self.invalid_entries.append(test_id)
                     continue
-            tmp_config = default_config.copy()
-
             # merge the user dictionary with the default configuration. Tried
             # other dict methods ( "+", chain, update) and these did not work with nested dict.
-            new_dict[test_id] = merge(tmp_config, self.user_config_doc[test_id])
+            # The defaults the user does not override are shared by all the entries.
+            new_dict[test_id] = merge(default_config, self.user_config_doc[test_id])
 
         return new_dict
 
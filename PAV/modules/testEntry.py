@@ -59,9 +59,9 @@ import sys
 import logging
 import itertools
 from ldms import LDMS
-import subprocess
+from activejobs import ActiveJobs
+from nodeusage import NodeUsage
 import getpass
-import copy
 from os.path import expanduser
 
 
@@ -77,6 +77,27 @@ def flatten_dict(d):
     return dict(items())
 
 
+def with_value(d, keys, value):
+    """
+    Returns a copy of the nested dict d with the value at the path keys
+    replaced. Only the dicts along the path are copied, everything else
+    is shared with d, which is left unchanged.
+    """
+    new_d = dict(d)
+    if len(keys) == 1:
+        new_d[keys[0]] = value
+    else:
+        new_d[keys[0]] = with_value(d.get(keys[0], {}), keys[1:], value)
+    return new_d
+
+
+def count_combinations(choices):
+    """
+    Number of combinations itertools.product makes of the lists in choices.
+    """
+    return reduce(lambda n, c: n * len(c), choices, 1)
+
+
 class TestEntry():
     """
     class to manipulate a specific test entry in the test suite
@@ -186,8 +207,13 @@ class TestEntry():
     def get_count(self):
         return int(self.this_dict[self.id]['run']['count'])
 
+    def set_value(self, keys, value):
+        # copy on write, the test dict shares parts with the effective
+        # config and the other variations of this test
+        self.this_dict[self.id] = with_value(self.this_dict[self.id], keys, value)
+
     def set_arg_str(self, arg):
-        self.this_dict[self.id]['run']['test_args'] = arg
+        self.set_value(('run', 'test_args'), arg)
 
     def get_arg_str(self):
         return self.this_dict[self.id]['run']['test_args']
@@ -233,17 +259,48 @@ class TestEntry():
         # otherwise False, there is no room
         return False
 
+    def job_submitted(self):
+        # called as each job of this entry is dispatched, so
+        # the -w watermark can count it before the scheduler lists it
+        pass
+
+    def node_usage(self):
+        # the sampler of the node usage the -p option fills up to,
+        # None if the scheduler has no notion of nodes
+        return None
+
+    def get_node_request(self):
+        # nodes this variation asks the scheduler for
+        return 0
+
+    def get_variation_choices(self):
+        # stub, the lists of choices the variations are made from
+        return []
+
+    def get_variation_count(self):
+        """
+        Number of variations get_test_variations generates, without
+        generating them.
+        """
+        return count_combinations(self.get_variation_choices())
+
     def get_test_variations(self):
         # stub, most likely different for each controller type
 
         nl = [self]
         return nl
 
+    def get_array_key(self):
+        # Variations with the same key make the same request of the scheduler
+        # and can be submitted together as a job array. None if not supported.
+        return None
+
     def prep_ldms(self):
 
-        # must be overridden by specific scheduler implementation
+        # must be overridden by specific scheduler implementation.
+        # Returns the job environment settings needed to start LDMS.
         self.logger.info('LDMS not supported for this job (%s) type' % self.handle)
-        pass
+        return {}
 
 # BC added SlurmTestEntry
 
@@ -251,38 +308,39 @@ class TestEntry():
 class SlurmTestEntry(TestEntry):
 
     def set_num_nodes(self, nn):
-        self.this_dict[self.id]['slurm']['num_nodes'] = nn
+        self.set_value(('slurm', 'num_nodes'), nn)
 
     def get_num_nodes(self):
         return self.this_dict[self.id]['slurm']['num_nodes']
 
     def set_procs_per_node(self, ppn):
-        self.this_dict[self.id]['slurm']['procs_per_node'] = ppn
+        self.set_value(('slurm', 'procs_per_node'), ppn)
 
     def get_procs_per_node(self):
         return self.this_dict[self.id]['slurm']['procs_per_node']
 
     def set_node_list(self, nl):
-        self.this_dict[self.id]['slurm']['node_list'] = nl
+        self.set_value(('slurm', 'node_list'), nl)
 
     def get_node_list(self):
         return self.this_dict[self.id]['slurm']['node_list']
 
+    def get_array_key(self):
+        # everything that shapes the sbatch command line
+        sc = self.this_dict[self.id]['slurm']
+        key = [self.get_type(), self.name, self.get_results_location()]
+        for k in ['num_nodes', 'node_list', 'reservation', 'constraint', 'time_limit', 'target_seg']:
+            key.append(str(sc.get(k, '')))
+        return tuple(key)
+
     # def get_values(self):
     #   return self.this_dict[self.id]
 
-    def get_test_variations(self):
+    def get_variation_choices(self):
         """
-        Figure out all the variations for this test
-        and return a list of "new" test entries.
-
+        The fields that may have multiple choices in the original "seed"
+        test entry, each as a list of choices.
         """
-
-        tv = []
-        i = 1
-
-        # grab the fields that may have multiple choices from the
-        # original "seed" test entry
         l1 = self.this_dict[self.id]['slurm']['num_nodes']
         if isinstance(l1, int):
             l1 = [l1]
@@ -311,17 +369,20 @@ class SlurmTestEntry(TestEntry):
         except KeyError:
             l4 = ['']
 
+        return [l1, l2, l3, l4]
 
-        original_test_dict = self.this_dict[self.id]
-        # print "effective test suite:"
-        # print original_test_dict
-        # print ""
+    def get_test_variations(self):
+        """
+        Figure out all the variations for this test
+        and generate "new" test entries, one at a time.
 
-        my_prod = itertools.product(l1, l2, l3, l4)
-        combinations = list(my_prod).__len__()
-        # print combinations
+        """
 
-        for n, p, a, l in itertools.product(l1, l2, l3, l4):
+        choices = self.get_variation_choices()
+        combinations = count_combinations(choices)
+        original_test_dict = self.this_dict[self.id]
+
+        for i, (n, p, a, l) in enumerate(itertools.product(*choices), 1):
             # Actually create a NEW test entry object that has just a single
             # combination of nodes X ppn X arg_string
 
@@ -329,52 +390,37 @@ class SlurmTestEntry(TestEntry):
             # to populate the new one, changing only the appropriate pieces
             if combinations == 1:
                 my_new_id = self.id
-                new_test_dict = original_test_dict
             else:
                 my_new_id = self.id + "-variation" + str(i)
-                new_test_dict = copy.deepcopy(original_test_dict)
-                #print "Generate new slurm test entry (" + my_new_id + ")"
-
-            # print "my_n_type: "
-            # print type(n)
-
-            new_te = SlurmTestEntry(my_new_id, new_test_dict, None)
+            # the setters below copy only what they change
+            new_te = SlurmTestEntry(my_new_id, original_test_dict, None)
             new_te.set_num_nodes(str(n))
             new_te.set_procs_per_node(str(p))
             new_te.set_arg_str(str(a))
             new_te.set_node_list(str(l))
-            tv.append(new_te)
-            # print new_te.this_dict[my_new_id],
-            i += 1
-
-        # for e in tv:
-            # print e.this_dict[e.get_id()]
-        return tv
+            yield new_te
 
     @staticmethod
-    def get_active_jobs(ts):
+    def active_jobs():
+        # all my jobs, array tasks one per line
+        return ActiveJobs.sampler(['squeue', '-h', '-r', '-u', getpass.getuser()])
 
-        me = getpass.getuser()
-
-        cat = subprocess.Popen(['squeue'],
-                               stdout=subprocess.PIPE,
-                               )
-
-        grep = subprocess.Popen(['grep', me],
-                                stdin=cat.stdout,
-                                stdout=subprocess.PIPE,
-                                )
+    @staticmethod
+    def get_active_jobs(ts=''):
+        return SlurmTestEntry.active_jobs().count(ts)
 
-        cut = subprocess.Popen(['wc', '-l'],
-                               stdin=grep.stdout,
-                               stdout=subprocess.PIPE,
-                               )
+    def job_submitted(self):
+        SlurmTestEntry.active_jobs().add()
 
-        end_of_pipe = cut.stdout
+    def node_usage(self):
+        # one line per node and partition, so each node is counted once
+        cmd = ['sinfo', '-h', '-N', '-o', '%N %t']
+        if self.this_dict[self.id]['slurm'].get('target_seg'):
+            cmd += ['-p', str(self.this_dict[self.id]['slurm']['target_seg'])]
+        return NodeUsage.sampler(cmd, NodeUsage.parse_sinfo_nodes)
 
-        for line in end_of_pipe:
-            # print 'active_jobs: ', line.strip()
-            return int(line.strip())
+    def get_node_request(self):
+        return int(self.get_num_nodes())
 
     def room_to_run(self, args):
         """
@@ -400,50 +446,53 @@ class SlurmTestEntry(TestEntry):
         """ starts LDMS, since it works under Moab """
 
         self.logger.info('setup LDMS for this job (%s) type' % self.handle)
-        LDMS(self)
+        return LDMS(self).get_env()
 
 # -------------------------------------------
 
 class MoabTestEntry(TestEntry):
 
     def set_num_nodes(self, nn):
-        self.this_dict[self.id]['moab']['num_nodes'] = nn
+        self.set_value(('moab', 'num_nodes'), nn)
 
     def get_num_nodes(self):
         return self.this_dict[self.id]['moab']['num_nodes']
 
     def set_procs_per_node(self, ppn):
-        self.this_dict[self.id]['moab']['procs_per_node'] = ppn
+        self.set_value(('moab', 'procs_per_node'), ppn)
 
     def get_procs_per_node(self):
         return self.this_dict[self.id]['moab']['procs_per_node']
 
+    def get_array_key(self):
+        # everything that shapes the msub command line
+        mc = self.this_dict[self.id]['moab']
+        key = [self.get_type(), self.name, self.get_results_location()]
+        for k in ['queue', 'num_nodes', 'procs_per_node', 'node_list', 'machine_type', 'os',
+                  'time_limit', 'target_seg', 'reservation', 'msub_args']:
+            key.append(str(mc.get(k, '')))
+        return tuple(key)
+
     #def get_values(self):
     #   return self.this_dict[self.id]
 
-    def get_test_variations(self):
+    def get_variation_choices(self):
         """
-        Figure out all the variations for this test
-        and return a list of "new" test entries.
-
+        The fields that may have multiple choices in the original "seed"
+        test entry, each as a list of choices.
         """
-
-        tv = []
-        i = 1
-
-        # grab the fields that may have multiple choices from the
-        # original "seed" test entry
         l1 = self.this_dict[self.id]['moab']['num_nodes']
-
         if isinstance(l1, int):
             l1 = [l1]
         elif isinstance(l1, str):
             l1 = l1.split(',')
+
         l2 = self.this_dict[self.id]['moab']['procs_per_node']
         if isinstance(l2, int):
             l2 = [l2]
-        elif isinstance(l1, str):
+        elif isinstance(l2, str):
             l2 = l2.split(',')
+
         try:
             l3 = self.this_dict[self.id]['run']['test_args']
             if isinstance(l3, str):
@@ -453,16 +502,20 @@ class MoabTestEntry(TestEntry):
         except KeyError:
             l3 = ['']
 
-        original_test_dict = self.this_dict[self.id]
-        #print "effective test suite:"
-        #print original_test_dict
-        #print ""
+        return [l1, l2, l3]
+
+    def get_test_variations(self):
+        """
+        Figure out all the variations for this test
+        and generate "new" test entries, one at a time.
 
-        my_prod = itertools.product(l1, l2, l3)
-        combinations = list(my_prod).__len__()
-        #print combinations
+        """
+
+        choices = self.get_variation_choices()
+        combinations = count_combinations(choices)
+        original_test_dict = self.this_dict[self.id]
 
-        for n, p, a in itertools.product(l1, l2, l3):
+        for i, (n, p, a) in enumerate(itertools.product(*choices), 1):
             # Actually create a NEW test entry object that has just a single
             # combination of nodes X ppn X arg_string
 
@@ -470,61 +523,42 @@ class MoabTestEntry(TestEntry):
             # to populate the new one, changing only the appropriate pieces
             if combinations == 1:
                 my_new_id = self.id
-                new_test_dict = original_test_dict
             else:
                 my_new_id = self.id + "-variation" + str(i)
-                new_test_dict = copy.deepcopy(original_test_dict)
-                #print "Generate new moab test entry (" + my_new_id + ")"
-
-            #print "my_n_type: "
-            #print type(n)
-
-            new_te = MoabTestEntry(my_new_id, new_test_dict, None)
+            # the setters below copy only what they change
+            new_te = MoabTestEntry(my_new_id, original_test_dict, None)
             new_te.set_num_nodes(str(n))
             new_te.set_procs_per_node(str(p))
             new_te.set_arg_str(str(a))
-            tv.append(new_te)
-            #print new_te.this_dict[my_new_id],
-            i += 1
+            yield new_te
 
-        #for e in tv:
-            #print e.this_dict[e.get_id()]
-        return tv
+    @staticmethod
+    def active_jobs():
+        # mdiag -j lists every user's jobs
+        return ActiveJobs.sampler(['mdiag', '-j'], getpass.getuser())
 
     @staticmethod
-    def get_active_jobs(ts):
+    def get_active_jobs(ts=''):
         """
         Find the number of jobs queued or running on the system.
-        implement:  `mdiag -j | grep $me | wc -l`
         Possibly use a target segment, or partition also
         """
-        me = getpass.getuser()
-
-        cat = subprocess.Popen(['mdiag', '-j'],
-                               stdout=subprocess.PIPE,
-                               )
-
-        grep = subprocess.Popen(['grep', me],
-                                stdin=cat.stdout,
-                                stdout=subprocess.PIPE,
-                                )
+        return MoabTestEntry.active_jobs().count(ts)
 
-        if ts:
-            grep = subprocess.Popen(['grep', ts],
-                                    stdin=cat.stdout,
-                                    stdout=subprocess.PIPE,
-                                    )
+    def get_target_seg(self):
+        if self.this_dict[self.id]['moab']['target_seg']:
+            return self.this_dict[self.id]['moab']['target_seg']
+        return ''
 
-        cut = subprocess.Popen(['wc', '-l'],
-                               stdin=grep.stdout,
-                               stdout=subprocess.PIPE,
-                               )
+    def job_submitted(self):
+        MoabTestEntry.active_jobs().add(self.get_target_seg())
 
-        end_of_pipe = cut.stdout
+    def node_usage(self):
+        # the showq summary covers the whole machine
+        return NodeUsage.sampler(['showq'], NodeUsage.parse_showq)
 
-        for line in end_of_pipe:
-            #print 'active_jobs: ', line.strip()
-            return int(line.strip())
+    def get_node_request(self):
+        return int(self.get_num_nodes())
 
     def room_to_run(self, args):
         """
@@ -532,11 +566,7 @@ class MoabTestEntry(TestEntry):
         so as to not overrun the system.
         """
 
-        t_seg = ''
-        if self.this_dict[self.id]['moab']['target_seg']:
-            t_seg = self.this_dict[self.id]['moab']['target_seg']
-
-        active_jobs = MoabTestEntry.get_active_jobs(t_seg)
+        active_jobs = MoabTestEntry.get_active_jobs(self.get_target_seg())
 
         # args w and p should be exclusive, w is first check
         if args['w']:
@@ -554,7 +584,7 @@ class MoabTestEntry(TestEntry):
         """ starts LDMS, since it works under Moab """
 
         self.logger.info('setup LDMS for this job (%s) type' % self.handle)
-        LDMS(self)
+        return LDMS(self).get_env()
 
 
 class RawTestEntry(TestEntry):
@@ -562,20 +592,12 @@ class RawTestEntry(TestEntry):
     """
 
     def set_num_nodes(self):
-        self.this_dict[self.id]['raw']['num_nodes'] = 1
+        self.set_value(('raw', 'num_nodes'), 1)
 
     def get_num_nodes(self):
         return self.this_dict[self.id]['raw']['num_nodes']
 
-    def get_test_variations(self):
-        """
-        Figure out all the variations for this test
-        and return a list of "new" test entries.
-        """
-
-        tv = []
-        i = 1
-
+    def get_variation_choices(self):
         # make it a list if isn't already one
         try:
             ta = self.this_dict[self.id]['run']['test_args']
@@ -584,25 +606,28 @@ class RawTestEntry(TestEntry):
                 test_args = [ta]
         except KeyError:
             test_args = ['']
+        return [test_args]
 
+    def get_test_variations(self):
+        """
+        Figure out all the variations for this test
+        and generate "new" test entries, one at a time.
+        """
+
+        choices = self.get_variation_choices()
+        combinations = count_combinations(choices)
         original_test_dict = self.this_dict[self.id]
 
-        combinations = test_args.__len__()
-        for ta in test_args:
+        for i, ta in enumerate(choices[0], 1):
             if combinations == 1:
                 my_new_id = self.id
-                new_test_dict = original_test_dict
             else:
                 my_new_id = self.id + "-variation" + str(i)
-                new_test_dict = copy.deepcopy(original_test_dict)
-
-            new_te = RawTestEntry(my_new_id, new_test_dict, None)
+            # the setters below copy only what they change
+            new_te = RawTestEntry(my_new_id, original_test_dict, None)
             new_te.set_num_nodes()
             new_te.set_arg_str(str(ta))
-            tv.append(new_te)
-            i += 1
-
-        return tv
+            yield new_te
 
     def room_to_run(self, args):
 
@@ -0,0 +1,377 @@
+#  ###################################################################
+#
+#  Disclaimer and Notice of Copyright 
+#  ==================================
+#
+#  Copyright (c) 2015, Los Alamos National Security, LLC
+#  All rights reserved.
+#
+#  Copyright 2015. Los Alamos National Security, LLC. 
+#  This software was produced under U.S. Government contract 
+#  DE-AC52-06NA25396 for Los Alamos National Laboratory (LANL), 
+#  which is operated by Los Alamos National Security, LLC for 
+#  the U.S. Department of Energy. The U.S. Government has rights 
+#  to use, reproduce, and distribute this software.  NEITHER 
+#  THE GOVERNMENT NOR LOS ALAMOS NATIONAL SECURITY, LLC MAKES 
+#  ANY WARRANTY, EXPRESS OR IMPLIED, OR ASSUMES ANY LIABILITY 
+#  FOR THE USE OF THIS SOFTWARE.  If software is modified to 
+#  produce derivative works, such modified software should be 
+#  clearly marked, so as not to confuse it with the version 
+#  available from LANL.
+#
+#  Additionally, redistribution and use in source and binary 
+#  forms, with or without modification, are permitted provided 
+#  that the following conditions are met:
+#  -  Redistributions of source code must retain the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer. 
+#  -  Redistributions in binary form must reproduce the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer in the documentation 
+#     and/or other materials provided with the distribution. 
+#  -  Neither the name of Los Alamos National Security, LLC, 
+#     Los Alamos National Laboratory, LANL, the U.S. Government, 
+#     nor the names of its contributors may be used to endorse 
+#     or promote products derived from this software without 
+#     specific prior written permission.
+#   
+#  THIS SOFTWARE IS PROVIDED BY LOS ALAMOS NATIONAL SECURITY, LLC 
+#  AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+#  INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF 
+#  MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+#  IN NO EVENT SHALL LOS ALAMOS NATIONAL SECURITY, LLC OR CONTRIBUTORS 
+#  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, 
+#  OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, 
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, 
+#  OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY 
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR 
+#  TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT 
+#  OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY 
+#  OF SUCH DAMAGE.
+#
+#  ###################################################################
+
+
+
+"""  Columnar store of the trend data of a results root.
+     The rows of test_results.csv are kept again under trend_store/, split
+     by test name and month (<test>/<YYYY-MM>/), one typed column per file:
+     time.f8 (start of the job, epoch seconds) and value.f8 as native
+     doubles, and td.i4, series.i4, node.i4 and job.i4 as native ints
+     indexing the td, series, node and job text tables of the partition.
+     A query only reads the partitions of the tests and months wanted, and
+     only the columns it asks for; the column files can just as well be
+     mapped with numpy.memmap.
+     sync() adds what was appended to the CSV file since the last sync.
+"""
+
+import os
+import json
+import time
+import errno
+import fcntl
+import array
+import atexit
+import shutil
+import tempfile
+import urllib
+
+store_name = "trend_store"
+
+# typecodes of the columns
+columns = {'time': 'd', 'value': 'd', 'td': 'i', 'series': 'i', 'node': 'i', 'job': 'i'}
+column_ext = {'d': '.f8', 'i': '.i4'}
+# columns that index a text table, and the fields of its entries
+tables = {'td': ('name', 'units'), 'series': ('nodes', 'npes', 'params'),
+          'node': ('node',), 'job': ('job_id',)}
+
+
+def csv_time(date, hms):
+    # 10-18-2015, 02:32:48[:ffffff] as epoch seconds, None if not a time
+    try:
+        return time.mktime(time.strptime(date.strip() + " " + hms.strip()[:8], "%m-%d-%Y %H:%M:%S"))
+    except ValueError:
+        return None
+
+
+def parse_csv_row(line):
+    """
+    (test, time, value, td, series, node, job) of a test_results.csv row,
+    None for the header, rows without a numeric value or without a time.
+    """
+    fields = line.split(",")
+    if len(fields) < 14 or fields[4] == 'TestName':
+        return None
+    try:
+        value = float(fields[12])
+    except ValueError:
+        return None
+    # jobs that do not print a <start> still have an <end>
+    when = csv_time(fields[0], fields[1]) or csv_time(fields[2], fields[3])
+    if when is None:
+        return None
+    node = fields[14].strip().strip('"') if len(fields) > 14 else ''
+    return (fields[4], when, value, (fields[11].strip(), fields[13].strip()),
+            (fields[7], fields[8], fields[9]), (node,), (fields[5],))
+
+
+class Partition(object):
+
+    """ The trend data of one test in one month. """
+
+    def __init__(self, path):
+        self.path = path
+        self.tables = {}
+        self.lookup = {}
+
+    def column_path(self, name):
+        return os.path.join(self.path, name + column_ext[columns[name]])
+
+    def __len__(self):
+        # the shortest column, in case a sync was cut short
+        return min(self.column_size(name) for name in columns)
+
+    def column_size(self, name):
+        try:
+            size = os.path.getsize(self.column_path(name))
+        except OSError:
+            return 0
+        return size // array.array(columns[name]).itemsize
+
+    def column(self, name, count=None):
+        values = array.array(columns[name])
+        if count is None:
+            count = len(self)
+        if count:
+            with open(self.column_path(name), "rb") as fp:
+                values.fromfile(fp, count)
+        return values
+
+    def table(self, name):
+        if name not in self.tables:
+            entries = []
+            try:
+                with open(os.path.join(self.path, name + ".txt")) as fp:
+                    entries = [tuple(line.rstrip("\n").split("\t")) for line in fp]
+            except IOError:
+                pass
+            self.tables[name] = entries
+        return self.tables[name]
+
+    def index(self, name, entry):
+        # the index of the entry in the table, added if new
+        if name not in self.lookup:
+            self.lookup[name] = dict((e, i) for i, e in enumerate(self.table(name)))
+        lookup = self.lookup[name]
+        if entry not in lookup:
+            with open(os.path.join(self.path, name + ".txt"), "a") as fp:
+                fp.write("\t".join(entry) + "\n")
+            lookup[entry] = len(self.tables[name])
+            self.tables[name].append(entry)
+        return lookup[entry]
+
+    def truncate(self, count):
+        # drop rows a sync added without finishing
+        for name in columns:
+            if self.column_size(name) > count:
+                with open(self.column_path(name), "r+b") as fp:
+                    fp.truncate(count * array.array(columns[name]).itemsize)
+
+    def append(self, rows):
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        new = dict((name, array.array(typecode)) for name, typecode in columns.items())
+        for when, value, td, series, node, job in rows:
+            new['time'].append(when)
+            new['value'].append(value)
+            new['td'].append(self.index('td', td))
+            new['series'].append(self.index('series', series))
+            new['node'].append(self.index('node', node))
+            new['job'].append(self.index('job', job))
+        for name, values in new.items():
+            with open(self.column_path(name), "ab") as fp:
+                values.tofile(fp)
+
+
+class Selection(object):
+
+    """ Rows of trend data from several partitions, as columns. The integer
+        columns index the tables of the selection, which hold the test name
+        first in each series entry.
+    """
+
+    def __init__(self, names):
+        self.columns = dict((name, array.array(columns[name])) for name in names)
+        self.tables = dict((name, []) for name in names if name in tables)
+        self.lookup = dict((name, {}) for name in self.tables)
+
+    def __len__(self):
+        return len(self.columns.values()[0]) if self.columns else 0
+
+    def add(self, test, partition, start=None, end=None):
+        count = len(partition)
+        data = dict((name, partition.column(name, count)) for name in self.columns)
+        # map the indexes of the partition to the ones of the selection
+        remap = {}
+        for name in self.tables:
+            entries = partition.table(name)
+            lookup = self.lookup[name]
+            remap[name] = []
+            for entry in entries:
+                if name == 'series':
+                    entry = (test,) + entry
+                if entry not in lookup:
+                    lookup[entry] = len(self.tables[name])
+                    self.tables[name].append(entry)
+                remap[name].append(lookup[entry])
+
+        ranged = start is not None or end is not None
+        times = data['time'] if 'time' in data else partition.column('time', count) if ranged else None
+        for i in xrange(count):
+            if ranged and ((start is not None and times[i] < start) or (end is not None and times[i] > end)):
+                continue
+            for name, values in data.items():
+                if name in remap:
+                    self.columns[name].append(remap[name][values[i]])
+                else:
+                    self.columns[name].append(values[i])
+
+    def label(self, name, i):
+        # the table entry of row i
+        return self.tables[name][self.columns[name][i]]
+
+
+class TrendStore(object):
+
+    def __init__(self, result_root, path=None):
+        self.result_root = result_root
+        self.path = path or os.path.join(result_root, store_name)
+
+    def test_dir(self, test):
+        return os.path.join(self.path, urllib.quote(test, safe=''))
+
+    def tests(self):
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return []
+        return sorted(urllib.unquote(name) for name in names
+                      if os.path.isdir(os.path.join(self.path, name)))
+
+    def partitions(self, test, start=None, end=None):
+        """
+        The partitions of the test holding data of the months between the
+        start and end times, in order.
+        """
+        first = time.strftime("%Y-%m", time.localtime(start)) if start is not None else ''
+        last = time.strftime("%Y-%m", time.localtime(end)) if end is not None else '9999-99'
+        test_dir = self.test_dir(test)
+        try:
+            months = sorted(os.listdir(test_dir))
+        except OSError:
+            return []
+        return [Partition(os.path.join(test_dir, month)) for month in months if first <= month <= last]
+
+    def select(self, names=('time', 'value', 'td', 'series'), test=None, start=None, end=None):
+        """
+        The rows with a time between start and end (epoch seconds), of the
+        tests with the given text in their name, or of all of them.
+        """
+        selection = Selection(names)
+        for name in self.tests():
+            if test and test not in name:
+                continue
+            for partition in self.partitions(name, start, end):
+                selection.add(name, partition, start, end)
+        return selection
+
+    def load_state(self):
+        try:
+            with open(os.path.join(self.path, "state.json")) as fp:
+                return json.load(fp)
+        except (IOError, ValueError):
+            return {}
+
+    def save_state(self, state):
+        path = os.path.join(self.path, "state.json")
+        with open(path + ".tmp", "w") as fp:
+            json.dump(state, fp)
+        os.rename(path + ".tmp", path)
+
+    def sync(self, csv_file=None):
+        """
+        Add the rows appended to the CSV results since the last sync, returns
+        how many were added. The store is built again if the file was
+        replaced or cut short.
+        """
+        if csv_file is None:
+            csv_file = os.path.join(self.result_root, "test_results.csv")
+        try:
+            st = os.stat(csv_file)
+        except OSError:
+            return 0
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+        lock = os.open(os.path.join(self.path, ".lock"), os.O_RDWR | os.O_CREAT, 0o664)
+        try:
+            try:
+                fcntl.lockf(lock, fcntl.LOCK_EX)
+            except IOError as err:
+                if err.errno not in (errno.ENOLCK, errno.EOPNOTSUPP, errno.EINVAL):
+                    raise
+            state = self.load_state()
+            if state.get('inode') != st.st_ino or state.get('offset', 0) > st.st_size:
+                for name in os.listdir(self.path):
+                    if os.path.isdir(os.path.join(self.path, name)):
+                        shutil.rmtree(os.path.join(self.path, name))
+                state = {'inode': st.st_ino, 'offset': 0, 'rows': {}}
+            if state['offset'] == st.st_size:
+                return 0
+
+            with open(csv_file) as fp:
+                fp.seek(state['offset'])
+                data = fp.read(st.st_size - state['offset'])
+            # a row still being written is left for the next sync
+            data = data[:data.rfind("\n") + 1]
+
+            new_rows = {}
+            for line in data.splitlines():
+                row = parse_csv_row(line)
+                if row:
+                    key = os.path.join(urllib.quote(row[0], safe=''),
+                                       time.strftime("%Y-%m", time.localtime(row[1])))
+                    new_rows.setdefault(key, []).append(row[1:])
+
+            added = 0
+            for key, rows in sorted(new_rows.items()):
+                partition = Partition(os.path.join(self.path, key))
+                count = state['rows'].get(key, 0)
+                partition.truncate(count)
+                partition.append(rows)
+                state['rows'][key] = count + len(rows)
+                added += len(rows)
+            state['offset'] += len(data)
+            self.save_state(state)
+            return added
+        finally:
+            os.close(lock)
+
+
+def synced_store(result_root, csv_file=None):
+    """
+    The trend data store of the results root, brought up to date with the
+    CSV results. Readers that can not write to the results root get a
+    store built from the CSV file in a temporary directory instead.
+    """
+    store = TrendStore(result_root)
+    try:
+        store.sync(csv_file)
+        return store
+    except (IOError, OSError) as err:
+        print "  Warning: can't update the trend data store (%s), reading the CSV results" % str(err)
+    tmp_dir = tempfile.mkdtemp(prefix="pav_trend_store.")
+    atexit.register(shutil.rmtree, tmp_dir, True)
+    store = TrendStore(result_root, os.path.join(tmp_dir, store_name))
+    store.sync(csv_file)
+    return store
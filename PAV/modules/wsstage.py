@@ -0,0 +1,344 @@
+#!python
+
+#  ###################################################################
+#
+#  Disclaimer and Notice of Copyright 
+#  ==================================
+#
+#  Copyright (c) 2015, Los Alamos National Security, LLC
+#  All rights reserved.
+#
+#  Copyright 2015. Los Alamos National Security, LLC. 
+#  This software was produced under U.S. Government contract 
+#  DE-AC52-06NA25396 for Los Alamos National Laboratory (LANL), 
+#  which is operated by Los Alamos National Security, LLC for 
+#  the U.S. Department of Energy. The U.S. Government has rights 
+#  to use, reproduce, and distribute this software.  NEITHER 
+#  THE GOVERNMENT NOR LOS ALAMOS NATIONAL SECURITY, LLC MAKES 
+#  ANY WARRANTY, EXPRESS OR IMPLIED, OR ASSUMES ANY LIABILITY 
+#  FOR THE USE OF THIS SOFTWARE.  If software is modified to 
+#  produce derivative works, such modified software should be 
+#  clearly marked, so as not to confuse it with the version 
+#  available from LANL.
+#
+#  Additionally, redistribution and use in source and binary 
+#  forms, with or without modification, are permitted provided 
+#  that the following conditions are met:
+#  -  Redistributions of source code must retain the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer. 
+#  -  Redistributions in binary form must reproduce the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer in the documentation 
+#     and/or other materials provided with the distribution. 
+#  -  Neither the name of Los Alamos National Security, LLC, 
+#     Los Alamos National Laboratory, LANL, the U.S. Government, 
+#     nor the names of its contributors may be used to endorse 
+#     or promote products derived from this software without 
+#     specific prior written permission.
+#   
+#  THIS SOFTWARE IS PROVIDED BY LOS ALAMOS NATIONAL SECURITY, LLC 
+#  AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+#  INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF 
+#  MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+#  IN NO EVENT SHALL LOS ALAMOS NATIONAL SECURITY, LLC OR CONTRIBUTORS 
+#  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, 
+#  OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, 
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, 
+#  OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY 
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR 
+#  TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT 
+#  OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY 
+#  OF SUCH DAMAGE.
+#
+#  ###################################################################
+
+
+"""  Working space staging by hard links (working_space stage: 'link').
+     The source tree is copied once into a read only snapshot, named by the
+     paths, sizes and modification times of its files, and the working space
+     of each job is built from hard links to the snapshot. Only the files
+     matching the working_space mutable patterns are really copied, so
+     staging a job costs one link per file instead of a copy of the tree.
+     Jobs hold a shared lock on the snapshot while linking from it and mark
+     it as used, snapshots are only removed when nobody holds the lock and
+     they were not used for a while.
+"""
+
+import os
+import errno
+import fcntl
+import shutil
+import fnmatch
+import hashlib
+import tempfile
+import time
+
+# same as the files rsync leaves out when copying the whole source tree
+exclude_patterns = ['*.[ocfh]', '*.bck', '*.tar']
+
+# snapshots not used for longer than this (seconds) are removed
+snapshot_max_age = 3600
+
+
+def matches(rel_path, patterns):
+    """
+    True if the relative path, or its file name, matches one of the patterns.
+    """
+    name = os.path.basename(rel_path)
+    for pat in patterns:
+        if fnmatch.fnmatch(rel_path, pat) or fnmatch.fnmatch(name, pat):
+            return True
+    return False
+
+
+def selected(rel_path, includes):
+    """
+    True if the relative path is one of the includes or below one of them.
+    """
+    for inc in includes:
+        inc = inc.rstrip('/')
+        if rel_path == inc or rel_path.startswith(inc + '/') or fnmatch.fnmatch(rel_path, inc):
+            return True
+    return False
+
+
+def source_entries(src_dir, skip_dirs, includes=None):
+    """
+    Returns the relative paths of the directories and of the files (or
+    symbolic links) to stage from the source tree, with the stat of each file.
+    """
+    dirs = []
+    files = []
+    for root, dir_names, file_names in os.walk(src_dir):
+        rel_root = os.path.relpath(root, src_dir)
+        if rel_root == '.':
+            rel_root = ''
+        dir_names[:] = sorted(d for d in dir_names if d not in skip_dirs)
+        for d in list(dir_names):
+            rel_path = os.path.join(rel_root, d)
+            if os.path.islink(os.path.join(root, d)):
+                # staged as a link, not walked
+                dir_names.remove(d)
+                file_names.append(d)
+            else:
+                dirs.append(rel_path)
+        for f in sorted(file_names):
+            rel_path = os.path.join(rel_root, f)
+            if matches(rel_path, exclude_patterns):
+                continue
+            if includes and not selected(rel_path, includes):
+                continue
+            files.append((rel_path, os.lstat(os.path.join(root, f))))
+
+    if includes:
+        # only the directories holding what was selected
+        needed = set()
+        for rel_path, st in files:
+            parent = os.path.dirname(rel_path)
+            while parent and parent not in needed:
+                needed.add(parent)
+                parent = os.path.dirname(parent)
+        dirs = [d for d in dirs if d in needed or selected(d, includes)]
+    return dirs, files
+
+
+def snapshot_key(dirs, files):
+    """
+    Name of the snapshot of these files, changes if any file is added,
+    removed or modified.
+    """
+    h = hashlib.md5()
+    for d in dirs:
+        h.update("%s/\n" % d)
+    for rel_path, st in files:
+        h.update("%s\0%d\0%r\n" % (rel_path, st.st_size, st.st_mtime))
+    return h.hexdigest()
+
+
+def make_snapshot(src_dir, snapshot_root, dirs, files):
+    """
+    Returns the path of the read only snapshot of the files, copying
+    them only if no such snapshot exists yet.
+    """
+    snapshot = os.path.join(snapshot_root, snapshot_key(dirs, files))
+    if os.path.isdir(snapshot):
+        if unchanged(snapshot, files):
+            return snapshot
+        # written to through a link (read only does not stop root), start
+        # over once the jobs linking from it are done
+        fd = lock_snapshot(snapshot, fcntl.LOCK_EX)
+        if fd is not None:
+            damaged = os.path.join(snapshot_root, ".damaged." + os.path.basename(snapshot) + "." + str(os.getpid()))
+            try:
+                os.rename(snapshot, damaged)
+                shutil.rmtree(damaged)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+
+    if not os.path.isdir(snapshot_root):
+        try:
+            os.makedirs(snapshot_root)
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise
+
+    # build it aside and rename it into place, concurrent jobs may race
+    tmp_dir = tempfile.mkdtemp(prefix='.tmp.', dir=snapshot_root)
+    os.chmod(tmp_dir, 0o755)
+    for d in dirs:
+        os.makedirs(os.path.join(tmp_dir, d))
+    for rel_path, st in files:
+        src = os.path.join(src_dir, rel_path)
+        dest = os.path.join(tmp_dir, rel_path)
+        if os.path.islink(src):
+            os.symlink(os.readlink(src), dest)
+        else:
+            shutil.copy2(src, dest)
+            # a job changing a linked file would change it for every job
+            os.chmod(dest, st.st_mode & 0o7555)
+    try:
+        os.rename(tmp_dir, snapshot)
+    except OSError:
+        # another job got there first
+        shutil.rmtree(tmp_dir)
+    return snapshot
+
+
+def lock_snapshot(snapshot, mode):
+    """
+    Lock the snapshot directory (fcntl.LOCK_SH or LOCK_EX, possibly with
+    LOCK_NB), returns the locked file descriptor to close when done. None
+    if the snapshot was removed, or replaced, before the lock was had.
+    Where the file system has no locks it is returned unlocked.
+    """
+    try:
+        fd = os.open(snapshot, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        fcntl.flock(fd, mode)
+    except IOError as err:
+        if err.errno not in (errno.ENOLCK, errno.EOPNOTSUPP, errno.EINVAL, errno.EBADF):
+            os.close(fd)
+            raise
+    try:
+        same = os.path.samestat(os.fstat(fd), os.stat(snapshot))
+    except OSError:
+        same = False
+    if not same:
+        os.close(fd)
+        return None
+    return fd
+
+
+def unchanged(snapshot, files):
+    """
+    True if the snapshot files still have the size and modification
+    time of the source files they were copied from.
+    """
+    for rel_path, st in files:
+        try:
+            snap_st = os.lstat(os.path.join(snapshot, rel_path))
+        except OSError:
+            return False
+        if os.path.islink(os.path.join(snapshot, rel_path)):
+            continue
+        # copies only keep the modification time to the microsecond
+        if snap_st.st_size != st.st_size or abs(snap_st.st_mtime - st.st_mtime) > 0.001:
+            return False
+    return True
+
+
+def remove_old_snapshots(snapshot_root, keep):
+    # working spaces already linked from them are unaffected
+    for name in os.listdir(snapshot_root):
+        path = os.path.join(snapshot_root, name)
+        if path == keep or name.startswith('.'):
+            continue
+        try:
+            if time.time() - os.stat(path).st_mtime <= snapshot_max_age:
+                continue
+            try:
+                # a job linking from it holds a shared lock
+                fd = lock_snapshot(path, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except IOError:
+                continue
+            if fd is None:
+                continue
+            try:
+                # unless used again before the lock was had
+                if time.time() - os.fstat(fd).st_mtime > snapshot_max_age:
+                    old = os.path.join(snapshot_root, ".old." + name + "." + str(os.getpid()))
+                    os.rename(path, old)
+                    shutil.rmtree(old)
+            finally:
+                os.close(fd)
+        except OSError:
+            pass
+
+
+def copy_writable(src, dest):
+    shutil.copy2(src, dest)
+    os.chmod(dest, os.stat(dest).st_mode | 0o200)
+
+
+def link_tree(snapshot, dest, mutable):
+    """
+    Fill dest with hard links to the files of the snapshot, copies of
+    those matching the mutable patterns. Returns the number of files copied.
+    """
+    copied = 0
+    for root, dir_names, file_names in os.walk(snapshot):
+        rel_root = os.path.relpath(root, snapshot)
+        to_dir = dest if rel_root == '.' else os.path.join(dest, rel_root)
+        for d in dir_names:
+            if os.path.islink(os.path.join(root, d)):
+                file_names.append(d)
+            else:
+                os.mkdir(os.path.join(to_dir, d))
+        for f in file_names:
+            src = os.path.join(root, f)
+            to_file = os.path.join(to_dir, f)
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), to_file)
+            elif matches(os.path.relpath(src, snapshot), mutable):
+                copy_writable(src, to_file)
+                copied += 1
+            else:
+                try:
+                    os.link(src, to_file)
+                except OSError as err:
+                    # other file system, or no hard links there
+                    if err.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                        raise
+                    copy_writable(src, to_file)
+                    copied += 1
+    return copied
+
+
+def stage(src_dir, dest, snapshot_root, skip_dirs, includes=None, mutable=None):
+    """
+    Stage the source tree into the (existing, empty) working space dest.
+    Returns the snapshot used and the number of files copied rather than linked.
+    """
+    dirs, files = source_entries(src_dir, skip_dirs, includes)
+    while True:
+        snapshot = make_snapshot(src_dir, snapshot_root, dirs, files)
+        fd = lock_snapshot(snapshot, fcntl.LOCK_SH)
+        if fd is not None:
+            break
+        # removed as it was found, make it again
+    try:
+        # the age of a snapshot counts from its last use
+        try:
+            os.utime(snapshot, None)
+        except OSError:
+            pass
+        copied = link_tree(snapshot, dest, mutable or [])
+    finally:
+        os.close(fd)
+    remove_old_snapshots(snapshot_root, snapshot)
+    return snapshot, copied
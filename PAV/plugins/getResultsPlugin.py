@@ -63,6 +63,10 @@ from yapsy.IPlugin import IPlugin
 from testConfig import YamlTestConfig
 import subprocess
 import logging
+import datetime
+import sqlite3
+from resultsindex import ResultsIndex, summary, trend_report
+import baselines
 #from testEntry import TestEntry
 
 
@@ -110,13 +114,18 @@ class GetResults(IPlugin):
 
         parser_gr.add_argument('-bl', '--make-baselines', action="store_true",
                                help='create base line averages from the selected set'
-                                    ' of test results and trend data values')
+                                    ' of test results and trend data values, also saved as JSON'
+                                    ' in the Baselines directory of the results root')
 
         parser_gr.add_argument('-lc', '--show-linecharts', action="store_true",
                                help='show line charts and data from the selected set'
                                     ' of test results and trend data values. Presently only supports'
                                     ' "s", "e", and "t" arguments')
 
+        parser_gr.add_argument('--no-index', action="store_true",
+                               help='read every log with the get_results script instead of using'
+                                    ' the results index')
+
         parser_gr.set_defaults(sub_cmds='get_results')
         return 'get_results'
 
@@ -161,6 +170,14 @@ class GetResults(IPlugin):
 
             # call something here that gets the results
             self.logger.debug('get_results from %s' % results_dir)
+
+            if not (args['no_index'] or args['make_box_plots'] or args['show_linecharts']):
+                try:
+                    print "\n" + self.indexed_results(results_dir, args)
+                    continue
+                except (sqlite3.Error, OSError) as e:
+                    print "  Warning: results index not usable (%s), reading the logs" % str(e)
+
             # add in all the possible args
             # implement different shared Nix groups later, using gzshared for now
             bc = "/scripts/get_results -g gzshared"
@@ -190,8 +207,12 @@ class GetResults(IPlugin):
                 bc += " -T "
 
             if args['make_box_plots']:
-                plot_cmd = os.environ['PVINSTALL'] + "/PAV/modules/makeboxplots.py"
-                gr_cmd = os.environ['PVINSTALL'] + "/PAV" + bc + " -T -l " + results_dir + " | " + plot_cmd
+                # the trend data comes from the trend data store, not the logs
+                start, end = self.date_range(args)
+                gr_cmd = os.environ['PVINSTALL'] + "/PAV/modules/makeboxplots.py --store " + results_dir + \
+                    " -s '" + start + "' -e '" + end + "'"
+                if args['t']:
+                    gr_cmd += " -t " + args['t'][0]
             elif args['show_linecharts']:
                 gr_cmd = os.environ['PVINSTALL'] + "/PAV/scripts/showtd " + results_dir + "/test_results.csv"
                 if args['t']:
@@ -201,10 +222,9 @@ class GetResults(IPlugin):
                 if args['e']:
                     gr_cmd += " -e " + args['e'][0]
             elif args['make_baselines']:
-                bl1_cmd = os.environ['PVINSTALL'] + "/PAV/modules/makebaselines.py"
-                bl2_cmd = os.environ['PVINSTALL'] + "/PAV/scripts/mkBaselines"
-                gr_cmd = os.environ['PVINSTALL'] + "/PAV" + bc + " -T -l " + results_dir + " | " +\
-                    bl1_cmd + " | " + bl2_cmd
+                bl_cmd = os.environ['PVINSTALL'] + "/PAV/modules/baselines.py -o " + \
+                    baselines.baseline_file(results_dir)
+                gr_cmd = os.environ['PVINSTALL'] + "/PAV" + bc + " -T -l " + results_dir + " | " + bl_cmd
             else:
                 gr_cmd = os.environ['PVINSTALL'] + "/PAV" + bc + " -l " + results_dir
 
@@ -214,6 +234,62 @@ class GetResults(IPlugin):
             gr_output = subprocess.check_output(gr_cmd, shell=True)
             print "\n" + gr_output
 
+    @staticmethod
+    def date_range(args):
+        """ start and end ('YYYY-MM-DD HH:MM:SS') of the results wanted """
+        today = datetime.date.today().strftime("%Y-%m-%d")
+        end_date = args['e'][0] if args['e'] else today
+        end_time = args['E'][0] if args['E'] else "23:59:59"
+        if args['s']:
+            start_date = args['s'][0]
+        elif args['S']:
+            start_date = today
+        else:
+            start_date = (datetime.date.today() - datetime.timedelta(days=15)).strftime("%Y-%m-%d")
+        start_time = args['S'][0] if args['S'] else "00:00:00"
+        return start_date + " " + start_time, end_date + " " + end_time
+
+    def indexed_results(self, results_dir, args):
+        """ the get_results summary, trend data or baselines, answered from the results index """
+        start, end = self.date_range(args)
+        # implement different shared Nix groups later, using gzshared for now
+        group = "gzshared"
+
+        index = ResultsIndex(results_dir)
+        try:
+            stats = index.scan(group, start, end)
+            if args['verbose']:
+                print "%d run(s) added to the results index %s" % (stats['added'], index.path)
+            runs = index.runs(group, start, end, args['t'][0] if args['t'] else None,
+                              args['u'][0] if args['u'] else None)
+
+            if args['make_baselines']:
+                collected = baselines.Baselines()
+                collected.add_lines(trend_report(index, runs).splitlines())
+                found = collected.stats()
+                bl_file = baselines.baseline_file(results_dir)
+                baselines.save(bl_file, found)
+                return baselines.report(found) + "\nBaselines file -> %s\n" % bl_file
+
+            out = "\n  --------------------------------------------------------------------  \n\n"
+            out += "  *** Job Summary (results root directory -> %s) ***\n" % results_dir
+            out += "  From: %s through %s \n" % (start, end)
+            if not args['td']:
+                if args['xtime']:
+                    out += "    Output format: testName.numNodesXnumCores(test arguments) - results," \
+                           " [min, mean, max run time in secs]\n"
+                else:
+                    out += "    Output format: testName.numNodesXnumCores(test arguments) - results," \
+                           " [Avg. run time in secs]\n"
+            out += "\n  group: " + group
+            if args['td']:
+                out += trend_report(index, runs)
+            else:
+                out += summary(runs, args['fail'], args['pass'], args['inc'], args['xtime'])
+        finally:
+            index.close()
+        return out
+
 
 if __name__ == "__main__":
     print GetResults.__doc__
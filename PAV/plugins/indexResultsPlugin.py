@@ -0,0 +1,139 @@
+#!python
+
+#  ###################################################################
+#
+#  Disclaimer and Notice of Copyright 
+#  ==================================
+#
+#  Copyright (c) 2015, Los Alamos National Security, LLC
+#  All rights reserved.
+#
+#  Copyright 2015. Los Alamos National Security, LLC. 
+#  This software was produced under U.S. Government contract 
+#  DE-AC52-06NA25396 for Los Alamos National Laboratory (LANL), 
+#  which is operated by Los Alamos National Security, LLC for 
+#  the U.S. Department of Energy. The U.S. Government has rights 
+#  to use, reproduce, and distribute this software.  NEITHER 
+#  THE GOVERNMENT NOR LOS ALAMOS NATIONAL SECURITY, LLC MAKES 
+#  ANY WARRANTY, EXPRESS OR IMPLIED, OR ASSUMES ANY LIABILITY 
+#  FOR THE USE OF THIS SOFTWARE.  If software is modified to 
+#  produce derivative works, such modified software should be 
+#  clearly marked, so as not to confuse it with the version 
+#  available from LANL.
+#
+#  Additionally, redistribution and use in source and binary 
+#  forms, with or without modification, are permitted provided 
+#  that the following conditions are met:
+#  -  Redistributions of source code must retain the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer. 
+#  -  Redistributions in binary form must reproduce the 
+#     above copyright notice, this list of conditions 
+#     and the following disclaimer in the documentation 
+#     and/or other materials provided with the distribution. 
+#  -  Neither the name of Los Alamos National Security, LLC, 
+#     Los Alamos National Laboratory, LANL, the U.S. Government, 
+#     nor the names of its contributors may be used to endorse 
+#     or promote products derived from this software without 
+#     specific prior written permission.
+#   
+#  THIS SOFTWARE IS PROVIDED BY LOS ALAMOS NATIONAL SECURITY, LLC 
+#  AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+#  INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF 
+#  MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+#  IN NO EVENT SHALL LOS ALAMOS NATIONAL SECURITY, LLC OR CONTRIBUTORS 
+#  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, 
+#  OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, 
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, 
+#  OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY 
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR 
+#  TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT 
+#  OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY 
+#  OF SUCH DAMAGE.
+#
+#  ###################################################################
+
+
+
+""" plugin that implements the index_results command
+"""
+
+import os
+import sys
+import sqlite3
+import logging
+from yapsy.IPlugin import IPlugin
+from testConfig import YamlTestConfig
+from resultsindex import ResultsIndex
+from trendstore import TrendStore
+
+
+class IndexResults(IPlugin):
+    """ This implements the plugin, or command, to bring the results
+        index get_results reads, and the trend data store, up to date.
+    """
+
+    def __init__(self):
+        my_name = self.__class__.__name__
+        self.logger = logging.getLogger('pav.' + my_name)
+        self.logger.info('created instance of plugin: %s' % my_name)
+
+    # Every plugin class MUST have a method by the name "add_parser_info"
+    # and must return the name of the the sub-command
+
+    def add_parser_info(self, subparser):
+        parser_ir = subparser.add_parser("index_results",
+                                         help="add new test results to the results index and the trend data store")
+        parser_ir.add_argument('-ts', nargs=1, metavar='<file>',
+                               help='test suite to acquire results path (root) from,'
+                                    ' else will look in current directory for default test suite')
+        parser_ir.add_argument('--full', action="store_true",
+                               help='scan every day directory again, not only the ones that may have changed,'
+                                    ' index every run again and drop the runs removed since')
+        parser_ir.set_defaults(sub_cmds='index_results')
+        return 'index_results'
+
+    # Every plug-in (command) MUST have a method by the name "cmd".
+    # It will be what is called when that command is selected.
+    def cmd(self, args):
+
+        if args['verbose']:
+            print "Command args -> %s" % args
+
+        if args['ts']:
+            dts = str(args['ts'][0])
+        else:
+            print "Will look for default_test_config.yaml in current working directory ..."
+            dts = os.getcwd() + "/default_test_config.yaml"
+
+        tc = YamlTestConfig(dts)
+
+        for results_dir in tc.get_result_locations():
+            if not os.access(results_dir, os.R_OK):
+                print "  Warning: results directory (%s) not readable, skipping" % results_dir
+                continue
+            try:
+                index = ResultsIndex(results_dir)
+                try:
+                    # implement different shared Nix groups later, using gzshared for now
+                    stats = index.scan("gzshared", full=args['full'])
+                finally:
+                    index.close()
+            except (sqlite3.Error, OSError) as e:
+                print "  Error: can't update the results index of %s: %s" % (results_dir, str(e))
+                continue
+            print "%s: %d new run(s), %d updated, %d removed; %d day(s) and %d test directories visited," \
+                  " %d unfinished run(s) checked" % \
+                  (index.path, stats['added'], stats['updated'], stats['removed'], stats['days'], stats['dirs'],
+                   stats['rechecked'])
+
+            # and the trend data store showtd and the box plots read
+            try:
+                store = TrendStore(results_dir)
+                print "%s: %d new trend data value(s)" % (store.path, store.sync())
+            except (IOError, OSError) as e:
+                print "  Error: can't update the trend data store of %s: %s" % (results_dir, str(e))
+
+
+if __name__ == "__main__":
+    print IndexResults.__doc__
@@ -59,92 +59,27 @@
 
 import os
 import sys
-import subprocess
 import json
 import logging
-import time
-import itertools
 
 from yapsy.IPlugin import IPlugin
 from testConfig import YamlTestConfig
 from testEntry import TestEntry, MoabTestEntry, RawTestEntry, SlurmTestEntry
+from jobdispatcher import JobDispatcher
+from jobarray import JobArrays
+from argexpansion import expand_args
+from submitdaemon import SubmitDaemon
 
 
-def expansion (initial_arguements, initial_restrictions):
-    list_of_lists=[]
-    my_list=[]
-    temp_list=[]
-    temp_string=""
-    return_list_of_strings=[]
-
+def expansion(initial_arguements, initial_restrictions, counts=None):
+    """
+    Returns the list of argument strings made from every combination of
+    the test_args lists that is not restricted, see expand_args.
+    """
     # check to see if inital arguments in an array. if not we can just return it
-    if (not isinstance(initial_arguements, list)):
+    if not isinstance(initial_arguements, list):
         return initial_arguements
-
-    ## Definitions of variables ## {{{
-    #   lists_of_lists will store the lists arguements passed in
-    #   my_list will store all the combinations of the lists passed in
-    #   temp_list will store the complete array of arguements after 
-    #       expansion, but will not keep previous data
-    #   temp_string will store the complete string of arguements
-    #       but will not keep previous data
-    #   return_list_of_strings hold all complete and valid arguement 
-    #       strings to be returned.
-    ## }}}
-    ## Code ##{{{
-    #   Check if the user has passed in a list of other than one 
-    #       dimension
-    #       Then create a string of all arguements
-    #       Check if any of the restrictions are met, whether they are
-    #           one dimensional or two,
-    #           returns an empty string if they are
-    #           returns the string of all arguements if they are not
-    #   If the arguement list is not single dimensional list
-    #       Then create every combination of the intial_arguements
-    #       For each combination,
-    #           Check if any of the restrictions are met, whether they 
-    #           are one dimensional or two,
-    #       returns the list of all strings of all arguement 
-    #           combinations that are not restricted
-    ## }}}
-    if (all((type(arguement) != list) for arguement in initial_arguements)):
-        for iterator in initial_arguements:
-            temp_string=str(iterator)
-            if ( (any (((type(restrictions) != list) 
-                and (restrictions in temp_string)) 
-                for restrictions in initial_restrictions) ) 
-                or ( (any((type(restrictions) == list) 
-                for restrictions in initial_restrictions)) 
-                and (any ((all ((restriction in temp_string) 
-                for restriction in restrictions)) 
-                for restrictions in initial_restrictions)) )): 
-                pass
-            else:
-                return_list_of_strings.append(temp_string)
-    else:
-        for arguement in initial_arguements:
-            list_of_lists.append(arguement)
-        my_list=list(itertools.product(*list_of_lists))
-        for i in my_list:
-            for j in i:
-                temp_list.append(j)
-            for iterator in temp_list:
-                temp_string+=iterator+" "
-            if ( (any (((type(restrictions) != list) 
-                and (restrictions in temp_string)) 
-                for restrictions in initial_restrictions) ) 
-                or ( (any((type(restrictions) == list) 
-                for restrictions in initial_restrictions)) 
-                and (any ((all ((restriction in temp_string) 
-                for restriction in restrictions)) 
-                for restrictions in initial_restrictions)) )): 
-                pass
-            else:
-                return_list_of_strings.append(temp_string)
-            temp_list=[ ]
-            temp_string=""
-    return return_list_of_strings
-
+    return list(expand_args(initial_arguements, initial_restrictions, counts))
 
 
 class RunTestSuite(IPlugin):
@@ -157,8 +92,10 @@ class RunTestSuite(IPlugin):
         my_name = self.__class__.__name__
         self.logger = logging.getLogger('pav.' + my_name)
         self.logger.info('created instance of plugin: %s' % my_name)
+        self.dispatcher = None
+        self.job_arrays = None
 
-    def job_dispatcher(self, my_te, in_args):
+    def job_dispatcher(self, my_te, in_args, job_env=None):
         #print "dispatch " + my_te.get_id() + " : "
         #print my_te.this_dict[my_te.get_id()]
         params = my_te.get_values()
@@ -166,16 +103,8 @@ class RunTestSuite(IPlugin):
         uid = my_te.get_id()
         lh = uid + "-" + my_te.get_name()
         self.logger.info('dispatch: %s, variation: (%s)' % (lh, my_te.get_id()))
-        runjob_cmd = os.environ['PVINSTALL'] + "/PAV/modules/runjob.py"
-        master_log_file = os.environ['PV_LOG']
-        args = ["python", runjob_cmd, uid, js_params, master_log_file]
-        p = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.PIPE)
-        if in_args['serial']:
-            output, errors = p.communicate()
-            if p.returncode or errors:
-                print "job_dispatcher: Error: Job failed to run! "
-                print [p.returncode, errors, output]
-
+        # run the job (runjob logic) in one of the dispatcher's pre-loaded workers
+        self.dispatcher.dispatch(uid, js_params, job_env)
 
     # build the sub-command argument list
     def add_parser_info(self, subparser): 
@@ -183,11 +112,20 @@ class RunTestSuite(IPlugin):
         parser_rts.add_argument('testSuite', help='test-suite-config-file')
         parser_rts.add_argument('-d', "--debug", help="don't run, show what would be done", action="store_true")
         parser_rts.add_argument('-D', nargs=1, metavar='<secs>',
-                               help="submit again after delaying this many <secs> - NOT WORKING YET!")
+                               help="keep running, submitting the test suite again every <secs>")
+        parser_rts.add_argument("--detach", action="store_true",
+                                help="with -D, run in the background")
+        parser_rts.add_argument("--status", metavar='<file>',
+                                help="with -D, write the state of the submissions to <file>")
         parser_rts.add_argument('-m', "--ldms",
                                 help="start LDMS metrics. Within Moab allocation only", action="store_true")
-        #parser_rts.add_argument('-p', nargs=1, metavar='<val>', help="fill host to this percent usage (DRM specific)")
+        parser_rts.add_argument('-p', nargs=1, metavar='<val>', type=float,
+                                help="fill host to this percent node usage, skipping variations that don't fit (DRM specific)")
         parser_rts.add_argument('-s', "--serial", help="run jobs serially, default mode is parallel", action="store_true")
+        parser_rts.add_argument('-a', "--array", action="store_true",
+                                help="submit variations with the same resource request as job arrays (Slurm/Moab)")
+        parser_rts.add_argument('-j', "--jobs", type=int, metavar='<N>',
+                                help="dispatch at most <N> jobs at a time in parallel mode, default is the core count")
         parser_rts.add_argument('-w', nargs=1, metavar='<count>',
                                 help="don't submit if <count> of my jobs running or queued (DRM specific)")
         parser_rts.add_argument('-t', "--test", type=str, metavar='<test>', action='append',
@@ -195,24 +133,6 @@ class RunTestSuite(IPlugin):
         parser_rts.set_defaults(sub_cmds='run_test_suite')
         return 'run_test_suite'
 
-    @staticmethod
-    def submit_delay(args):
-        """
-        Delay for continuous submissions, or develop another method to trigger
-        jobs.
-        """
-        try:
-            if args['D']:
-                secs_to_sleep = int(args['D'][0])
-                time.sleep(secs_to_sleep)
-                sys.stdout.write('\rRunning in continuous mode with a delay of %s seconds...' % secs_to_sleep)
-                sys.stdout.flush()
-                return True
-        except:
-            raise ValueError("Error: invalid delay time argument!")
-
-        return False
-
     def cmd(self, args):
         """
         Every class used as a plugin (sub-command) MUST have a method
@@ -238,64 +158,130 @@ class RunTestSuite(IPlugin):
         if args['debug']:
             return
 
-        # Process and launch each test entry (stanza) from the test suite.
-        submit_again = True
-        while submit_again:
-            for entry_id, test_suite_entry in my_test_suite.iteritems():
+        # continuous mode, one process submits the test suite over and over
+        submit_daemon = None
+        if args['D']:
+            try:
+                submit_daemon = SubmitDaemon(self, tc, args)
+            except ValueError as err:
+                sys.exit(str(err))
 
-                # Don't process the DTS definition
-                if "DefaultTestSuite" in entry_id:
-                    continue
-                # Don't process include directive
-                if "IncludeTestSuite" in entry_id:
+        # Jobs are run by a bounded pool of workers forked from this process
+        try:
+            self.dispatcher = JobDispatcher(workers=args['jobs'], serial=args['serial'],
+                                            show_progress=not args['serial'] and not submit_daemon)
+        except ValueError as err:
+            sys.exit(str(err))
+
+        if args['array']:
+            self.job_arrays = JobArrays()
+
+        try:
+            if submit_daemon:
+                submit_daemon.run()
+            else:
+                self.submit_test_suite(my_test_suite, args)
+            self.dispatcher.wait()
+        except KeyboardInterrupt:
+            self.dispatcher.terminate()
+            raise
+
+    def room_to_fill(self, test_entry, percent):
+        """
+        Check if the nodes this variation asks for fit under the percent
+        usage of the machine. If so they are counted as used.
+        """
+        usage = test_entry.node_usage()
+        if usage is None:
+            return True
+        nodes = test_entry.get_node_request()
+        if not usage.room_for(nodes, percent):
+            self.logger.info('%s: %d nodes would exceed %s%% usage (%.1f%% used), not launched' %
+                             (test_entry.get_id(), nodes, percent, usage.percent_used()))
+            return False
+        usage.add(nodes)
+        return True
+
+    def submit_test_suite(self, my_test_suite, args):
+        """
+        Process and launch each test entry (stanza) from the test suite,
+        once. In continuous mode the SubmitDaemon calls this every cycle.
+        """
+        for entry_id, test_suite_entry in my_test_suite.iteritems():
+
+            # Don't process the DTS definition
+            if "DefaultTestSuite" in entry_id:
+                continue
+            # Don't process include directive
+            if "IncludeTestSuite" in entry_id:
+                continue
+            # Don't process it it is not in the test list (if a test list is specified)
+            if args['test']:
+                if entry_id not in args['test']:
+                    if args['verbose']:
+                        print "Skipping %s" % entry_id
                     continue
-                # Don't process it it is not in the test list (if a test list is specified)
-                if args['test']:
-                    if entry_id not in args['test']:
-                        if args['verbose']:
-                            print "Skipping %s" % entry_id
-                        continue
-
-                # instantiate a new object for each test Entry type  ( Raw, Moab, etc. )
-                # i.e. , te = MoabTestEntry(...)
-                try:
-                    st = test_suite_entry['run']['scheduler']
-                    scheduler_type = st.capitalize()
-                except AttributeError:
-                    scheduler_type = "Raw"
-
-                # There needs to be this type of scheduler object implemented to support this
-                # See the testEntry.py file for examples
-                object_name = scheduler_type + "TestEntry"
-
-                test_args_restrictions = []
-                if 'test_args_restrictions' in test_suite_entry['run'] and test_suite_entry['run']['test_args_restrictions']:
-                    test_args_restrictions = test_suite_entry['run']['test_args_restrictions']
-                test_suite_entry['run']['test_args']=expansion(test_suite_entry['run']['test_args'], test_args_restrictions)
-
-                try:
-                    te = globals()[object_name](entry_id, test_suite_entry, args)
-                except KeyError:
-                    raise ValueError(scheduler_type + " scheduler type not supported (check the test entry), exiting!")
-
-                # If user specifies a max level of jobs to queue and run (watermark) then
-                # don't launch a new set if this level is reached.
-                if (args['w'] and te.room_to_run(args)) or not args['w']:
-                    # print "plenty of room to run"
-                    # launch a new process for each test variation and/or count
-                    for test_entry in te.get_test_variations():
-                        # initialize a unique LDMS for each job
-                        os.environ['LDMS_START_CMD'] = ''
-                        if args['ldms'] or ('ldms' in test_suite_entry and test_suite_entry['ldms']['state']):
-                            #print test_suite_entry['ldms']['state']
-                            te.prep_ldms()
-
-                        for _ in range(te.get_run_count()):
-                            #print "dispatch with:"
-                            #print test_entry.get_id()
-                            self.job_dispatcher(test_entry, args)
-
-            submit_again = RunTestSuite.submit_delay(args)
+
+            # instantiate a new object for each test Entry type  ( Raw, Moab, etc. )
+            # i.e. , te = MoabTestEntry(...)
+            try:
+                st = test_suite_entry['run']['scheduler']
+                scheduler_type = st.capitalize()
+            except AttributeError:
+                scheduler_type = "Raw"
+
+            # There needs to be this type of scheduler object implemented to support this
+            # See the testEntry.py file for examples
+            object_name = scheduler_type + "TestEntry"
+
+            test_args_restrictions = []
+            if 'test_args_restrictions' in test_suite_entry['run'] and test_suite_entry['run']['test_args_restrictions']:
+                test_args_restrictions = test_suite_entry['run']['test_args_restrictions']
+            counts = {}
+            test_suite_entry['run']['test_args'] = expansion(test_suite_entry['run']['test_args'],
+                                                             test_args_restrictions, counts)
+            if counts:
+                self.logger.info('%s: test_args expanded to %d, %d restricted combinations pruned' %
+                                 (entry_id, counts['expanded'], counts['pruned']))
+
+            try:
+                te = globals()[object_name](entry_id, test_suite_entry, args)
+            except KeyError:
+                raise ValueError(scheduler_type + " scheduler type not supported (check the test entry), exiting!")
+
+            # If user specifies a max level of jobs to queue and run (watermark) then
+            # don't launch a new set if this level is reached.
+            if (args['w'] and te.room_to_run(args)) or not args['w']:
+                # print "plenty of room to run"
+                # launch a new process for each test variation and/or count,
+                # variations are generated as they are dispatched
+                self.logger.info('%s: %d variations' % (entry_id, te.get_variation_count()))
+                for test_entry in te.get_test_variations():
+                    # initialize a unique LDMS for each job
+                    job_env = {'LDMS_START_CMD': ''}
+                    if args['ldms'] or ('ldms' in test_suite_entry and test_suite_entry['ldms']['state']):
+                        #print test_suite_entry['ldms']['state']
+                        job_env.update(te.prep_ldms())
+
+                    for _ in range(te.get_run_count()):
+                        #print "dispatch with:"
+                        #print test_entry.get_id()
+                        if args['p'] and not self.room_to_fill(test_entry, args['p'][0]):
+                            break
+                        task_env = dict(job_env)
+                        if self.job_arrays:
+                            task_env.update(self.job_arrays.add(test_entry))
+                        self.job_dispatcher(test_entry, args, task_env)
+                        test_entry.job_submitted()
+
+        # collect whatever finished during this pass
+        self.dispatcher.reap()
+
+        # job arrays are submitted once all their tasks are prepared
+        if self.job_arrays:
+            self.dispatcher.wait()
+            self.job_arrays.submit()
+
 
 if __name__ == "__main__":
     print RunTestSuite.__doc__
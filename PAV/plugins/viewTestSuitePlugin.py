@@ -99,6 +99,10 @@ class ViewTestSuite(IPlugin):
             with open(args['testSuite']) as file:
                 # Build the test configuration
                 tc = YamlTestConfig(args['testSuite'])
+
+            if tc.has_includes():
+                print "\nTest suite includes:"
+                tc.show_include_graph()
                 
             if args['dict']:
                 
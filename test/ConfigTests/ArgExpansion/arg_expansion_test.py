@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+import unittest
+import sys
+import os
+
+base = os.path.abspath("../../../")
+sys.path.append(base)
+sys.path.append(base + "/PAV/special_pkgs")
+sys.path.append(base + "/PAV/modules")
+
+from argexpansion import expand_args
+
+
+class ArgExpansionTest(unittest.TestCase):
+    def test_single_list(self):
+        counts = {}
+        self.assertEqual(list(expand_args(['-n 1', '-n 2', '-n 4'], ['-n 2'], counts)),
+                         ['-n 1', '-n 4'])
+        self.assertEqual(counts, {'expanded': 2, 'pruned': 1})
+
+    def test_product(self):
+        self.assertEqual(list(expand_args([['a', 'b'], ['x', 'y']], [])),
+                         ['a x ', 'a y ', 'b x ', 'b y '])
+
+    def test_string_restriction(self):
+        counts = {}
+        self.assertEqual(list(expand_args([['a', 'b'], ['x', 'y'], ['1', '2']], ['b y'], counts)),
+                         ['a x 1 ', 'a x 2 ', 'a y 1 ', 'a y 2 ', 'b x 1 ', 'b x 2 '])
+        self.assertEqual(counts, {'expanded': 6, 'pruned': 2})
+
+    def test_list_restriction(self):
+        counts = {}
+        self.assertEqual(list(expand_args([['a', 'b'], ['x', 'y']], [['a', 'y']], counts)),
+                         ['a x ', 'b x ', 'b y '])
+        self.assertEqual(counts, {'expanded': 3, 'pruned': 1})
+
+    def test_pruned_prefix(self):
+        # everything after a restricted first argument is skipped
+        counts = {}
+        args = [['a', 'b']] + [[str(i) for i in range(10)]] * 4
+        self.assertEqual(len(list(expand_args(args, ['a'], counts))), 10000)
+        self.assertEqual(counts['pruned'], 10000)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
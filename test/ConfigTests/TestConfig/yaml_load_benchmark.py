@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+"""
+Time parsing a large generated test suite with the pure Python
+YAML loader and, when the libyaml extension is present, with the C loader.
+
+usage: yaml_load_benchmark.py [number_of_stanzas]
+"""
+
+import sys
+import os
+import time
+
+base = os.path.abspath("../../../")
+sys.path.append(base)
+sys.path.append(base + "/PAV/special_pkgs")
+sys.path.append(base + "/PAV/modules")
+
+import yaml
+
+stanza = """
+T{0}:
+  name: test{0}
+  source_location: /tmp/src
+  run:
+    cmd: runme
+    scheduler: slurm
+    test_args: ['-n 1', '-n 2']
+  slurm:
+    num_nodes: [1, 2, 4]
+    procs_per_node: 16
+    time_limit: '01:00:00'
+  results:
+    root: /tmp/results
+"""
+
+
+def time_load(text, loader, repeat=3):
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        yaml.load(text, Loader=loader)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main(args):
+    count = int(args[1]) if len(args) > 1 else 2000
+    text = "".join(stanza.format(i) for i in range(count))
+    print "stanzas: %d, size: %d bytes" % (count, len(text))
+
+    py_time = time_load(text, yaml.SafeLoader)
+    print "SafeLoader:  %.3f s" % py_time
+
+    if yaml.__with_libyaml__:
+        c_time = time_load(text, yaml.CSafeLoader)
+        print "CSafeLoader: %.3f s (%.1fx faster)" % (c_time, py_time / c_time)
+    else:
+        print "CSafeLoader: not available (libyaml _yaml extension not installed)"
+
+
+if __name__ == '__main__':
+    main(sys.argv)
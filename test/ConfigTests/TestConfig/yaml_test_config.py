@@ -3,6 +3,9 @@
 import unittest
 import sys
 import os
+import shutil
+import tempfile
+import time
 
 base = os.path.abspath("../../../")
 sys.path.append(base)
@@ -11,7 +14,30 @@ sys.path.append(base + "/PAV/modules")
 
 from testConfig import YamlTestConfig
 
+suite_text = """
+T1:
+  name: t1
+  source_location: /tmp
+  run:
+    cmd: runme
+"""
+
+default_text = """
+DefaultTestSuite:
+  run:
+    cmd: ''
+    test_args: []
+"""
+
+
 class YamlTestConfigTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        os.environ['PV_CONFIG_CACHE'] = self.tmp_dir + "/cache"
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
     def test_invalid_default_file(self):
         with self.assertRaises(SystemExit):
             YamlTestConfig('invalid_default.yaml')
@@ -23,5 +49,64 @@ class YamlTestConfigTest(unittest.TestCase):
     def test_invalid_yaml_file(self):
         with self.assertRaises(SystemExit):
             YamlTestConfig('invalid_yaml.yaml')
+
+    def test_config_cache(self):
+        ucf = self.tmp_dir + "/suite.yaml"
+        dcf = self.tmp_dir + "/default_test_config.yaml"
+        with open(ucf, "w") as f:
+            f.write(suite_text)
+        with open(dcf, "w") as f:
+            f.write(default_text)
+
+        first = YamlTestConfig(ucf)
+        self.assertTrue(os.path.isfile(first.cache_file))
+        cached = YamlTestConfig(ucf)
+        self.assertEqual(cached.get_effective_config_file(), first.get_effective_config_file())
+        self.assertEqual(cached.get_effective_config_file()['T1']['run']['test_args'], [])
+        self.assertEqual(os.stat(os.path.dirname(first.cache_file)).st_mode & 0o777, 0o700)
+
+        # a cache file others can write to is never loaded
+        os.chmod(first.cache_file, 0o666)
+        self.assertFalse(cached.load_cache())
+        os.chmod(first.cache_file, 0o600)
+        self.assertTrue(cached.load_cache())
+
+        # a changed default config is picked up
+        with open(dcf, "w") as f:
+            f.write(default_text.replace("[]", "['a']"))
+        os.utime(dcf, (time.time() + 10, time.time() + 10))
+        changed = YamlTestConfig(ucf)
+        self.assertEqual(changed.get_effective_config_file()['T1']['run']['test_args'], ['a'])
+
+    def write_suite(self, fn, name, includes):
+        with open(os.path.join(self.tmp_dir, fn), "w") as f:
+            f.write("IncludeTestSuite: %s\n" % includes)
+            f.write(suite_text.replace("T1", name.upper()).replace("t1", name))
+
+    def test_nested_includes(self):
+        with open(self.tmp_dir + "/default_test_config.yaml", "w") as f:
+            f.write(default_text)
+        self.write_suite("top.yaml", "top", ['a.yaml', 'b.yaml'])
+        self.write_suite("a.yaml", "a", ['c.yaml'])
+        self.write_suite("b.yaml", "b", ['c.yaml'])
+        self.write_suite("c.yaml", "c", ['d.yaml'])
+        self.write_suite("d.yaml", "d", [])
+
+        tc = YamlTestConfig(self.tmp_dir + "/top.yaml", use_cache=False)
+        for name in ['TOP', 'A', 'B', 'C', 'D']:
+            self.assertIn(name, tc.get_effective_config_file())
+        # the shared include is only read once
+        self.assertEqual(len(tc.config_files), 6)
+        self.assertTrue(tc.has_includes())
+
+    def test_include_cycle(self):
+        with open(self.tmp_dir + "/default_test_config.yaml", "w") as f:
+            f.write(default_text)
+        self.write_suite("top.yaml", "top", ['a.yaml'])
+        self.write_suite("a.yaml", "a", ['top.yaml'])
+        with self.assertRaises(SystemExit):
+            YamlTestConfig(self.tmp_dir + "/top.yaml", use_cache=False)
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
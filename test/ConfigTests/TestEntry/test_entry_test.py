@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+import unittest
+import sys
+import os
+
+base = os.path.abspath("../../../")
+sys.path.append(base)
+sys.path.append(base + "/PAV/special_pkgs")
+sys.path.append(base + "/PAV/modules")
+
+from testEntry import SlurmTestEntry, with_value
+
+
+def slurm_entry():
+    return {'name': 'test1',
+            'run': {'cmd': 'runme', 'scheduler': 'slurm', 'test_args': ['a', 'b']},
+            'slurm': {'num_nodes': [1, 2], 'procs_per_node': 4, 'node_list': ''},
+            'results': {'root': '/tmp'}}
+
+
+class TestEntryTest(unittest.TestCase):
+    def test_with_value(self):
+        d = slurm_entry()
+        new_d = with_value(d, ('slurm', 'num_nodes'), '1')
+        self.assertEqual(new_d['slurm']['num_nodes'], '1')
+        self.assertEqual(d['slurm']['num_nodes'], [1, 2])
+        # untouched parts are shared, not copied
+        self.assertIs(new_d['run'], d['run'])
+
+    def test_variations_share_original(self):
+        d = slurm_entry()
+        te = SlurmTestEntry('T1', d, None)
+        self.assertEqual(te.get_variation_count(), 4)
+        tv = list(te.get_test_variations())
+        self.assertEqual(len(tv), 4)
+        self.assertEqual(sorted((v.get_num_nodes(), v.get_arg_str()) for v in tv),
+                         [('1', 'a'), ('1', 'b'), ('2', 'a'), ('2', 'b')])
+        self.assertEqual(d, slurm_entry())
+        self.assertIs(tv[0].get_values()['results'], d['results'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
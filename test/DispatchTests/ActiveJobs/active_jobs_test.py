@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+
+base = os.path.abspath("../../../")
+sys.path.append(base)
+sys.path.append(base + "/PAV/special_pkgs")
+sys.path.append(base + "/PAV/modules")
+
+from activejobs import ActiveJobs
+
+
+class ActiveJobsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.log = self.tmp_dir + "/queries"
+        # fake scheduler query, logs each call
+        self.cmd = ['sh', '-c', 'echo >> %s; printf "1 me seg1\\n2 me seg2\\n3 you seg1\\n"' % self.log]
+        ActiveJobs.samplers = {}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def queries(self):
+        with open(self.log) as f:
+            return len(f.readlines())
+
+    def test_shared_sample(self):
+        aj = ActiveJobs.sampler(self.cmd, 'me')
+        self.assertEqual(aj.count(), 2)
+        self.assertEqual(ActiveJobs.sampler(self.cmd, 'me').count('seg1'), 1)
+        self.assertEqual(self.queries(), 1)
+
+    def test_submitted_jobs_counted(self):
+        aj = ActiveJobs.sampler(self.cmd, 'me')
+        self.assertEqual(aj.count(), 2)
+        aj.add('seg1')
+        aj.add('seg2')
+        self.assertEqual(aj.count(), 4)
+        self.assertEqual(aj.count('seg1'), 2)
+
+    def test_resample(self):
+        aj = ActiveJobs.sampler(self.cmd, 'me')
+        aj.count()
+        aj.add()
+        aj.sampled -= ActiveJobs.max_age
+        self.assertEqual(aj.count(), 2)
+        self.assertEqual(self.queries(), 2)
+
+    def test_missing_command(self):
+        self.assertEqual(ActiveJobs.sampler(['no-such-scheduler-cmd']).count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+import unittest
+import sys
+import os
+import time
+import tempfile
+import shutil
+
+base = os.path.abspath("../../../")
+sys.path.append(base)
+sys.path.append(base + "/PAV/special_pkgs")
+sys.path.append(base + "/PAV/modules")
+
+import runjob
+from jobdispatcher import JobDispatcher
+
+
+class JobDispatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.run_job = runjob.run_job
+        # stand-in for the real job, records when it ran
+        def fake_run_job(uid, js_params, env=None):
+            with open(os.path.join(self.tmp_dir, uid), "w") as f:
+                f.write("%f\n" % time.time())
+                time.sleep(0.2)
+                f.write("%f\n" % time.time())
+            if js_params == "fail":
+                raise RuntimeError("job failed")
+        runjob.run_job = fake_run_job
+
+    def tearDown(self):
+        runjob.run_job = self.run_job
+        shutil.rmtree(self.tmp_dir)
+
+    def job_times(self):
+        times = []
+        for uid in os.listdir(self.tmp_dir):
+            with open(os.path.join(self.tmp_dir, uid)) as f:
+                times.append([float(t) for t in f.read().split()])
+        return times
+
+    def test_all_jobs_run(self):
+        jd = JobDispatcher(workers=3)
+        for i in range(5):
+            jd.dispatch("job" + str(i), "{}")
+        self.assertEqual(jd.wait(), 0)
+        self.assertEqual(jd.completed, 5)
+        self.assertEqual(len(os.listdir(self.tmp_dir)), 5)
+
+    def test_concurrency_limit(self):
+        jd = JobDispatcher(workers=2)
+        for i in range(6):
+            jd.dispatch("job" + str(i), "{}")
+        jd.wait()
+        times = self.job_times()
+        for start, _ in times:
+            in_flight = [1 for s, e in times if s <= start < e]
+            self.assertTrue(len(in_flight) <= 2)
+
+    def test_serial(self):
+        jd = JobDispatcher(workers=4, serial=True)
+        jd.dispatch("job1", "{}")
+        self.assertEqual(jd.running, {})
+        self.assertEqual(jd.completed, 1)
+
+    def test_failed_job(self):
+        jd = JobDispatcher(workers=2)
+        jd.dispatch("good", "{}")
+        jd.dispatch("bad", "fail")
+        self.assertEqual(jd.wait(), 1)
+        self.assertEqual(jd.failed, ["bad"])
+
+    def test_invalid_limit(self):
+        with self.assertRaises(ValueError):
+            JobDispatcher(workers=0)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+import unittest
+import sys
+import os
+
+base = os.path.abspath("../../../")
+sys.path.append(base)
+sys.path.append(base + "/PAV/special_pkgs")
+sys.path.append(base + "/PAV/modules")
+
+from nodeusage import NodeUsage
+
+showq_output = """
+active jobs------------------------
+JOBID              USERNAME      STATE PROCS   REMAINING            STARTTIME
+
+2 active jobs          48 of 160 processors in use by local jobs (30.00%)
+                        3 of 10 nodes active      (30.00%)
+"""
+
+
+class NodeUsageTest(unittest.TestCase):
+    def setUp(self):
+        NodeUsage.samplers = {}
+        os.environ.pop('PV_NODE_USAGE', None)
+
+    def test_parse_sinfo(self):
+        self.assertEqual(NodeUsage.parse_sinfo("6/4/0/10\n2/2/0/4\n"), (8, 14))
+
+    def test_parse_sinfo_nodes(self):
+        # n1 and n2 are in both the debug and the standard partition
+        output = "n1 alloc\nn2 idle\nn3 mix\nn4 drain*\nn1 alloc\nn2 idle\nn5 comp\n"
+        self.assertEqual(NodeUsage.parse_sinfo_nodes(output), (3, 5))
+
+    def test_parse_showq(self):
+        self.assertEqual(NodeUsage.parse_showq(showq_output), (3, 10))
+
+    def test_fill(self):
+        usage = NodeUsage.sampler(['echo', '6/4/0/10'], NodeUsage.parse_sinfo)
+        self.assertTrue(usage.room_for(2, 80))
+        usage.add(2)
+        self.assertEqual(usage.percent_used(), 80.0)
+        self.assertFalse(usage.room_for(1, 80))
+        self.assertTrue(usage.room_for(1, 90))
+
+    def test_stand_in(self):
+        os.environ['PV_NODE_USAGE'] = "9/1/0/10"
+        usage = NodeUsage.sampler(['no-such-scheduler-cmd'], NodeUsage.parse_sinfo)
+        self.assertFalse(usage.room_for(1, 90))
+
+    def test_unknown_nodes(self):
+        usage = NodeUsage.sampler(['no-such-scheduler-cmd'], NodeUsage.parse_sinfo)
+        self.assertTrue(usage.room_for(100, 50))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+import unittest
+import sys
+import os
+import json
+import tempfile
+import shutil
+
+base = os.path.abspath("../../../")
+sys.path.append(base)
+sys.path.append(base + "/PAV/special_pkgs")
+sys.path.append(base + "/PAV/modules")
+
+from submitdaemon import SubmitDaemon
+from jobdispatcher import JobDispatcher
+
+
+class FakeConfig():
+    def files_changed(self):
+        return False
+
+    def get_effective_config_file(self):
+        return {}
+
+
+class FakeRunTestSuite():
+    # stands in for the run_test_suite plugin, stops the daemon after two passes
+    def __init__(self):
+        self.dispatcher = JobDispatcher(workers=1)
+        self.daemon = None
+        self.passes = 0
+
+    def submit_test_suite(self, my_test_suite, args):
+        self.passes += 1
+        if self.passes == 2:
+            self.daemon.stop_requested = True
+
+
+class SubmitDaemonTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.status_file = self.tmp_dir + "/test.status"
+        self.args = {'testSuite': 'test.yaml', 'D': ['0'], 'status': self.status_file, 'detach': False}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_cycles(self):
+        rts = FakeRunTestSuite()
+        rts.daemon = SubmitDaemon(rts, FakeConfig(), self.args)
+        rts.daemon.run()
+        self.assertEqual(rts.passes, 2)
+        with open(self.status_file) as f:
+            status = json.load(f)
+        self.assertEqual(status['state'], 'stopped')
+        self.assertEqual(status['cycles'], 2)
+        self.assertEqual(SubmitDaemon.running_pid(self.status_file), None)
+
+    def test_already_running(self):
+        with open(self.status_file, 'w') as f:
+            json.dump({'pid': os.getpid(), 'state': 'waiting'}, f)
+        self.assertEqual(SubmitDaemon.running_pid(self.status_file), os.getpid())
+        rts = FakeRunTestSuite()
+        with self.assertRaises(SystemExit):
+            SubmitDaemon(rts, FakeConfig(), self.args).run()
+
+    def test_invalid_delay(self):
+        self.args['D'] = ['soon']
+        with self.assertRaises(ValueError):
+            SubmitDaemon(FakeRunTestSuite(), FakeConfig(), self.args)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
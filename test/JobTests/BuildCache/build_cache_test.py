@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+
+import unittest
+import sys
+import os
+import time
+import tempfile
+import shutil
+
+base = os.path.abspath("../../../")
+sys.path.append(base)
+sys.path.append(base + "/PAV/special_pkgs")
+sys.path.append(base + "/PAV/modules")
+
+import buildcache
+
+
+class BuildCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.root = buildcache.private_dir(self.tmp_dir + "/cache")
+        self.count = self.tmp_dir + "/count"
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def work_space(self, name):
+        ws = os.path.join(self.tmp_dir, name)
+        os.makedirs(ws)
+        with open(ws + "/buildme", "w") as fh:
+            fh.write("cc -o app app.c")
+        # staging keeps the modification times of the source
+        os.utime(ws + "/buildme", (1500000000, 1500000000))
+        return ws
+
+    def build(self, ws, fail=False, delay=0):
+        def run_build():
+            time.sleep(delay)
+            with open(self.count, "a") as fh:
+                fh.write("x")
+            if fail:
+                raise RuntimeError("build failed")
+            with open(ws + "/app", "w") as fh:
+                fh.write("binary")
+            return "built"
+        key = buildcache.build_key(ws, {'cmd': 'buildme'}, {})
+        return buildcache.cached_build(self.root, key, ws, run_build)
+
+    def builds(self):
+        with open(self.count) as fh:
+            return len(fh.read())
+
+    def test_reused(self):
+        self.assertEqual(self.build(self.work_space("v1")), ("built", False))
+        ws2 = self.work_space("v2")
+        self.assertEqual(self.build(ws2), ("built", True))
+        self.assertEqual(self.builds(), 1)
+        with open(ws2 + "/app") as fh:
+            self.assertEqual(fh.read(), "binary")
+
+    def test_changed_source(self):
+        self.build(self.work_space("v1"))
+        ws2 = self.work_space("v2")
+        with open(ws2 + "/buildme", "a") as fh:
+            fh.write(" -O3")
+        self.assertEqual(self.build(ws2), ("built", False))
+        self.assertEqual(self.builds(), 2)
+
+    def test_failed_not_saved(self):
+        self.assertRaises(RuntimeError, self.build, self.work_space("v1"), True)
+        self.assertEqual(self.build(self.work_space("v2")), ("built", False))
+
+    def test_cache_root(self):
+        os.environ['PV_BUILD_CACHE'] = self.tmp_dir + "/shared"
+        os.mkdir(self.tmp_dir + "/shared", 0o777)
+        os.chmod(self.tmp_dir + "/shared", 0o777)
+        # planted by someone else, never used
+        self.assertEqual(buildcache.cache_root(), None)
+        os.chmod(self.tmp_dir + "/shared", 0o700)
+        self.assertEqual(buildcache.cache_root(), self.tmp_dir + "/shared")
+        del os.environ['PV_BUILD_CACHE']
+
+    def test_concurrent(self):
+        # both start together, the second waits for the first build
+        pid = os.fork()
+        if pid == 0:
+            try:
+                self.build(self.work_space("v1"), delay=1)
+            finally:
+                os._exit(0)
+        time.sleep(0.3)
+        self.assertEqual(self.build(self.work_space("v2")), ("built", True))
+        os.waitpid(pid, 0)
+        self.assertEqual(self.builds(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+
+base = os.path.abspath("../../../")
+sys.path.append(base)
+sys.path.append(base + "/PAV/special_pkgs")
+sys.path.append(base + "/PAV/modules")
+
+import joblog
+import jobpost
+
+log_lines = """<testName> mytest extra
+<JobID> 1234_5
+<npes> 32
+<params> 16  big 
+<nodes> n1 n2
+running on nodes -> n1 n2
+<td> bw 42 MB
+<result> pass
+<nodes> n3
+<result> learning
+<results> fail: too slow
+real    3.21
+user    1.50
+sys     0.25
+<end>  10-18-2015T02:35:00
+"""
+
+
+class JobLogTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.log = self.tmp_dir + "/mytest.log"
+        with open(self.log, "w") as fh:
+            fh.write(log_lines)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_tags(self):
+        record = joblog.JobRecord.from_log(self.log)
+        # the first value of each tag, as written
+        self.assertEqual(record.tags.keys(), ["testName", "JobID", "npes", "params", "nodes", "td", "result",
+                                              "results", "end"])
+        self.assertEqual(record.tags["params"], "16  big ")
+        self.assertEqual(record.tags["nodes"], "n1 n2")
+        self.assertEqual(joblog.tag_report(record).splitlines()[-1], "real 3.21")
+
+    def test_chklg_report(self):
+        os.utime(self.log, (0, 0))
+        date = joblog.log_date(self.log)
+        report = joblog.chklg_report(self.log).splitlines()
+        self.assertEqual(report, ["  Matched =>(P), pass",
+                                  "  Matched =>(L)",
+                                  "  Matched =>(F), fail: too slow",
+                                  "  %s mytest:1234 :: RESULT=FAILED" % date])
+
+        with open(self.log, "w") as fh:
+            fh.write("<testName> mytest\n")
+        self.assertIn("(I), INCOMPLETE", joblog.chklg_report(self.log))
+        open(self.tmp_dir + "/post_complete", "w").close()
+        report = joblog.chklg_report(self.log)
+        self.assertIn("(U), UNKNOWN", report)
+        self.assertTrue(report.endswith("mytest:undef :: RESULT=UNDEFINED\n"))
+
+    def test_summary(self):
+        record = joblog.JobRecord.from_log(self.log)
+        jobpost.write_trend_data(self.tmp_dir, record)
+        jobpost.write_summary(self.tmp_dir, record)
+        # the log is no longer read once there is a summary
+        os.rename(self.log, self.log + ".old")
+        open(self.log, "w").close()
+        saved = joblog.JobRecord.for_log(self.log)
+        self.assertEqual((saved.user, saved.sys), ("1.50", "0.25"))
+        self.assertEqual(saved.node_list, "n3")
+        self.assertEqual(saved.status(), "FAIL")
+        self.assertEqual(joblog.tag_report(saved), joblog.tag_report(record))
+        self.assertEqual(joblog.chklg_report(self.log, saved), joblog.chklg_report(self.log, record))
+        self.assertEqual(saved.csv_rows(), record.csv_rows())
+        self.assertEqual(saved.splunk_record(), record.splunk_record())
+        self.assertEqual(saved.td_lines, record.td_lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+
+import unittest
+import sys
+import os
+import time
+import tempfile
+import shutil
+
+base = os.path.abspath("../../../")
+sys.path.append(base)
+sys.path.append(base + "/PAV/special_pkgs")
+sys.path.append(base + "/PAV/modules")
+
+import jobpost
+from basejobcontroller import JobController
+
+log_lines = """<testName> mytest
+<params> 16 big
+<JobID> 1234
+<nodes> n1 n2 
+<start>  10-18-2015T02:32:48
+<td> read-bw 42 MB
+<td> write_bw 17 MB
+<td> read-bw 99 MB
+<result> pass
+<results> fail: too slow
+
+real    3.21
+<end>  10-18-2015T02:35:00
+"""
+
+
+class JobPostTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.log = self.tmp_dir + "/mytest.log"
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_record(self):
+        with open(self.log, "w") as fh:
+            fh.write(log_lines)
+        record = jobpost.JobRecord.from_log(self.log)
+        self.assertEqual(record.test_name, "mytest")
+        self.assertEqual(record.job_id, "1234")
+        self.assertEqual(record.num_nodes, 2)
+        self.assertEqual(record.params, "16__big")
+        self.assertEqual((record.start_date, record.start_time), ("10-18-2015", "02:32:48"))
+        self.assertEqual(record.results, "fail")
+        self.assertEqual(record.real, "3.21")
+        # first value of a name wins, the trend_data file keeps them all
+        self.assertEqual(record.trend_data, [("read_bw", "42", "MB"), ("write_bw", "17", "MB")])
+        self.assertEqual(len(record.td_lines), 3)
+        self.assertEqual(record.csv_rows()[0],
+                         '10-18-2015,02:32:48,10-18-2015,02:35:00,mytest,1234,,2,,"16__big",fail,read_bw,42,MB,multi\n')
+
+    def test_follower(self):
+        # lines written while the job runs, the last one without a new line
+        fh = open(self.log, "w")
+        follower = jobpost.JobLogFollower(self.log)
+        follower.poll_interval = 0.05
+        follower.start()
+        for line in log_lines.splitlines(True):
+            fh.write(line)
+            fh.flush()
+            time.sleep(0.01)
+        fh.write("<td> last 1")
+        fh.close()
+        record = follower.finish()
+        self.assertEqual(record.results, "fail")
+        self.assertEqual(record.trend_data[-1], ("last", "1", ""))
+
+    def test_csv_concurrent(self):
+        with open(self.log, "w") as fh:
+            fh.write(log_lines)
+        record = jobpost.JobRecord.from_log(self.log)
+        pids = []
+        for i in range(8):
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    for j in range(50):
+                        jobpost.write_csv(self.tmp_dir, record)
+                finally:
+                    os._exit(0)
+            pids.append(pid)
+        for pid in pids:
+            os.waitpid(pid, 0)
+        with open(self.tmp_dir + "/test_results.csv") as fh:
+            lines = fh.readlines()
+        # one header, every row whole
+        self.assertEqual(lines[0], jobpost.csv_header)
+        self.assertEqual(len(lines), 1 + 8 * 50 * 2)
+        self.assertEqual(set(lines[1:]), set(record.csv_rows()))
+
+    def test_splunk_own_file(self):
+        gdl = self.tmp_dir + "/splunk.log"
+        with open(self.tmp_dir + "/job.splunkdata", "w") as fh:
+            fh.write("made by the job\n")
+        jobpost.write_splunk(self.tmp_dir, jobpost.JobRecord(), gdl)
+        with open(gdl) as fh:
+            self.assertEqual(fh.read(), "made by the job\n")
+
+    def test_post_process_saves_first(self):
+        # a .splunkdata file the job leaves in its working space is the one sent
+        ws = self.tmp_dir + "/ws"
+        results = self.tmp_dir + "/results"
+        os.makedirs(ws)
+        os.makedirs(results)
+        with open(ws + "/job.splunkdata", "w") as fh:
+            fh.write("made by the job\n")
+        with open(results + "/mytest.log", "w") as fh:
+            fh.write(log_lines)
+        env = {'PV_JOB_RESULTS_LOG_DIR': results, 'PV_JOB_RESULTS_LOG': results + "/mytest.log",
+               'PV_RUNHOME': ws, 'PV_WS': 'ws', 'PV_SOURCE_LOCATION': self.tmp_dir,
+               'PV_SAVE_FROM_WS': '*.splunkdata', 'PV_RESULT_ROOT': self.tmp_dir,
+               'SPLUNK_GDL': self.tmp_dir + "/splunk.log"}
+        follower = jobpost.JobLogFollower(env['PV_JOB_RESULTS_LOG'])
+        follower.start()
+        JobController.post_process(env, follower, lambda: "now")
+        with open(env['SPLUNK_GDL']) as fh:
+            self.assertEqual(fh.read(), "made by the job\n")
+        self.assertFalse(os.path.exists(ws))
+
+    def test_remove_ws_prints_nothing(self):
+        # its lines are printed by the caller, never alongside other output
+        ws = self.tmp_dir + "/ws"
+        os.makedirs(ws)
+        env = {'PV_RUNHOME': ws, 'PV_WS': 'ws', 'PV_SOURCE_LOCATION': self.tmp_dir}
+        out = tempfile.TemporaryFile()
+        stdout, sys.stdout = sys.stdout, out
+        try:
+            msgs = JobController.remove_ws(env)
+        finally:
+            sys.stdout = stdout
+        out.seek(0)
+        self.assertEqual(out.read(), "")
+        self.assertEqual(msgs, ["- remove WS: %s " % ws, "- Working Space cleanup complete"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+import time
+import fcntl
+
+base = os.path.abspath("../../../")
+sys.path.append(base)
+sys.path.append(base + "/PAV/special_pkgs")
+sys.path.append(base + "/PAV/modules")
+
+import wsstage
+
+
+class WsStageTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.src = self.tmp_dir + "/src"
+        os.makedirs(self.src + "/sub")
+        os.makedirs(self.src + "/pv_ws")
+        for f in ["input", "deck.txt", "sub/more", "code.c"]:
+            with open(os.path.join(self.src, f), "w") as fh:
+                fh.write(f)
+        self.snapshots = self.src + "/pv_ws/.pv_snapshots"
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def stage(self, name, includes=None):
+        ws = os.path.join(self.src, "pv_ws", name)
+        os.makedirs(ws)
+        snapshot, copied = wsstage.stage(self.src, ws, self.snapshots, ['pv_ws'], includes, ['deck.txt'])
+        return ws, snapshot, copied
+
+    def test_linked(self):
+        ws1, snap1, copied = self.stage("job1")
+        ws2, snap2, copied = self.stage("job2")
+        self.assertEqual(snap1, snap2)
+        self.assertEqual(copied, 1)
+        self.assertEqual(os.stat(ws1 + "/sub/more").st_ino, os.stat(ws2 + "/sub/more").st_ino)
+        # mutable files are private copies, source files are left out
+        self.assertNotEqual(os.stat(ws1 + "/deck.txt").st_ino, os.stat(ws2 + "/deck.txt").st_ino)
+        self.assertFalse(os.path.exists(ws1 + "/code.c"))
+
+    def test_source_change(self):
+        ws1, snap1, copied = self.stage("job1")
+        with open(self.src + "/new", "w") as fh:
+            fh.write("new")
+        ws2, snap2, copied = self.stage("job2")
+        self.assertNotEqual(snap1, snap2)
+        self.assertTrue(os.path.exists(ws2 + "/new"))
+
+    def test_damaged_snapshot(self):
+        ws1, snap1, copied = self.stage("job1")
+        os.chmod(ws1 + "/input", 0o644)
+        with open(ws1 + "/input", "a") as fh:
+            fh.write("changed by the test")
+        ws2, snap2, copied = self.stage("job2")
+        with open(ws2 + "/input") as fh:
+            self.assertEqual(fh.read(), "input")
+
+    def test_old_snapshots(self):
+        ws1, snap1, copied = self.stage("job1")
+        with open(self.src + "/new", "w") as fh:
+            fh.write("new")
+        ws2, snap2, copied = self.stage("job2")
+        old = time.time() - 2 * wsstage.snapshot_max_age
+        os.utime(snap1, (old, old))
+
+        # not removed while a job links from it
+        fd = wsstage.lock_snapshot(snap1, fcntl.LOCK_SH)
+        wsstage.remove_old_snapshots(self.snapshots, snap2)
+        self.assertTrue(os.path.isdir(snap1))
+        os.close(fd)
+
+        # reusing it counts as a use
+        os.remove(self.src + "/new")
+        ws3, snap3, copied = self.stage("job3")
+        self.assertEqual(snap3, snap1)
+        wsstage.remove_old_snapshots(self.snapshots, snap2)
+        self.assertTrue(os.path.isdir(snap1))
+
+        os.utime(snap1, (old, old))
+        wsstage.remove_old_snapshots(self.snapshots, snap2)
+        self.assertFalse(os.path.exists(snap1))
+
+    def test_includes(self):
+        ws1, snap1, copied = self.stage("job1", ["sub"])
+        self.assertEqual(os.listdir(ws1), ["sub"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
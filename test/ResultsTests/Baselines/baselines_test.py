@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+
+import unittest
+import sys
+import os
+import json
+import math
+import array
+import tempfile
+import shutil
+
+base = os.path.abspath("../../../")
+sys.path.append(base)
+sys.path.append(base + "/PAV/special_pkgs")
+sys.path.append(base + "/PAV/modules")
+
+import baselines
+
+trend_lines = """
+  *** Job Summary (results root directory -> /tmp/results) ***
+\tior.2x32(4 8 ) jid(101) 2016-01-15T10:00:00:000001 bw+n001 10 MB
+\tior.2x32(4 8 ) jid(101) 2016-01-15T10:00:00:000001 bw+n002 20
+\tior.2x32(4 8 ) jid(102) 2016-01-16T10:00:00:000001 bw 30 MB/s
+\tior.2x32(4 8 ) jid(102) 2016-01-16T10:00:00:000001 bw 40
+\tior.2x32(4 8 ) jid(102) 2016-01-16T10:00:00:000001 status n/a
+\thpl.1x16() jid(103) 2016-01-16T10:00:00:000001 gflops 1e3 GF
+"""
+
+
+class BaselinesTest(unittest.TestCase):
+
+    def test_stats(self):
+        collected = baselines.Baselines()
+        collected.add_lines(trend_lines.splitlines())
+        self.assertEqual(len(collected), 5)
+        found = collected.stats()
+        self.assertEqual([(bl['test'], bl['name']) for bl in found],
+                         [("hpl.1x16()", "gflops"), ("ior.2x32(4 8 )", "bw")])
+        bw = found[1]
+        self.assertEqual((bw['count'], bw['mean'], bw['min'], bw['max']), (4, 25.0, 10.0, 40.0))
+        self.assertAlmostEqual(bw['stdev'], 11.180339887)
+        self.assertEqual(bw['percentiles']['p50'], 25.0)
+        self.assertEqual(bw['percentiles']['p25'], 17.5)
+        self.assertEqual(bw['units'], "MB/s")
+
+        # as mkBaselines printed it
+        self.assertEqual(baselines.report(found),
+                         "hpl.1x16():\n"
+                         "\t gflops = 1000.00 GF (entries - 1, min - 1000.00, max - 1000.00, stDev - 0.00\n"
+                         "ior.2x32(4 8 ):\n"
+                         "\t bw = 25.00 MB/s (entries - 4, min - 10.00, max - 40.00, stDev - 11.18\n")
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = baselines.baseline_file(tmp_dir)
+            baselines.save(path, found)
+            with open(path) as fh:
+                saved = json.load(fh)
+            self.assertEqual(saved['tests']["ior.2x32(4 8 )"]["bw"]["count"], 4)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def group_stats(self, use_numpy):
+        # groups of 1, 3 and 5 values, interleaved
+        keys = array.array('i', [2, 1, 2, 0, 1, 2, 2, 1, 2])
+        values = array.array('d', [10, 3, 40, 5, 1, 20, 30, 2, 50])
+        saved = baselines.numpy
+        if not use_numpy:
+            baselines.numpy = None
+        try:
+            return baselines.group_stats(keys, values, 3)
+        finally:
+            baselines.numpy = saved
+
+    def test_group_stats(self):
+        counts, means, mins, maxs, stdevs, pcts = self.group_stats(False)
+        self.assertEqual(counts, [1, 3, 5])
+        self.assertEqual(means, [5.0, 2.0, 30.0])
+        self.assertEqual((mins, maxs), ([5.0, 1.0, 10.0], [5.0, 3.0, 50.0]))
+        for got, want in zip(stdevs, [0.0, math.sqrt(2.0 / 3), math.sqrt(200.0)]):
+            self.assertAlmostEqual(got, want)
+        for got, want in zip(pcts, [(5.0,) * 5, (1.1, 1.5, 2.0, 2.5, 2.9), (12.0, 20.0, 30.0, 40.0, 48.0)]):
+            for g, w in zip(got, want):
+                self.assertAlmostEqual(g, w)
+
+        if baselines.numpy is None:
+            return
+        with_numpy = self.group_stats(True)
+        for pure, fast in zip(self.group_stats(False), with_numpy):
+            self.assertEqual(len(pure), len(fast))
+            for p, f in zip(pure, fast):
+                if isinstance(p, tuple):
+                    for a, b in zip(p, f):
+                        self.assertAlmostEqual(a, b)
+                else:
+                    self.assertAlmostEqual(p, f)
+
+
+if __name__ == '__main__':
+    unittest.main()
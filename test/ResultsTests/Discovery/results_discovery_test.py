@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+
+import unittest
+import sys
+import os
+import datetime
+import tempfile
+import shutil
+
+base = os.path.abspath("../../../")
+sys.path.append(base)
+sys.path.append(base + "/PAV/special_pkgs")
+sys.path.append(base + "/PAV/modules")
+
+import resultsdiscovery
+
+
+class ResultsDiscoveryTest(unittest.TestCase):
+    def setUp(self):
+        self.grp_dir = tempfile.mkdtemp()
+        self.runs = []
+        for day in ["2014-12-31", "2015-01-01", "2015-01-15", "2015-02-01", "2015-03-10"]:
+            for host, test, jid in [("fe1", "ior", 11), ("fe2", "hpl", 22)]:
+                run = os.path.join(self.grp_dir, day[:4], day[:7], day, host, test,
+                                   "%s__runme__%d__%s.%sT12:00:00:000001" % (test, jid, host, day))
+                os.makedirs(run)
+                self.runs.append(run)
+        # not day directories
+        os.makedirs(os.path.join(self.grp_dir, "2015", "notes"))
+        os.makedirs(os.path.join(self.grp_dir, "2015", "2015-01", "tmp"))
+
+    def tearDown(self):
+        shutil.rmtree(self.grp_dir)
+
+    def test_day_dirs(self):
+        days = [d for d, path in resultsdiscovery.day_dirs(self.grp_dir, datetime.date(2015, 1, 1),
+                                                            datetime.date(2015, 2, 1))]
+        self.assertEqual(days, [datetime.date(2015, 1, 1), datetime.date(2015, 1, 15), datetime.date(2015, 2, 1)])
+        self.assertEqual(len(list(resultsdiscovery.day_dirs(self.grp_dir))), 5)
+
+    def test_run_dirs(self):
+        start = datetime.datetime(2015, 1, 1, 12, 0, 0)
+        end = datetime.datetime(2015, 2, 1, 11, 59, 59)
+        found = sorted(resultsdiscovery.run_dirs(self.grp_dir, start, end, threads=4))
+        self.assertEqual(found, sorted(r for r in self.runs if "2015-01-" in r))
+
+        found = list(resultsdiscovery.run_dirs(self.grp_dir, start, end, test="hp*"))
+        self.assertEqual([os.path.basename(r)[:3] for r in found], ["hpl", "hpl"])
+        found = list(resultsdiscovery.run_dirs(self.grp_dir, start, end, job_id=11, machine="fe1"))
+        self.assertEqual(len(found), 2)
+
+    def test_run_time(self):
+        self.assertEqual(resultsdiscovery.run_time("a__b__1__c.2015-01-01T10:11:12:123"),
+                         datetime.datetime(2015, 1, 1, 10, 11, 12))
+        self.assertEqual(resultsdiscovery.run_time("a__b__1__c.2015-01-01T10:11:62:123"), None)
+        self.assertEqual(resultsdiscovery.run_time("RESULTS"), None)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
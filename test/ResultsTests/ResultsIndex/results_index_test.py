@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+
+
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+import glob
+import time
+import datetime
+
+base = os.path.abspath("../../../")
+sys.path.append(base)
+sys.path.append(base + "/PAV/special_pkgs")
+sys.path.append(base + "/PAV/modules")
+
+import resultsindex
+
+
+class ResultsIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.index = resultsindex.ResultsIndex(self.root, self.root + "/results_index.db")
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.root)
+
+    def make_run(self, test, day, time, result=None, finished=True, td=None):
+        run_dir = os.path.join(self.root, "gzshared", day[:4], day[:7], day, "fe1", test,
+                               "%s__runme__%d__cu1.%sT%s:000001" % (test, len(os.listdir(self.root)), day, time))
+        os.makedirs(run_dir)
+        with open(os.path.join(run_dir, test + ".log"), "w") as fh:
+            fh.write("<testName> %s\n<params> 4 8\n<nodes> n1 n2\n<npes> 32\n" % test)
+            if result:
+                fh.write("<result> %s\n" % result)
+            fh.write("real 2.50\n")
+        if finished:
+            self.finish(run_dir)
+        if td:
+            with open(os.path.join(run_dir, "trend_data"), "w") as fh:
+                fh.write(td + "\n")
+            with open(os.path.join(run_dir, test + ".log"), "a") as fh:
+                fh.write("<td> " + td + "\n")
+        return run_dir
+
+    def finish(self, run_dir):
+        with open(os.path.join(run_dir, "post_complete"), "w") as fh:
+            fh.write("command complete\nepilog complete\ncleanup complete\n")
+
+    def test_scan(self):
+        self.make_run("ior", "2015-03-01", "10:00:00", "pass", td="bw 10 MB")
+        self.make_run("ior", "2015-03-02", "10:00:00", "fail")
+        self.make_run("hpl", "2015-03-02", "11:00:00", finished=False)
+        # outside of the range
+        self.make_run("hpl", "2015-04-01", "11:00:00", "pass")
+
+        start, end = "2015-03-01 00:00:00", "2015-03-31 23:59:59"
+        self.assertEqual(self.index.scan("gzshared", start, end)['added'], 3)
+        # past days are not visited again, only the run still going is checked
+        stats = self.index.scan("gzshared", start, end)
+        self.assertEqual((stats['days'], stats['added'], stats['rechecked']), (0, 0, 1))
+
+        runs = self.index.runs("gzshared", start, end)
+        self.assertEqual(sorted(r['status'] for r in runs), ['FAIL', 'INCOMPLETE', 'PASS'])
+        self.assertEqual([r['test_name'] for r in self.index.runs("gzshared", start, end, test="IOR")],
+                         ['ior', 'ior'])
+        self.assertEqual(self.index.runs("gzshared", start, end, segment="cu2"), [])
+
+        text = resultsindex.summary(runs)
+        self.assertTrue("ior.2x32(4 8) - total_runs:2, passed:1, failed:1, undefined:0, incomplete:0, "
+                        "[2.50 secs]" in text)
+        self.assertTrue("Tests evaluated = 3, Passed = 1, Failed = 1, Undefined = 1, Incomplete = 0" in text)
+        self.assertTrue("ior.2x32(4 8) jid() 2015-03-01T10:00:00:000001 bw 10 MB" in
+                        resultsindex.trend_report(self.index, runs))
+
+    def test_incremental(self):
+        today = datetime.date.today().strftime("%Y-%m-%d")
+        self.make_run("ior", today, "00:00:01", "pass")
+        self.make_run("hpl", today, "00:00:02", finished=False)
+        old = self.make_run("ior", "2015-03-01", "10:00:00", "pass")
+        for d in glob.glob(self.root + "/gzshared/*/*/*/*/*"):
+            os.utime(d, (time.time() - 60, time.time() - 60))
+        self.assertEqual(self.index.scan("gzshared")['added'], 3)
+
+        # nothing changed, no test directory is listed
+        stats = self.index.scan("gzshared")
+        self.assertEqual((stats['days'], stats['dirs'], stats['added']), (1, 0, 0))
+
+        # a new run of today, and the unfinished one completes
+        hpl = self.index.runs("gzshared", today + " 00:00:00", today + " 23:59:59", test="hpl")[0]['run_dir']
+        with open(os.path.join(hpl, "hpl.log"), "a") as fh:
+            fh.write("<result> pass\n")
+        self.finish(hpl)
+        self.make_run("ior", today, "00:00:03", "fail")
+        stats = self.index.scan("gzshared")
+        self.assertEqual((stats['dirs'], stats['added'], stats['updated']), (1, 1, 1))
+        statuses = [r['status'] for r in self.index.runs("gzshared", "2000-01-01 00:00:00", today + " 23:59:59")]
+        self.assertEqual(sorted(statuses), ['FAIL', 'PASS', 'PASS', 'PASS'])
+
+        # runs added to a day already over are only found by a full scan
+        self.make_run("ior", "2015-03-01", "11:00:00", "pass")
+        self.assertEqual(self.index.scan("gzshared")['added'], 0)
+        self.assertEqual(self.index.scan("gzshared", full=True)['added'], 1)
+        self.assertTrue(os.path.isdir(old))
+
+        # removed runs are dropped when their test directory is listed again,
+        # from the days already over by a full scan
+        shutil.rmtree(hpl)
+        self.assertEqual(self.index.scan("gzshared")['removed'], 1)
+        shutil.rmtree(old)
+        self.assertEqual(self.index.scan("gzshared")['removed'], 0)
+        self.assertEqual(self.index.scan("gzshared", full=True)['removed'], 1)
+        self.assertEqual(len(self.index.runs("gzshared", "2000-01-01 00:00:00", today + " 23:59:59")), 3)
+
+    def test_post_processing(self):
+        # scanned while the job runs its epilog, post_complete is already there
+        run_dir = self.make_run("ior", "2015-03-01", "10:00:00", "pass", finished=False)
+        open(os.path.join(run_dir, "post_complete"), "w").close()
+        with open(os.path.join(run_dir, "ior.log"), "a") as fh:
+            fh.write("<td> bw 10 MB\n")
+        self.assertEqual(self.index.scan("gzshared")['added'], 1)
+        runs = self.index.runs("gzshared", "2015-03-01 00:00:00", "2015-03-01 23:59:59")
+        self.assertEqual((runs[0]['finished'], runs[0]['has_trend']), (0, 1))
+
+        # then the trend data is written and the post processing ends
+        with open(os.path.join(run_dir, "trend_data"), "w") as fh:
+            fh.write("bw 10 MB\n")
+        self.finish(run_dir)
+        self.assertEqual(self.index.scan("gzshared")['updated'], 1)
+        runs = self.index.runs("gzshared", "2015-03-01 00:00:00", "2015-03-01 23:59:59")
+        self.assertEqual(runs[0]['finished'], 1)
+        self.assertTrue("jid() 2015-03-01T10:00:00:000001 bw 10 MB" in resultsindex.trend_report(self.index, runs))
+
+        # a full scan repairs a row gone stale
+        with self.index.db:
+            self.index.db.execute("UPDATE runs SET has_trend = 0, status = 'FAIL'")
+            self.index.db.execute("DELETE FROM trend_data")
+        self.assertEqual(self.index.scan("gzshared")['updated'], 0)
+        self.assertEqual(self.index.scan("gzshared", full=True)['updated'], 1)
+        runs = self.index.runs("gzshared", "2015-03-01 00:00:00", "2015-03-01 23:59:59")
+        self.assertEqual((runs[0]['status'], runs[0]['has_trend']), ('PASS', 1))
+        self.assertEqual(self.index.trend_data(runs[0]['run_dir']), ["bw 10 MB"])
+
+    def test_same_run_once(self):
+        run_dir = self.make_run("ior", "2015-03-01", "10:00:00", "pass")
+        # a job names its run directory from the results root as configured
+        index = resultsindex.ResultsIndex(self.root + "/", self.index.path)
+        index.add_run(self.root + "//gzshared/" + os.path.relpath(run_dir, self.root + "/gzshared"))
+        index.close()
+        self.assertEqual(self.index.scan("gzshared")['added'], 0)
+        self.assertEqual(len(self.index.runs("gzshared", "2015-03-01 00:00:00", "2015-03-01 23:59:59")), 1)
+
+    def test_not_a_run(self):
+        self.assertEqual(resultsindex.parse_run_name("notes.txt"), None)
+        self.assertEqual(resultsindex.parse_run_name("ior__runme__12__cu1-fe.2015-03-01T10:00:00:1")['segment'],
+                         "cu1")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+import time
+
+base = os.path.abspath("../../../")
+sys.path.append(base)
+sys.path.append(base + "/PAV/special_pkgs")
+sys.path.append(base + "/PAV/modules")
+
+import trendstore
+
+header = "StartDate,StartTime,EndDate,EndTime,TestName,JobId,SegmentName," \
+         "NumNodes,NumCores,Params,Results,tdName,tdVal,tdUnits,Node\n"
+
+
+def row(test, day, value, name="bw", node="n1"):
+    return "%s,10:00:00,%s,10:05:00,%s,42,cu1,1,16,\"4__8\",pass,%s,%s,MB,%s\n" % \
+           (day, day, test, name, value, node)
+
+
+class TrendStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.csv = os.path.join(self.root, "test_results.csv")
+        self.store = trendstore.TrendStore(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def append(self, text):
+        with open(self.csv, "a") as fh:
+            fh.write(text)
+
+    def test_sync_select(self):
+        self.append(header + row("ior", "01-15-2016", 10) + row("ior", "02-15-2016", 20) +
+                    row("mdtest", "02-16-2016", "n/a") + row("mdtest", "02-16-2016", 5, "ops", "multi"))
+        self.assertEqual(self.store.sync(), 3)
+        self.assertEqual(self.store.tests(), ["ior", "mdtest"])
+        self.assertEqual(len(self.store.partitions("ior")), 2)
+
+        rows = self.store.select(test="ior", start=time.mktime((2016, 2, 1, 0, 0, 0, 0, 0, -1)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows.columns['value'][0], 20.0)
+        self.assertEqual(rows.label('series', 0), ("ior", "1", "16", '"4__8"'))
+        self.assertEqual(rows.label('td', 0), ("bw", "MB"))
+
+        # only what was added since, a row not finished yet waits
+        self.append(row("ior", "02-20-2016", 30) + "02-21-2016,10:00")
+        self.assertEqual(self.store.sync(), 1)
+        self.assertEqual(self.store.sync(), 0)
+        self.append(":00,02-21-2016,10:05:00,ior,43,cu1,1,16,\"4__8\",pass,bw,40,MB,n2\n")
+        self.assertEqual(self.store.sync(), 1)
+        rows = self.store.select(('value', 'node'), test="ior")
+        self.assertEqual(list(rows.columns['value']), [10.0, 20.0, 30.0, 40.0])
+        self.assertEqual(rows.label('node', 3), ("n2",))
+
+    def test_recovery(self):
+        self.append(header + row("ior", "01-15-2016", 10))
+        self.store.sync()
+        # a sync cut short after writing some of the columns
+        partition = self.store.partitions("ior")[0]
+        partition.append([(0.0, 99.0, ("bw", "MB"), ("1", "16", "x"), ("n1",), ("1",))])
+        with open(partition.column_path('time'), "r+b") as fh:
+            fh.truncate(8)
+        self.append(row("ior", "01-16-2016", 11))
+        self.store.sync()
+        self.assertEqual(list(self.store.select(('value',)).columns['value']), [10.0, 11.0])
+
+        # a new csv file starts the store over
+        os.remove(self.csv)
+        self.append(header + row("hpl", "01-17-2016", 1))
+        self.store.sync()
+        self.assertEqual(self.store.tests(), ["hpl"])
+
+    def test_read_only(self):
+        self.append(header + row("ior", "01-15-2016", 10))
+        # the store can not be made, as for a user without write access
+        open(os.path.join(self.root, trendstore.store_name), "w").close()
+        store = trendstore.synced_store(self.root)
+        self.assertNotEqual(store.path, self.store.path)
+        self.assertEqual(list(store.select(('value',)).columns['value']), [10.0])
+
+
+if __name__ == '__main__':
+    unittest.main()